@@ -10,54 +10,43 @@
 # - React Native
 # - Flutter
 
+import startup  # first, so the startup clock starts at launch
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+import functools
+import os
 import threading
 import time
-import json
 
-class ConnectionManager:
-    def __init__(self):
-        self.connection_type = None
-        self.is_connected = False
-        self.device_info = {}
-        
-    def scan_bluetooth_devices(self):
-        # Simulate Bluetooth device scanning
-        return [
-            {"name": "StepperController_BT01", "address": "00:11:22:33:44:55", "signal": -45},
-            {"name": "TriAxis_Motor_Hub", "address": "AA:BB:CC:DD:EE:FF", "signal": -62},
-            {"name": "Arduino_Stepper", "address": "12:34:56:78:90:AB", "signal": -38}
-        ]
-    
-    def scan_wifi_devices(self):
-        # Simulate WiFi device scanning
-        return [
-            {"name": "StepperController_192.168.1.100", "ip": "192.168.1.100", "signal": -35},
-            {"name": "MotorHub_192.168.1.150", "ip": "192.168.1.150", "signal": -50},
-            {"name": "TriAxis_192.168.1.200", "ip": "192.168.1.200", "signal": -42}
-        ]
-    
-    def connect_bluetooth(self, device_address):
-        # Simulate Bluetooth connection
-        time.sleep(2)  # Connection delay
-        self.connection_type = "Bluetooth"
-        self.is_connected = True
-        self.device_info = {"address": device_address, "type": "BT"}
-        return True
-    
-    def connect_wifi(self, device_ip):
-        # Simulate WiFi connection
-        time.sleep(1.5)  # Connection delay
-        self.connection_type = "WiFi"
-        self.is_connected = True
-        self.device_info = {"ip": device_ip, "type": "WiFi"}
-        return True
-    
-    def disconnect(self):
-        self.connection_type = None
-        self.is_connected = False
-        self.device_info = {}
+# Not needed to show the window: each loads (with NumPy) on first use,
+# discovery once the first frame is up and the rest on connecting
+transport = startup.lazy_import('transport')
+codec = startup.lazy_import('codec')
+dispatcher = startup.lazy_import('dispatcher')
+planner = startup.lazy_import('planner')
+discovery = startup.lazy_import('discovery')
+telemetry = startup.lazy_import('telemetry')
+signature = startup.lazy_import('signature')
+job_import = startup.lazy_import('job_import')
+stroke_order = startup.lazy_import('stroke_order')
+pattern_cache = startup.lazy_import('pattern_cache')
+estop = startup.lazy_import('estop')
+metrics = startup.lazy_import('metrics')
+recorder = startup.lazy_import('recorder')
+canvas_view = startup.lazy_import('canvas_view')
+step_tables = startup.lazy_import('step_tables')
+io_loop = startup.lazy_import('io_loop')
+fill = startup.lazy_import('fill')
+jog = startup.lazy_import('jog')
+connection = startup.lazy_import('connection')
+IMPORTED = time.perf_counter()
+
+RECENT_RECORDINGS = 5   # recorded sessions listed in the Pattern Library
+DRAW_CANVAS = (400, 200)
+DIAGONALS = (("↙", -1, -1), ("↖", -1, 1), ("↗", 1, 1), ("↘", 1, -1))   # XY jog buttons
+NUDGE_STEPS = 10        # steps per key press on the Manual tab
+NUDGE_KEYS = {'Left': ('X', -1), 'Right': ('X', 1), 'Down': ('Y', -1), 'Up': ('Y', 1),
+              'Next': ('Z', -1), 'Prior': ('Z', 1)}   # arrows for X/Y, Page Up/Down for Z
 
 class EnhancedTriAxisApp:
     def __init__(self, master):
@@ -65,12 +54,68 @@ class EnhancedTriAxisApp:
         master.title("TriAxis Pro - APEX PRECISION MECHATRONIX")
         master.geometry("450x750")
         
-        self.connection_manager = ConnectionManager()
+        self.connection_manager = connection.ConnectionManager()
+        self.dispatcher = None
+        self.telemetry = None
+        self.trace_plot = None
         self.motor_positions = {'X': 0, 'Y': 0, 'Z': 0}
         self.motor_speeds = {'X': 50, 'Y': 50, 'Z': 50}
         self.motor_torques = {'X': 50, 'Y': 50, 'Z': 50}
+        self.stroke_view = None
+        self.job_preview = None
+        self.metrics_label = None
+        self.metrics_job = None
+        self.replayer = None
+        self.jogger = None
+        self.precompile_job = tk.BooleanVar(master, value=False)
+        self.startup = startup.StartupTimer("Tk app")
+        self.startup.mark('import', IMPORTED)
         
         self.create_interface()
+        self.startup.mark('build')
+        # Mapped, then Tk's idle redraws; discovery waits until after them
+        self.master.bind('<Map>', self.on_map, add='+')
+        for key in NUDGE_KEYS:
+            self.master.bind(f'<{key}>', self.on_nudge_key, add='+')
+    
+    # Everything below needs NumPy, so it is made on first use
+    @functools.cached_property
+    def ui(self):
+        # Results from the I/O loop, run on the Tk thread
+        return io_loop.UiQueue(lambda drain: self.master.after(0, drain))
+    
+    @functools.cached_property
+    def stroke_recorder(self):
+        return signature.StrokeRecorder()
+    
+    @functools.cached_property
+    def stroke_buffer(self):
+        return canvas_view.StrokeBuffer(self.stroke_recorder)
+    
+    @functools.cached_property
+    def pattern_cache(self):
+        return pattern_cache.PatternCache()
+    
+    @functools.cached_property
+    def estop(self):
+        return estop.EmergencyStop()
+    
+    @functools.cached_property
+    def metrics(self):
+        return metrics.Metrics()
+    
+    @functools.cached_property
+    def recorder(self):
+        return recorder.SessionRecorder()
+    
+    def on_map(self, event):
+        if event.widget is self.master and 'first_paint' not in self.startup.marks:
+            self.master.after_idle(self.on_first_paint)
+    
+    def on_first_paint(self):
+        self.startup.mark('first_paint')
+        if self.current_tab == 'Connect':
+            self.scan_devices()
     
     def create_interface(self):
         # Header with enhanced status
@@ -116,31 +161,57 @@ class EnhancedTriAxisApp:
         self.content_frame = tk.Frame(self.master, bg='white')
         self.content_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.current_tab = 'Connect'
-        self.show_connect_tab()
+        self.tab_builders = {
+            'Connect': self.build_connect_tab,
+            'Manual': self.build_manual_tab,
+            'Patterns': self.build_patterns_tab,
+            'Draw': self.build_draw_tab,
+            'About': self.build_about_tab
+        }
+        self.tab_frames = {}
+        self.current_tab = None
+        self.switch_tab('Connect')
     
     def switch_tab(self, tab_name):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        if self.current_tab in self.tab_frames:
+            self.tab_frames[self.current_tab].pack_forget()
         
         self.current_tab = tab_name
         
-        if tab_name == 'Connect':
-            self.show_connect_tab()
-        elif tab_name == 'Manual':
-            self.show_manual_tab()
-        elif tab_name == 'Patterns':
-            self.show_patterns_tab()
-        elif tab_name == 'Draw':
-            self.show_draw_tab()
-        elif tab_name == 'About':
-            self.show_about_tab()
+        # Each tab is built on first use and kept; later visits only refresh live data
+        frame = self.tab_frames.get(tab_name)
+        if frame is None:
+            frame = tk.Frame(self.content_frame, bg='white')
+            self.tab_builders[tab_name](frame)
+            self.tab_frames[tab_name] = frame
+        else:
+            self.refresh_tab(tab_name)
+        frame.pack(fill='both', expand=True)
+    
+    def invalidate_tabs(self, *tab_names):
+        # Drop cached tabs whose layout depends on the connection state
+        for tab_name in tab_names:
+            frame = self.tab_frames.pop(tab_name, None)
+            if frame:
+                frame.destroy()
     
-    def show_connect_tab(self):
-        tk.Label(self.content_frame, text="Device Connection", font=('Arial', 16, 'bold')).pack(pady=10)
+    def refresh_tab(self, tab_name):
+        if tab_name == 'About':
+            self.refresh_metrics()
+        elif tab_name == 'Connect':
+            # Rescan only once the cached results have gone stale
+            if self.connection_manager.discovery.cached(self.conn_type.get()) is None:
+                self.scan_devices()
+        elif tab_name == 'Manual' and self.connection_manager.is_connected:
+            self.conn_info_label.config(text=f"✅ Connected via {self.connection_manager.connection_type}")
+            for axis, label in self.pos_labels.items():
+                label.config(text=f"{self.motor_positions[axis]:.2f}")
+    
+    def build_connect_tab(self, parent):
+        tk.Label(parent, text="Device Connection", font=('Arial', 16, 'bold')).pack(pady=10)
         
         # Connection type selection
-        type_frame = tk.LabelFrame(self.content_frame, text="Connection Type", font=('Arial', 12, 'bold'))
+        type_frame = tk.LabelFrame(parent, text="Connection Type", font=('Arial', 12, 'bold'))
         type_frame.pack(fill='x', pady=10)
         
         self.conn_type = tk.StringVar(value="Bluetooth")
@@ -158,36 +229,47 @@ class EnhancedTriAxisApp:
         tk.Label(wifi_frame, text="Range: 100m | Power: Medium", font=('Arial', 9), fg='gray').pack(side='right')
         
         # Device list
-        self.device_frame = tk.LabelFrame(self.content_frame, text="Available Devices")
+        self.device_frame = tk.LabelFrame(parent, text="Available Devices")
         self.device_frame.pack(fill='both', expand=True, pady=10)
         
         # Scan button
-        scan_frame = tk.Frame(self.content_frame)
+        scan_frame = tk.Frame(parent)
         scan_frame.pack(fill='x', pady=5)
         
         self.scan_btn = tk.Button(scan_frame, text="🔍 Scan for Devices", bg='#3498db', fg='white',
-                                 font=('Arial', 12), command=self.scan_devices)
+                                 font=('Arial', 12), command=lambda: self.scan_devices(force=True))
         self.scan_btn.pack(side='left', padx=5)
         
         self.refresh_btn = tk.Button(scan_frame, text="🔄 Refresh", bg='#95a5a6', fg='white',
-                                   command=self.scan_devices)
+                                   command=lambda: self.scan_devices(force=True))
         self.refresh_btn.pack(side='left', padx=5)
         
+        # Shown while a connect is under way
+        self.cancel_btn = tk.Button(scan_frame, text="✖ Cancel", bg='#e67e22', fg='white',
+                                  command=self.cancel_connect)
+        
         # Connection status
-        self.status_frame = tk.Frame(self.content_frame, relief='sunken', bd=1)
+        self.status_frame = tk.Frame(parent, relief='sunken', bd=1)
         self.status_frame.pack(fill='x', pady=10)
         
         self.status_text = tk.Label(self.status_frame, text="Ready to scan for devices", 
                                    font=('Arial', 10), fg='blue')
         self.status_text.pack(pady=10)
         
-        # Auto-scan on startup
-        self.scan_devices()
+        # The first scan starts once the window is painted (on_first_paint)
+        if 'first_paint' in self.startup.marks:
+            self.scan_devices()
     
     def on_connection_type_change(self):
         self.scan_devices()
     
-    def scan_devices(self):
+    def scan_devices(self, force=False):
+        kind = self.conn_type.get()
+        icon = "🔵" if kind == "Bluetooth" else "📶"
+        self.scan_generation = getattr(self, 'scan_generation', 0) + 1
+        generation = self.scan_generation
+        self.devices_found = 0
+        
         self.scan_btn.config(state='disabled', text='Scanning...')
         self.status_text.config(text="Scanning for devices...", fg='orange')
         
@@ -195,57 +277,61 @@ class EnhancedTriAxisApp:
         for widget in self.device_frame.winfo_children():
             widget.destroy()
         
-        def scan_thread():
-            time.sleep(1)  # Simulate scan time
-            
-            if self.conn_type.get() == "Bluetooth":
-                devices = self.connection_manager.scan_bluetooth_devices()
-                icon = "🔵"
-            else:
-                devices = self.connection_manager.scan_wifi_devices()
-                icon = "📶"
-            
-            # Update UI in main thread
-            self.master.after(0, lambda: self.display_devices(devices, icon))
+        # Results arrive on the I/O loop; drop any from an older scan
+        started = time.perf_counter()
+        scan_metrics = self.metrics
+        
+        def on_device(device):
+            self.ui.post(lambda: generation == self.scan_generation and self.add_device(device, icon))
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        def on_done(devices):
+            if scan_metrics.enabled:
+                scan_metrics.link(kind).since('scan', started)
+            self.ui.post(lambda: generation == self.scan_generation and self.display_devices(devices, icon))
+        
+        self.connection_manager.discovery.scan(kind, on_device, on_done, force=force)
     
     def display_devices(self, devices, icon):
         self.scan_btn.config(state='normal', text='🔍 Scan for Devices')
         
         if not devices:
             self.status_text.config(text="No devices found", fg='red')
+            self.startup.finish()
             return
         
         self.status_text.config(text=f"Found {len(devices)} device(s)", fg='green')
+    
+    def add_device(self, device, icon):
+        self.startup.mark('first_device')
+        self.devices_found += 1
+        self.status_text.config(text=f"Found {self.devices_found} device(s), still scanning...", fg='orange')
         
-        for i, device in enumerate(devices):
-            device_frame = tk.Frame(self.device_frame, relief='raised', bd=1, bg='#f8f9fa')
-            device_frame.pack(fill='x', padx=5, pady=2)
-            
-            # Device info
-            info_frame = tk.Frame(device_frame, bg='#f8f9fa')
-            info_frame.pack(side='left', fill='x', expand=True, padx=10, pady=5)
-            
-            name_label = tk.Label(info_frame, text=f"{icon} {device['name']}", 
-                                 font=('Arial', 11, 'bold'), bg='#f8f9fa')
-            name_label.pack(anchor='w')
-            
-            if self.conn_type.get() == "Bluetooth":
-                detail_text = f"Address: {device['address']} | Signal: {device['signal']}dBm"
-            else:
-                detail_text = f"IP: {device['ip']} | Signal: {device['signal']}dBm"
-            
-            detail_label = tk.Label(info_frame, text=detail_text, font=('Arial', 9), 
-                                   fg='gray', bg='#f8f9fa')
-            detail_label.pack(anchor='w')
-            
-            # Signal strength indicator
-            signal_strength = abs(device['signal'])
-            if signal_strength < 40:
+        device_frame = tk.Frame(self.device_frame, relief='raised', bd=1, bg='#f8f9fa')
+        device_frame.pack(fill='x', padx=5, pady=2)
+        
+        # Device info
+        info_frame = tk.Frame(device_frame, bg='#f8f9fa')
+        info_frame.pack(side='left', fill='x', expand=True, padx=10, pady=5)
+        
+        name_label = tk.Label(info_frame, text=f"{icon} {device['name']}", 
+                             font=('Arial', 11, 'bold'), bg='#f8f9fa')
+        name_label.pack(anchor='w')
+        
+        if 'address' in device:
+            detail_text = f"Address: {device['address']}"
+        else:
+            detail_text = f"IP: {device['ip']} | Response: {device['latency']:.0f} ms"
+        
+        detail_label = tk.Label(info_frame, text=detail_text, font=('Arial', 9), 
+                               fg='gray', bg='#f8f9fa')
+        detail_label.pack(anchor='w')
+        
+        # Link quality indicator from the probe response time
+        if 'latency' in device:
+            if device['latency'] < 20:
                 signal_color = '#27ae60'  # Strong
                 signal_text = "●●●"
-            elif signal_strength < 55:
+            elif device['latency'] < 80:
                 signal_color = '#f39c12'  # Medium
                 signal_text = "●●○"
             else:
@@ -254,37 +340,53 @@ class EnhancedTriAxisApp:
             
             tk.Label(device_frame, text=signal_text, fg=signal_color, 
                     font=('Arial', 12), bg='#f8f9fa').pack(side='right', padx=5)
-            
-            # Connect button
-            connect_btn = tk.Button(device_frame, text="Connect", bg='#27ae60', fg='white',
-                                  command=lambda d=device: self.connect_to_device(d))
-            connect_btn.pack(side='right', padx=5, pady=5)
+        
+        # Connect button
+        connect_btn = tk.Button(device_frame, text="Connect", bg='#27ae60', fg='white',
+                              command=lambda d=device: self.connect_to_device(d))
+        connect_btn.pack(side='right', padx=5, pady=5)
     
     def connect_to_device(self, device):
         self.status_text.config(text="Connecting...", fg='orange')
+        self.cancel_btn.pack(side='left', padx=5)
+        manager = self.connection_manager
+        manager.metrics = self.metrics
+        manager.recorder = self.recorder
+        manager.on_state = self.ui.wrap(self.on_link_state)
+        
+        kind = self.conn_type.get()
+        if kind == "Bluetooth":
+            device_id, port = device['address'], None
+        else:
+            device_id, port = device['ip'], device.get('port')
         
-        def connect_thread():
-            try:
-                if self.conn_type.get() == "Bluetooth":
-                    success = self.connection_manager.connect_bluetooth(device['address'])
-                    device_id = device['address']
-                else:
-                    success = self.connection_manager.connect_wifi(device['ip'])
-                    device_id = device['ip']
-                
-                if success:
-                    self.master.after(0, lambda: self.on_connection_success(device, device_id))
-                else:
-                    self.master.after(0, lambda: self.on_connection_failed())
-                    
-            except Exception as e:
-                self.master.after(0, lambda: self.on_connection_failed(str(e)))
-        
-        threading.Thread(target=connect_thread, daemon=True).start()
+        def on_done(error):
+            if error is None:
+                self.on_connection_success(device, device_id)
+            else:
+                self.on_connection_failed(str(error))
+        
+        # Another click cancels this connect and starts over
+        manager.connect(kind, device_id, port, on_done=self.ui.wrap(on_done))
+    
+    def cancel_connect(self):
+        self.connection_manager.cancel()
+        self.cancel_btn.pack_forget()
+        self.status_text.config(text="Connect cancelled", fg='gray')
     
     def on_connection_success(self, device, device_id):
+        self.cancel_btn.pack_forget()
         self.status_text.config(text=f"Connected to {device['name']}", fg='green')
         
+        # All device writes go through the sender thread from here on
+        if self.dispatcher:
+            self.dispatcher.stop()
+            self.telemetry.stop()
+        self.dispatcher = dispatcher.CommandDispatcher(self.connection_manager).start()
+        self.dispatcher.on_error = self.on_job_error
+        self.telemetry = telemetry.TelemetryPoller(self.dispatcher).start()
+        self.master.after(telemetry.FRAME_INTERVAL, self.refresh_telemetry)
+        
         # Update header status
         conn_type = self.connection_manager.connection_type
         if conn_type == "Bluetooth":
@@ -299,30 +401,47 @@ class EnhancedTriAxisApp:
         messagebox.showinfo("Connection Successful", details)
         
         # Enable other tabs
+        self.invalidate_tabs('Manual', 'Patterns', 'Draw')
         self.switch_tab('Manual')
     
     def on_connection_failed(self, error="Connection failed"):
+        self.cancel_btn.pack_forget()
         self.status_text.config(text=error, fg='red')
         messagebox.showerror("Connection Failed", f"Could not connect to device.\n{error}")
     
-    def show_manual_tab(self):
+    def on_link_state(self, state, detail):
+        # The link dropped and is being reopened; the sender and poller
+        # carry on with whichever link is current
+        conn_type = self.connection_manager.connection_type
+        if state == "reconnecting":
+            self.connection_label.config(text=f"Reconnecting ({detail['attempt']})...", fg='#f39c12')
+        elif state == "restored":
+            self.connection_label.config(text=conn_type, fg='#3498db' if conn_type == "Bluetooth" else '#27ae60')
+            if self.telemetry:
+                self.telemetry.nudge()
+        elif state == "failed":
+            self.disconnect_device(notify=False)
+            messagebox.showerror("Connection Lost", f"Could not reconnect to the device.\n{detail}")
+    
+    def build_manual_tab(self, parent):
         if not self.connection_manager.is_connected:
-            tk.Label(self.content_frame, text="⚠️ Please connect to a device first", 
+            tk.Label(parent, text="⚠️ Please connect to a device first", 
                     font=('Arial', 14), fg='red').pack(pady=50)
-            tk.Button(self.content_frame, text="Go to Connection", bg='#3498db', fg='white',
+            tk.Button(parent, text="Go to Connection", bg='#3498db', fg='white',
                      command=lambda: self.switch_tab('Connect')).pack(pady=10)
             return
         
         # Connection info bar
-        conn_info = tk.Frame(self.content_frame, bg='#d5f4e6', relief='raised', bd=1)
+        conn_info = tk.Frame(parent, bg='#d5f4e6', relief='raised', bd=1)
         conn_info.pack(fill='x', pady=(0, 10))
         
         conn_text = f"Connected via {self.connection_manager.connection_type}"
-        tk.Label(conn_info, text=f"✅ {conn_text}", bg='#d5f4e6', 
-                font=('Arial', 10, 'bold')).pack(pady=5)
+        self.conn_info_label = tk.Label(conn_info, text=f"✅ {conn_text}", bg='#d5f4e6', 
+                                       font=('Arial', 10, 'bold'))
+        self.conn_info_label.pack(pady=5)
         
         # Position display
-        pos_frame = tk.LabelFrame(self.content_frame, text="Current Position")
+        pos_frame = tk.LabelFrame(parent, text="Current Position")
         pos_frame.pack(fill='x', pady=5)
         
         self.pos_labels = {}
@@ -331,95 +450,456 @@ class EnhancedTriAxisApp:
             self.pos_labels[axis] = tk.Label(pos_frame, text="0.00", font=('Arial', 10, 'bold'))
             self.pos_labels[axis].grid(row=0, column=i*2+1, padx=5, pady=5)
         
+        # Live X/Y/Z trace from device telemetry
+        trace_canvas = tk.Canvas(pos_frame, width=400, height=80, bg='#fdfefe', highlightthickness=0)
+        trace_canvas.grid(row=1, column=0, columnspan=6, padx=5, pady=(0, 5))
+        self.trace_plot = telemetry.TracePlot(trace_canvas, 400, 80)
+        
         # Motor controls
         for axis in ['X', 'Y', 'Z']:
-            motor_frame = tk.LabelFrame(self.content_frame, text=f"{axis}-Axis Control")
+            motor_frame = tk.LabelFrame(parent, text=f"{axis}-Axis Control")
             motor_frame.pack(fill='x', pady=3)
             
             tk.Label(motor_frame, text="Speed:").grid(row=0, column=0, padx=5, pady=2)
             speed_scale = tk.Scale(motor_frame, from_=0, to=1000, orient='horizontal')
             speed_scale.set(self.motor_speeds[axis])
+            speed_scale.config(command=lambda value, a=axis: self.set_motor_speed(a, value))
             speed_scale.grid(row=0, column=1, columnspan=2, sticky='ew', padx=5)
             
-            tk.Button(motor_frame, text="←", command=lambda a=axis: self.move_motor(a, -1)).grid(row=1, column=0, padx=2, pady=2)
-            tk.Button(motor_frame, text="→", command=lambda a=axis: self.move_motor(a, 1)).grid(row=1, column=2, padx=2, pady=2)
+            # Held down, the axis runs at the slider speed until let go
+            self.jog_button(motor_frame, "←", {axis: -1}).grid(row=1, column=0, padx=2, pady=2)
+            self.jog_button(motor_frame, "→", {axis: 1}).grid(row=1, column=2, padx=2, pady=2)
             
             motor_frame.columnconfigure(1, weight=1)
         
+        diagonal_frame = tk.LabelFrame(parent, text="XY Diagonal")
+        diagonal_frame.pack(fill='x', pady=3)
+        for i, (text, x, y) in enumerate(DIAGONALS):
+            self.jog_button(diagonal_frame, text, {'X': x, 'Y': y}).grid(row=0, column=i, padx=2, pady=2)
+            diagonal_frame.columnconfigure(i, weight=1)
+        tk.Label(parent, text=f"Arrow keys nudge X/Y and Page Up/Down Z by {NUDGE_STEPS} steps",
+                 font=('Arial', 9), fg='gray').pack()
+        
+        # Every command sent and status sample goes to the session log
+        self.record_button = tk.Button(parent, command=self.toggle_recording)
+        self.record_button.pack(pady=(10, 0))
+        self.show_recording_state()
+        
         # Disconnect button
-        tk.Button(self.content_frame, text="Disconnect", bg='#e74c3c', fg='white',
+        tk.Button(parent, text="Disconnect", bg='#e74c3c', fg='white',
                  command=self.disconnect_device).pack(pady=10)
     
-    def show_patterns_tab(self):
+    def build_patterns_tab(self, parent):
         if not self.connection_manager.is_connected:
-            tk.Label(self.content_frame, text="⚠️ Please connect to a device first", 
+            tk.Label(parent, text="⚠️ Please connect to a device first", 
                     font=('Arial', 14), fg='red').pack(pady=50)
             return
         
-        tk.Label(self.content_frame, text="Pattern Library", font=('Arial', 16, 'bold')).pack(pady=10)
+        tk.Label(parent, text="Pattern Library", font=('Arial', 16, 'bold')).pack(pady=10)
         
         patterns = [("Circle", "Perfect circles"), ("Square", "Precise squares"), ("Spiral", "Spiral movements")]
         
         for pattern_name, description in patterns:
-            pattern_frame = tk.Frame(self.content_frame, relief='raised', bd=1)
+            pattern_frame = tk.Frame(parent, relief='raised', bd=1)
             pattern_frame.pack(fill='x', pady=2)
             
             tk.Label(pattern_frame, text=pattern_name, font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=2)
             tk.Label(pattern_frame, text=description, font=('Arial', 9)).pack(anchor='w', padx=10)
-            tk.Button(pattern_frame, text="Execute", bg='#3498db', fg='white').pack(side='right', padx=10, pady=5)
+            tk.Button(pattern_frame, text="Execute", bg='#3498db', fg='white',
+                     command=lambda p=pattern_name: self.execute_pattern(p)).pack(side='right', padx=10, pady=5)
+        
+        # CAM output and drawings are streamed straight from the file
+        job_frame = tk.Frame(parent, relief='raised', bd=1)
+        job_frame.pack(fill='x', pady=2)
+        
+        tk.Label(job_frame, text="Import Job", font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=2)
+        tk.Label(job_frame, text="G-code or SVG file", font=('Arial', 9)).pack(anchor='w', padx=10)
+        tk.Button(job_frame, text="Open...", bg='#3498db', fg='white',
+                 command=self.import_job).pack(side='right', padx=10, pady=5)
+        tk.Checkbutton(job_frame, text="Upload and run from controller flash", font=('Arial', 9),
+                      variable=self.precompile_job).pack(anchor='w', padx=10)
+        self.job_info = tk.Label(job_frame, text="", font=('Arial', 9), fg='gray')
+        self.job_info.pack(anchor='w', padx=10)
+        
+        # Images are scanned line by line, closed shapes hatched
+        fill_frame = tk.Frame(parent, relief='raised', bd=1)
+        fill_frame.pack(fill='x', pady=2)
+        
+        tk.Label(fill_frame, text="Fill / Engrave", font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=2)
+        tk.Label(fill_frame, text="Image (PGM, PBM, PNG) or closed SVG shapes", font=('Arial', 9)).pack(anchor='w', padx=10)
+        tk.Button(fill_frame, text="Open...", bg='#3498db', fg='white',
+                 command=self.import_fill).pack(side='right', padx=10, pady=5)
+        
+        # Sessions recorded from the Manual tab, newest first
+        for path in recorder.list_recordings()[:RECENT_RECORDINGS]:
+            try:
+                log = recorder.SessionLog(path)
+            except (OSError, recorder.RecorderError):
+                continue
+            recording_frame = tk.Frame(parent, relief='raised', bd=1)
+            recording_frame.pack(fill='x', pady=2)
+            
+            name = os.path.splitext(os.path.basename(path))[0]
+            tk.Label(recording_frame, text=name, font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=2)
+            tk.Label(recording_frame, text=f"Recorded session, {log.duration:.0f} s",
+                    font=('Arial', 9)).pack(anchor='w', padx=10)
+            tk.Button(recording_frame, text="Execute", bg='#3498db', fg='white',
+                     command=lambda p=path: self.execute_recording(p)).pack(side='right', padx=10, pady=5)
+            tk.Button(recording_frame, text="Replay",
+                     command=lambda p=path: self.replay_recording(p)).pack(side='right', pady=5)
     
-    def show_draw_tab(self):
+    def build_draw_tab(self, parent):
         if not self.connection_manager.is_connected:
-            tk.Label(self.content_frame, text="⚠️ Please connect to a device first", 
+            tk.Label(parent, text="⚠️ Please connect to a device first", 
                     font=('Arial', 14), fg='red').pack(pady=50)
             return
         
-        tk.Label(self.content_frame, text="3D Signature Replicator", font=('Arial', 16, 'bold')).pack(pady=10)
+        tk.Label(parent, text="3D Signature Replicator", font=('Arial', 16, 'bold')).pack(pady=10)
         
-        self.canvas = tk.Canvas(self.content_frame, width=400, height=200, bg='white', relief='sunken', bd=2)
+        self.canvas = tk.Canvas(parent, width=DRAW_CANVAS[0], height=DRAW_CANVAS[1], bg='white',
+                               relief='sunken', bd=2)
         self.canvas.pack(pady=10)
-        
-        control_frame = tk.Frame(self.content_frame)
+        self.canvas.bind('<ButtonPress-1>', self.on_stroke_start)
+        self.canvas.bind('<B1-Motion>', self.on_stroke_move)
+        # A fresh canvas starts blank, so the recorded strokes go with it
+        self.stroke_recorder.clear()
+        self.stroke_buffer.clear()
+        self.stroke_view = canvas_view.TkStrokeView(self.canvas, self.stroke_buffer).start()
+        if self.job_preview:
+            canvas_view.draw_preview(self.canvas, self.job_preview)
+        
+        control_frame = tk.Frame(parent)
         control_frame.pack(pady=10)
         
         tk.Button(control_frame, text="Clear", command=self.clear_canvas).pack(side='left', padx=5)
-        tk.Button(control_frame, text="Execute 3D", bg='#e67e22', fg='white').pack(side='left', padx=5)
+        tk.Button(control_frame, text="Execute 3D", bg='#e67e22', fg='white',
+                 command=self.execute_signature).pack(side='left', padx=5)
+        
+        self.draw_info = tk.Label(parent, text="", font=('Arial', 9), fg='gray')
+        self.draw_info.pack()
+    
+    def jog_button(self, parent, text, directions):
+        # directions: axis -> -1 or 1
+        button = tk.Button(parent, text=text)
+        button.bind('<ButtonPress-1>', lambda event: self.start_jog(directions))
+        button.bind('<ButtonRelease-1>', lambda event: self.stop_jog(list(directions)))
+        return button
+    
+    def jog_control(self):
+        # One per link; after a reconnect the new link gets a new one
+        link = self.connection_manager.transport
+        if link is None:
+            return None
+        if self.jogger is None or self.jogger.link is not link:
+            self.jogger = jog.JogController(link, recorder=self.connection_manager.recorder)
+        return self.jogger
+    
+    def start_jog(self, directions):
+        started = time.perf_counter()
+        jogger = self.jog_control()
+        if jogger is None:
+            return
+        jogger.press({axis: direction * self.motor_speeds[axis] for axis, direction in directions.items()})
+        self.telemetry.nudge()
+        self.record_ui(started)
+    
+    def stop_jog(self, axes=None):
+        if self.jogger:
+            self.jogger.release(axes)
+    
+    def on_nudge_key(self, event):
+        # Only on the Manual tab, and not while a slider has the keys
+        if self.current_tab != 'Manual' or self.dispatcher is None or isinstance(event.widget, tk.Scale):
+            return
+        self.move_motor(*NUDGE_KEYS[event.keysym])
     
     def move_motor(self, axis, direction):
-        step_size = 10 * direction
-        self.motor_positions[axis] += step_size
-        self.pos_labels[axis].config(text=f"{self.motor_positions[axis]:.2f}")
-        
-        # Send command via current connection
-        command = {
-            "axis": axis,
-            "steps": step_size,
-            "speed": self.motor_speeds[axis],
-            "connection": self.connection_manager.connection_type
-        }
-        print(f"Sending command: {json.dumps(command)}")
+        # Key repeat sends these faster than the link; the dispatcher adds
+        # up the ones still queued into a single move
+        started = time.perf_counter()
+        self.dispatcher.submit({"action": "move", "axis": axis, "steps": NUDGE_STEPS * direction,
+                                "speed": self.motor_speeds[axis]})
+        self.telemetry.nudge()
+        self.record_ui(started)
+    
+    def set_motor_speed(self, axis, value):
+        self.motor_speeds[axis] = int(float(value))
+        # A held jog follows the slider
+        if self.jogger and self.jogger.velocity[axis]:
+            direction = 1 if self.jogger.velocity[axis] > 0 else -1
+            self.jogger.press({axis: direction * self.motor_speeds[axis]})
+    
+    def execute_pattern(self, pattern_name):
+        started = time.perf_counter()
+        rows = self.pattern_cache.pattern(pattern_name)
+        self.dispatcher.submit_stream(planner.planned_commands([rows]))
+        self.telemetry.nudge()
+        self.record_ui(started)
+    
+    def execute_recording(self, path):
+        # The positions the session went through, as one planned path
+        started = time.perf_counter()
+        try:
+            log = recorder.SessionLog(path)
+            stat = os.stat(path)
+        except (OSError, recorder.RecorderError) as e:
+            messagebox.showerror("Recording", str(e))
+            return
+        calibration = self.pattern_cache.calibration
+        params = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime}
+        rows = self.pattern_cache.get("recording", params, lambda: log.planned_rows(
+            calibration["max_speed"], calibration["acceleration"]))
+        if len(rows) == 0:
+            return
+        self.dispatcher.submit_stream(planner.planned_commands([rows]))
+        self.telemetry.nudge()
+        self.record_ui(started)
+    
+    def replay_recording(self, path):
+        # Sends the recorded commands again with their original timing
+        try:
+            log = recorder.SessionLog(path)
+        except (OSError, recorder.RecorderError) as e:
+            messagebox.showerror("Recording", str(e))
+            return
+        if self.replayer:
+            self.replayer.stop()
+        self.replayer = recorder.Replayer(log, self.dispatcher).start()
+        self.telemetry.nudge()
+    
+    def toggle_recording(self):
+        if not self.recorder.recording:
+            try:
+                self.recorder.start()
+            except OSError as e:
+                messagebox.showerror("Recording", str(e))
+                return
+            self.show_recording_state()
+            return
+        path = self.recorder.stop()
+        self.show_recording_state()
+        messagebox.showinfo("Recording Saved", f"{self.recorder.records} records saved to\n{path}\n"
+                                               "It is listed in the Pattern Library.")
+        self.invalidate_tabs('Patterns')
+    
+    def show_recording_state(self):
+        if self.recorder.recording:
+            self.record_button.config(text="■ Stop Recording", bg='#e74c3c', fg='white')
+        else:
+            self.record_button.config(text="● Record Session", bg='#ecf0f1', fg='black')
     
-    def disconnect_device(self):
+    def record_ui(self, started):
+        # Time spent in the button handler, up to the command being queued
+        if self.metrics.enabled and self.connection_manager.connection_type:
+            self.metrics.link(self.connection_manager.connection_type).since('ui', started)
+    
+    def import_job(self):
+        path = filedialog.askopenfilename(
+            title="Import Job",
+            filetypes=[("Jobs", "*.gcode *.nc *.ngc *.tap *.svg"), ("All files", "*.*")])
+        if not path:
+            return
+        if self.dispatcher is None:
+            messagebox.showerror("Not Connected", "Connect to a device first")
+            return
+        try:
+            blocks = self.tap_job_preview(job_import.load(path, order=True, on_report=self.on_job_report))
+        except job_import.JobError as e:
+            messagebox.showerror("Import Failed", str(e))
+            return
+        if self.precompile_job.get():
+            # The whole job is compiled to a step table and uploaded before it starts
+            latest = self.telemetry.history.latest()
+            start = latest[1] if latest else [self.motor_positions[a] for a in codec.AXES]
+            threading.Thread(target=self.run_step_table,
+                             args=(blocks, start, dict(self.pattern_cache.calibration),
+                                   self.dispatcher, self.telemetry), daemon=True).start()
+        else:
+            # Parsing runs on the sender thread, a block at a time
+            self.dispatcher.submit_stream(planner.planned_commands(planner.lookahead_blocks(blocks)))
+        self.telemetry.nudge()
+    
+    def run_step_table(self, blocks, start, calibration, dispatcher, poller):
+        # Uploaded through the dispatcher the job started with, unless the
+        # device was disconnected while the table compiled
+        try:
+            table = step_tables.compile_table(blocks, start, calibration["max_speed"],
+                                              calibration["acceleration"])
+        except (job_import.JobError, step_tables.StepTableError, OSError, ValueError) as e:
+            self.on_job_error(e)
+            return
+        if self.dispatcher is not dispatcher:
+            self.on_job_error("Device disconnected before the job was sent")
+            return
+        dispatcher.submit_stream(step_tables.upload_commands(table))
+        poller.nudge()
+    
+    def import_fill(self):
+        path = filedialog.askopenfilename(
+            title="Fill / Engrave",
+            filetypes=[("Images and drawings", "*.pgm *.pbm *.png *.bmp *.jpg *.svg"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            messagebox.showerror("Import Failed", str(e))
+            return
+        if self.dispatcher is None:
+            messagebox.showerror("Not Connected", "Connect to a device first")
+            return
+        latest = self.telemetry.history.latest()
+        start = latest[1] if latest else [self.motor_positions[a] for a in codec.AXES]
+        threading.Thread(target=self.run_fill,
+                         args=(path, stat, self.pattern_cache, self.precompile_job.get(), start,
+                               self.dispatcher, self.telemetry),
+                         daemon=True).start()
+    
+    def run_fill(self, path, stat, cache, precompile, start, dispatcher, poller):
+        # Compiled across the cores, then kept in the pattern cache until
+        # the file changes. Sent through the dispatcher the job started
+        # with, unless the device was disconnected in the meantime.
+        params = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime}
+        steps_per_mm = cache.calibration["steps_per_mm"]
+        try:
+            rows = cache.get("fill", params, lambda: fill.load(path, steps_per_mm))
+        except (fill.FillError, job_import.JobError, OSError, ValueError) as e:
+            self.on_job_error(e)
+            return
+        if precompile:
+            self.run_step_table(fill.fill_blocks(rows), start, dict(cache.calibration), dispatcher, poller)
+        elif self.dispatcher is not dispatcher:
+            self.on_job_error("Device disconnected before the job was sent")
+            return
+        else:
+            dispatcher.submit_stream(planner.planned_commands(planner.lookahead_blocks(fill.fill_blocks(rows))))
+            poller.nudge()
+        lines = canvas_view.preview_lines(fill.fill_blocks(rows), *DRAW_CANVAS)
+        self.master.after(0, lambda: self.show_job_preview(lines))
+    
+    def tap_job_preview(self, blocks):
+        # Hands the job's blocks on to whichever thread sends them and keeps
+        # them for the Draw tab's toolpath preview, built once the parse
+        # reaches the end of the file
+        seen = []
+        for block in blocks:
+            seen.append(block)
+            yield block
+        threading.Thread(target=self.build_job_preview, args=(seen,), daemon=True).start()
+    
+    def build_job_preview(self, blocks):
+        lines = canvas_view.preview_lines(blocks, *DRAW_CANVAS)
+        self.master.after(0, lambda: self.show_job_preview(lines))
+    
+    def show_job_preview(self, lines):
+        self.job_preview = lines
+        if self.stroke_view and self.canvas.winfo_exists():
+            canvas_view.draw_preview(self.canvas, lines)
+    
+    def on_job_report(self, report):
+        self.master.after(0, lambda: self.job_info.config(text=self.order_summary(report)))
+    
+    def order_summary(self, report):
+        return (f"Pen-up travel {report['travel_before']:,.0f} → {report['travel_after']:,.0f} steps | "
+                f"Est. {report['time_before']:.1f} s → {report['time_after']:.1f} s")
+    
+    def on_job_error(self, error):
+        self.master.after(0, lambda: messagebox.showerror("Job Stopped", str(error)))
+    
+    def refresh_telemetry(self):
+        if self.telemetry is None:
+            return
+        status = self.telemetry.status
+        if status:
+            self.motor_positions.update(status.get("positions", {}))
+            if self.current_tab == 'Manual' and self.trace_plot and self.trace_plot.canvas.winfo_exists():
+                for axis, label in self.pos_labels.items():
+                    text = f"{self.motor_positions[axis]:.2f}"
+                    if label.cget('text') != text:
+                        label.config(text=text)
+                self.trace_plot.refresh(self.telemetry.history)
+        self.master.after(telemetry.FRAME_INTERVAL, self.refresh_telemetry)
+    
+    def disconnect_device(self, notify=True):
+        self.stop_jog()
+        self.jogger = None
+        if self.replayer:
+            self.replayer.stop()
+            self.replayer = None
+        if self.dispatcher:
+            self.dispatcher.stop()
+            self.telemetry.stop()
+            self.dispatcher = None
+            self.telemetry = None
+        self.trace_plot = None
         self.connection_manager.disconnect()
         self.connection_icon.config(text="📶")
         self.connection_label.config(text="Disconnected", fg='#e74c3c')
-        messagebox.showinfo("Disconnected", "Device disconnected successfully")
+        if notify:
+            messagebox.showinfo("Disconnected", "Device disconnected successfully")
+        self.invalidate_tabs('Manual', 'Patterns', 'Draw')
         self.switch_tab('Connect')
     
     def emergency_stop(self):
-        if self.connection_manager.is_connected:
-            print("EMERGENCY STOP - All motors halted!")
-            messagebox.showwarning("Emergency Stop", "All motors have been stopped!")
+        # Straight onto the link, ahead of the queue and the ack window;
+        # the confirmation shows up once the device answers
+        manager = self.connection_manager
+        if not manager.is_connected or manager.transport is None:
+            return
+        dispatchers = [self.dispatcher] if self.dispatcher else []
+        self.estop.trigger({manager.connection_type: manager.transport}, dispatchers,
+                           on_result=lambda result: self.master.after(0, lambda: self.on_emergency_stop(result)))
+    
+    def on_emergency_stop(self, result):
+        if result["worst"] is not None:
+            messagebox.showwarning("Emergency Stop", estop.stop_summary(result))
+        else:
+            messagebox.showerror("Emergency Stop", estop.stop_summary(result) +
+                                 "\nUse the hardware stop if anything is still moving.")
+    
+    def on_stroke_start(self, event):
+        self.stroke_buffer.begin(event.x, event.y)
+    
+    def on_stroke_move(self, event):
+        # Drawn with the next frame, not per event
+        self.stroke_buffer.add(event.x, event.y)
+    
+    def execute_signature(self):
+        started = time.perf_counter()
+        reports = []
+        
+        def build():
+            strokes, report = stroke_order.optimize(self.stroke_recorder.strokes())
+            reports.append(report)
+            return signature.signature_points(strokes)
+        
+        # Redrawing the same signature reuses its ordered, simplified points
+        params = {"strokes": self.stroke_recorder.fingerprint(),
+                  "steps_per_pixel": self.stroke_recorder.steps_per_pixel,
+                  "tolerance": signature.SIMPLIFY_TOLERANCE}
+        points = self.pattern_cache.get("signature", params, build)
+        if len(points) == 0:
+            return
+        if reports:
+            self.draw_info.config(text=self.order_summary(reports[0]))
+        # The firmware runs each chunk before reading the next line, so wait
+        # for its status reply between chunks
+        self.dispatcher.submit_stream(signature.signature_commands(points), batch=1, ack_timeout=30.0)
+        self.telemetry.nudge()
+        self.record_ui(started)
     
     def clear_canvas(self):
         self.canvas.delete("all")
+        self.stroke_view.clear()
+        self.stroke_recorder.clear()
+        self.job_preview = None
     
-    def show_about_tab(self):
-        tk.Label(self.content_frame, text="TriAxis Pro", font=('Arial', 20, 'bold')).pack(pady=10)
-        tk.Label(self.content_frame, text="Professional 3-Axis Stepper Motor Controller", 
+    def build_about_tab(self, parent):
+        tk.Label(parent, text="TriAxis Pro", font=('Arial', 20, 'bold')).pack(pady=10)
+        tk.Label(parent, text="Professional 3-Axis Stepper Motor Controller", 
                 font=('Arial', 12)).pack(pady=5)
         
-        info_frame = tk.LabelFrame(self.content_frame, text="Developer Information")
+        info_frame = tk.LabelFrame(parent, text="Developer Information")
         info_frame.pack(fill='x', pady=20, padx=20)
         
         tk.Label(info_frame, text="Developer: Amol M.", font=('Arial', 12, 'bold')).pack(pady=5)
@@ -428,7 +908,7 @@ class EnhancedTriAxisApp:
         tk.Label(info_frame, text="Specializing in Precision Motion Control Solutions", 
                 font=('Arial', 10), fg='gray').pack(pady=5)
         
-        features_frame = tk.LabelFrame(self.content_frame, text="App Features")
+        features_frame = tk.LabelFrame(parent, text="App Features")
         features_frame.pack(fill='x', pady=10, padx=20)
         
         features = [
@@ -443,9 +923,49 @@ class EnhancedTriAxisApp:
         for feature in features:
             tk.Label(features_frame, text=feature, font=('Arial', 10)).pack(anchor='w', padx=10, pady=2)
         
-        tk.Label(self.content_frame, text="Version 1.0 | © 2024 APEX PRECISION MECHATRONIX", 
+        # Command latency, measured only while the box is ticked
+        metrics_frame = tk.LabelFrame(parent, text="Live Latency")
+        metrics_frame.pack(fill='x', pady=10, padx=20)
+        
+        self.metrics_enabled = tk.BooleanVar(value=self.metrics.enabled)
+        tk.Checkbutton(metrics_frame, text="Measure command latency", variable=self.metrics_enabled,
+                      command=self.toggle_metrics).pack(anchor='w', padx=10)
+        self.metrics_label = tk.Label(metrics_frame, text="", font=('Courier', 8), justify='left')
+        self.metrics_label.pack(anchor='w', padx=10)
+        tk.Button(metrics_frame, text="Export...", command=self.export_metrics).pack(anchor='e', padx=10, pady=2)
+        
+        tk.Label(parent, text="Version 1.0 | © 2024 APEX PRECISION MECHATRONIX", 
                 font=('Arial', 9), fg='gray').pack(side='bottom', pady=20)
 
+    def toggle_metrics(self):
+        self.metrics.enabled = self.metrics_enabled.get()
+        self.refresh_metrics()
+    
+    def refresh_metrics(self):
+        # Redraws while the About tab is showing and measuring
+        if self.metrics_job:
+            self.master.after_cancel(self.metrics_job)
+            self.metrics_job = None
+        if self.metrics_label is None or not self.metrics_label.winfo_exists():
+            return
+        if not self.metrics.enabled:
+            self.metrics_label.config(text="Off")
+            return
+        self.metrics_label.config(text=self.metrics.overlay_text())
+        if self.current_tab == 'About':
+            self.metrics_job = self.master.after(500, self.refresh_metrics)
+    
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Metrics", defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if not path:
+            return
+        try:
+            self.metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = EnhancedTriAxisApp(root)
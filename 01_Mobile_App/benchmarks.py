@@ -0,0 +1,300 @@
+# TriAxis Pro Benchmarks
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Headless benchmark suite for the motion pipeline: codec encode/decode,
+# pattern trajectories, signature simplification and chunking, end-to-end
+# delivery against the simulated controller over Bluetooth- and WiFi-like
+# links, and Tk tab build/switch times (skipped when there is no display).
+#
+# Each run can be saved under a label (usually the release) in a JSON
+# baseline file, and is compared against the newest saved run: a result
+# that is worse than its baseline by more than its threshold is reported as
+# a regression and the exit status is 1. Wall-clock timings are compared
+# relative to a fixed reference loop timed in between their samples, so a
+# slower machine or a throttled CPU doesn't read as a regression.
+#
+#   python benchmarks.py                    # run and compare
+#   python benchmarks.py --save 1.1         # run and store as release 1.1
+#   python benchmarks.py --only codec,e2e   # some groups only
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import codec
+import planner
+import signature
+import simulator
+import transport
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+DEFAULT_THRESHOLD = 0.25   # fraction worse than baseline that counts as a regression
+WALL_THRESHOLD = 0.5       # wall-clock timings swing more between runs
+MIN_SAMPLE_TIME = 0.02     # seconds per timing sample; short calls are looped
+REPEATS = 15
+GROUPS = ('codec', 'planner', 'signature', 'e2e', 'tk')
+
+
+def loops_for(function):
+    # How many calls make one sample of at least MIN_SAMPLE_TIME
+    number = 1
+    while True:
+        elapsed = sample(function, number)
+        if elapsed * number >= MIN_SAMPLE_TIME or number >= 1 << 20:
+            return number
+        number *= 2 if elapsed <= 0 else max(2, int(MIN_SAMPLE_TIME / (elapsed * number)))
+
+
+def sample(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def reference_loop():
+    # Plain interpreter work, timed next to every benchmark
+    return sum(i * i for i in range(2000))
+
+
+def timing(function, unit='ms'):
+    # Time per call. Samples alternate with the reference loop and the
+    # median ratio between them is kept, so the CPU running faster or
+    # slower for a moment shifts both alike.
+    number = loops_for(function)
+    reference_number = loops_for(reference_loop)
+    ratios = []
+    reference = float('inf')
+    for _ in range(REPEATS):
+        seconds = sample(function, number)
+        loop = sample(reference_loop, reference_number)
+        ratios.append(seconds / loop)
+        reference = min(reference, loop)
+    entry = result(statistics.median(ratios) * reference * (1e3 if unit == 'ms' else 1e6), unit)
+    entry["reference_us"] = reference * 1e6
+    return entry
+
+
+def result(value, unit, better='lower', threshold=None):
+    entry = {"value": float(value), "unit": unit, "better": better}
+    if threshold is None and unit in ('us', 'ms'):
+        threshold = WALL_THRESHOLD
+    if threshold is not None:
+        entry["threshold"] = threshold
+    return entry
+
+
+def random_strokes(count, length, seed=11):
+    rng = np.random.default_rng(seed)
+    return [rng.uniform(0, 400, 2) + np.cumsum(rng.normal(0, 1.5, (length, 2)), axis=0)
+            for _ in range(count)]
+
+
+def bench_codec():
+    results = {}
+    rows = planner.plan_pattern('circle', 2000, 2000, profile='lookahead').segments()
+    planned = np.column_stack([rows, rows[:, 3], rows[:, 3]])[:planner.PLANNED_CHUNK]
+    points = signature.signature_points(random_strokes(4, 200))[:signature.points_per_chunk()]
+    commands = {
+        "move": {"action": "move", "axis": "X", "steps": 10, "speed": 500},
+        "path": {"action": "path", "seg": planned},
+        "signature": {"action": "signature", "style": "normal", "points": points},
+    }
+    for name, command in commands.items():
+        data = codec.encode_json(command)
+        results[f"codec.{name}.json.encode"] = timing(lambda: codec.encode_json(command), "us")
+        results[f"codec.{name}.json.decode"] = timing(lambda: json.loads(data), "us")
+        results[f"codec.{name}.json.bytes"] = result(len(data), "bytes", threshold=0.0)
+        frame = codec.encode_binary(command, 1)
+
+        def decode():
+            frame_type, _, payload, _ = codec.split_frame(frame)
+            return codec.decode_payload(frame_type, payload)
+
+        results[f"codec.{name}.bin1.encode"] = timing(lambda: codec.encode_binary(command, 1), "us")
+        results[f"codec.{name}.bin1.decode"] = timing(decode, "us")
+        results[f"codec.{name}.bin1.bytes"] = result(len(frame), "bytes", threshold=0.0)
+    return results
+
+
+def bench_planner():
+    # Circle and spiral at growing segment counts; a square is always its
+    # four corners
+    results = {}
+    cases = [('circle', n) for n in (100, 1000, 10000)] + [('spiral', n) for n in (100, 1000, 10000)]
+    for pattern, segments in cases + [('square', None)]:
+        make = lambda: planner.plan_pattern(pattern, 5000, 2000, profile='lookahead', segments=segments)
+        rows = make().segments()
+        key = f"planner.{pattern}.{len(rows)}"
+        results[f"{key}.plan_ms"] = timing(make)
+        results[f"{key}.lookahead_ms"] = timing(lambda: list(planner.lookahead_blocks([rows])))
+    return results
+
+
+def bench_signature():
+    results = {}
+    for count, length in ((5, 200), (20, 500), (50, 2000)):
+        strokes = random_strokes(count, length)
+        key = f"signature.{count}x{length}"
+        results[f"{key}.simplify_ms"] = timing(lambda: [signature.simplify(s) for s in strokes])
+        points = signature.signature_points(strokes)
+        results[f"{key}.points"] = result(len(points), "points", threshold=0.0)
+        results[f"{key}.chunk_ms"] = timing(lambda: list(signature.signature_commands(points)))
+        results[f"{key}.chunks"] = result(len(list(signature.signature_commands(points))), "commands",
+                                          threshold=0.0)
+    return results
+
+
+def bench_e2e():
+    # Virtual-clock figures from the simulated controller, through the real
+    # transport and ack window
+    results = {}
+    trajectory = planner.plan_pattern('spiral', 5000, 2000)
+    spiral = list(trajectory.path_commands())
+    spiral_target = [int(v) for v in trajectory.segments()[-1][:3]]
+    jogs = [{"action": "move", "axis": "X", "steps": 1, "speed": 2000} for _ in range(500)]
+    jog_target = [500, 0, 0]
+    for profile in (simulator.BLUETOOTH_SPP, simulator.WIFI):
+        link = "bt" if profile is simulator.BLUETOOTH_SPP else "wifi"
+        for encoding in (codec.JSON_CODEC, codec.BINARY_CODEC):
+            for job, commands, target in (("jog", jogs, jog_target), ("spiral", spiral, spiral_target)):
+                run = transport.measure_delivery(commands, target, 'ack window', encoding, profile=profile)
+                key = f"e2e.{link}.{encoding}.{job}"
+                results[f"{key}.job_s"] = result(run["job_time"], "s")
+                results[f"{key}.commands_per_s"] = result(len(commands) / run["job_time"], "cmd/s",
+                                                          better='higher')
+                results[f"{key}.end_error"] = result(run["error"], "steps", threshold=0.0)
+    return results
+
+
+def bench_tk():
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        raise RuntimeError("no display")
+    import tab_timing
+    build, switch = tab_timing.measure()
+    results = {}
+    for tab in tab_timing.TABS:
+        results[f"tk.{tab.lower()}.build_ms"] = result(build[tab], "ms")
+        results[f"tk.{tab.lower()}.switch_ms"] = result(switch[tab][len(switch[tab]) // 2], "ms")
+    return results
+
+
+BENCHMARKS = {'codec': bench_codec, 'planner': bench_planner, 'signature': bench_signature,
+              'e2e': bench_e2e, 'tk': bench_tk}
+
+
+def run(groups=GROUPS):
+    results = {}
+    skipped = {}
+    for group in groups:
+        started = time.perf_counter()
+        try:
+            results.update(BENCHMARKS[group]())
+        except RuntimeError as e:
+            skipped[group] = str(e)
+            print(f"{group}: skipped ({e})", file=sys.stderr)
+            continue
+        print(f"{group}: {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return results, skipped
+
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "numpy": np.__version__}
+
+
+def load_baselines(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"threshold": DEFAULT_THRESHOLD, "runs": []}
+
+
+def save_run(baselines, label, results, path=BASELINE_FILE):
+    # A label saved again replaces its earlier run
+    baselines["runs"] = [r for r in baselines["runs"] if r["label"] != label]
+    baselines["runs"].append({"label": label, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                              "machine": machine(), "results": results})
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+
+
+def compare(results, baseline, default_threshold=DEFAULT_THRESHOLD):
+    # Rows of (name, old, new, change, regressed) for results in both runs
+    rows = []
+    for name, new in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        threshold = old.get("threshold", default_threshold)
+        before, after = old["value"], new["value"]
+        if "reference_us" in old and "reference_us" in new:
+            # In the baseline machine's time
+            after *= old["reference_us"] / new["reference_us"]
+        if before == 0:
+            change = 0.0 if after == 0 else float('inf')
+        else:
+            change = (after - before) / abs(before)
+        worse = change if new["better"] == 'lower' else -change
+        rows.append((name, before, after, change, worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TriAxis Pro motion pipeline benchmarks")
+    parser.add_argument("--only", help="comma-separated groups: " + ", ".join(GROUPS))
+    parser.add_argument("--save", metavar="LABEL", help="store this run as a baseline under LABEL")
+    parser.add_argument("--against", metavar="LABEL", help="baseline to compare with (default: newest)")
+    parser.add_argument("--baselines", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    groups = args.only.split(',') if args.only else GROUPS
+    unknown = [g for g in groups if g not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown group: " + ", ".join(unknown))
+    results, skipped = run(groups)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"machine": machine(), "results": results, "skipped": skipped}, f, indent=1)
+
+    baselines = load_baselines(args.baselines)
+    runs = baselines["runs"]
+    if args.against:
+        runs = [r for r in runs if r["label"] == args.against]
+        if not runs:
+            parser.error(f"no baseline labelled {args.against}")
+    regressions = 0
+    if runs:
+        reference = runs[-1]
+        print(f"compared with {reference['label']} ({reference['time']})")
+        print(f"{'benchmark':44} {'baseline':>12} {'now':>12} {'change':>8}")
+        for name, before, after, change, regressed in compare(results, reference["results"],
+                                                               baselines.get("threshold", DEFAULT_THRESHOLD)):
+            regressions += regressed
+            unit = results[name]["unit"]
+            print(f"{name:44} {before:12.4g} {after:12.4g} {change * 100:+7.1f}% {unit}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    else:
+        for name, entry in sorted(results.items()):
+            print(f"{name:44} {entry['value']:12.4g} {entry['unit']}")
+
+    if args.save:
+        save_run(baselines, args.save, results, args.baselines)
+        print(f"saved as {args.save} in {args.baselines}")
+    if regressions:
+        print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
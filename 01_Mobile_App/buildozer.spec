@@ -7,7 +7,7 @@ source.dir = .
 source.include_exts = py,png,jpg,kv,atlas
 
 version = 1.0
-requirements = python3,kivy
+requirements = python3,kivy,numpy
 
 [buildozer]
 log_level = 2
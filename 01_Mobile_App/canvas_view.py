@@ -0,0 +1,289 @@
+# TriAxis Pro Canvas View
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Drawing and job preview on the Draw tab canvas, for the Tk and Kivy apps.
+# Pointer handlers only append to a buffer: every position is kept for the
+# signature, and only points at least MIN_SPACING pixels apart are drawn,
+# once per frame. A stroke is a few line items that grow in place through
+# coordinate updates; a new item starts after ITEM_POINTS points so no
+# update has to resend a long stroke. Imported jobs are previewed at the
+# canvas's own resolution: points falling on the pixel of the one before
+# are dropped and the rest thinned to a fixed budget, so a job of any size
+# draws as the same few thousand points.
+
+from array import array
+
+import numpy as np
+
+MIN_SPACING = 1.5        # pixels between drawn points
+FRAME_INTERVAL = 16      # ms between canvas updates (~60 fps)
+ITEM_POINTS = 128        # points per stroke line item
+PREVIEW_ITEM_POINTS = 1024
+PREVIEW_POINTS = 20000   # most points a job preview draws
+PREVIEW_MARGIN = 6       # pixels
+STROKE_COLOR = '#2c3e50'
+DRAW_COLOR = '#2980b9'
+TRAVEL_COLOR = '#d5d8dc'
+
+
+class StrokeBuffer:
+    # Sits between the pointer events and the canvas. Every position goes
+    # to the StrokeRecorder straight away; the canvas gets the thinned-out
+    # points when the view takes them.
+    def __init__(self, recorder, spacing=MIN_SPACING):
+        self.recorder = recorder
+        self.spacing_squared = spacing * spacing
+        self.pending = []       # [starts a stroke, flat x/y array]
+        self.events = 0
+        self.drawn = 0
+        self._last = None       # newest drawn point
+        self._tail = None       # newest point not drawn yet
+
+    def begin(self, x, y):
+        self.recorder.begin(x, y)
+        self.events += 1
+        self.pending.append([True, array('d', (x, y))])
+        self._last = (x, y)
+        self._tail = None
+
+    def add(self, x, y):
+        if self._last is None:
+            self.begin(x, y)
+            return
+        self.recorder.add(x, y)
+        self.events += 1
+        dx = x - self._last[0]
+        dy = y - self._last[1]
+        if dx * dx + dy * dy < self.spacing_squared:
+            self._tail = (x, y)
+            return
+        if not self.pending:
+            self.pending.append([False, array('d')])
+        self.pending[-1][1].extend((x, y))
+        self._last = (x, y)
+        self._tail = None
+
+    def take(self):
+        # What to draw since the last call; the stroke's newest position is
+        # always included so the line reaches the pointer
+        if self._tail is not None:
+            if not self.pending:
+                self.pending.append([False, array('d')])
+            self.pending[-1][1].extend(self._tail)
+            self._last = self._tail
+            self._tail = None
+        pending, self.pending = self.pending, []
+        self.drawn += sum(len(coords) for _, coords in pending) // 2
+        return pending
+
+    def clear(self):
+        self.pending = []
+        self._last = None
+        self._tail = None
+
+
+class StrokeView:
+    # Draws what a StrokeBuffer collects as growing line items. Subclasses
+    # create and update the items for their toolkit.
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.items = []
+        self.updates = 0
+        self._item = None
+        self._coords = array('d')
+
+    def flush(self):
+        for starts, coords in self.buffer.take():
+            if starts or self._item is None:
+                self._start(coords[:2])
+                coords = coords[2:]
+            offset = 0
+            while offset < len(coords):
+                room = 2 * ITEM_POINTS - len(self._coords)
+                if room <= 0:
+                    # Carry on from the last point in a fresh item
+                    self._start(self._coords[-2:])
+                    continue
+                self._coords.extend(coords[offset:offset + room])
+                offset += room
+                self._update(self._item, self._coords)
+                self.updates += 1
+
+    def clear(self):
+        self.items = []
+        self._item = None
+        self._coords = array('d')
+        self.buffer.clear()
+
+    def _start(self, point):
+        self._coords = array('d', point)
+        self._item = self._create(self._coords)
+        self.items.append(self._item)
+
+    def _create(self, coords):
+        raise NotImplementedError
+
+    def _update(self, item, coords):
+        raise NotImplementedError
+
+
+class TkStrokeView(StrokeView):
+    # On a Tk canvas; starts its own frame loop, which ends with the canvas
+    def __init__(self, canvas, buffer, width=2, interval=FRAME_INTERVAL):
+        super().__init__(buffer)
+        self.canvas = canvas
+        self.width = width
+        self.interval = interval
+        self._job = None
+
+    def start(self):
+        if self._job is None:
+            self._tick()
+        return self
+
+    def _tick(self):
+        self._job = None
+        if not self.canvas.winfo_exists():
+            return
+        self.flush()
+        self._job = self.canvas.after(self.interval, self._tick)
+
+    def clear(self):
+        for item in self.items:
+            self.canvas.delete(item)
+        super().clear()
+
+    def _create(self, coords):
+        # A line item needs two points; a lone click is a dot
+        return self.canvas.create_line(*coords, *coords, width=self.width, fill=STROKE_COLOR,
+                                       capstyle='round', joinstyle='round', tags='stroke')
+
+    def _update(self, item, coords):
+        if len(coords) == 2:
+            coords = coords * 2
+        self.canvas.coords(item, *coords)
+
+
+def preview_lines(blocks, width, height, margin=PREVIEW_MARGIN, budget=PREVIEW_POINTS):
+    # A job's [x, y, z, ...] rows as flat pixel-coordinate polylines of at
+    # most PREVIEW_ITEM_POINTS points, each flagged as pen-up travel when
+    # its segments are above the job's lowest Z. Machine Y is flipped to
+    # canvas Y.
+    rows = [np.asarray(block)[:, :3] for block in blocks if len(block)]
+    if not rows:
+        return []
+    rows = np.vstack(rows).astype(np.float64)
+    if len(rows) < 2:
+        return []
+    low = rows[:, :2].min(axis=0)
+    span = np.maximum(rows[:, :2].max(axis=0) - low, 1e-9)
+    scale = min((width - 2 * margin) / span[0], (height - 2 * margin) / span[1])
+    pixels = np.empty((len(rows), 2))
+    pixels[:, 0] = margin + (rows[:, 0] - low[0]) * scale
+    pixels[:, 1] = height - margin - (rows[:, 1] - low[1]) * scale
+
+    # Segment i runs from point i - 1 to point i
+    z = rows[:, 2]
+    travel = np.maximum(z[1:], z[:-1]) > z.min()
+    changes = np.flatnonzero(travel[1:] != travel[:-1]) + 1
+    run_starts = np.concatenate([[0], changes])
+    run_ends = np.append(changes, len(travel))
+
+    keep = np.zeros(len(rows), dtype=bool)
+    cells = np.rint(pixels).astype(np.int64)
+    keep[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+    ends = np.zeros(len(rows), dtype=bool)
+    ends[run_starts] = True
+    ends[run_ends] = True
+    kept = keep.sum()
+    if kept > budget:
+        # Thin out evenly, counting only the points left so far
+        rank = np.cumsum(keep) - 1
+        keep &= rank % int(np.ceil(kept / budget)) == 0
+    keep |= ends
+    indices = np.flatnonzero(keep)
+
+    lines = []
+    for start, end, is_travel in zip(run_starts.tolist(), run_ends.tolist(), travel[run_starts].tolist()):
+        points = indices[np.searchsorted(indices, start):np.searchsorted(indices, end, side='right')]
+        for offset in range(0, len(points) - 1, PREVIEW_ITEM_POINTS - 1):
+            chunk = points[offset:offset + PREVIEW_ITEM_POINTS]
+            if len(chunk) >= 2:
+                lines.append((is_travel, pixels[chunk].ravel().tolist()))
+    return lines
+
+
+def draw_preview(canvas, lines):
+    # Replaces any earlier preview on a Tk canvas, under the strokes
+    canvas.delete('preview')
+    for is_travel, coords in lines:
+        canvas.create_line(*coords, fill=TRAVEL_COLOR if is_travel else DRAW_COLOR, width=1,
+                           tags='preview')
+    canvas.tag_lower('preview')
+
+
+if __name__ == "__main__":
+    import time
+
+    import job_import
+    import planner
+    import signature
+
+    class CountingCanvas:
+        # Counts the item work a Tk canvas would be asked to do
+        def __init__(self):
+            self.created = 0
+            self.updates = 0
+            self.coordinates = 0
+
+        def create_line(self, *coords, **options):
+            self.created += 1
+            self.coordinates += len(coords)
+            return self.created
+
+        def coords(self, item, *coords):
+            self.updates += 1
+            self.coordinates += len(coords)
+
+    # A fast stroke on a tablet: 2,000 events a second for 5 s, drawn at
+    # 60 fps, against one item per segment as before
+    rng = np.random.default_rng(7)
+    steps = rng.normal(0, 1.2, (10000, 2)) + 0.8
+    path = 50 + np.cumsum(steps, axis=0)
+    recorder = signature.StrokeRecorder()
+    buffer = StrokeBuffer(recorder)
+    canvas = CountingCanvas()
+    view = TkStrokeView(canvas, buffer)
+    start = time.perf_counter()
+    for i, (x, y) in enumerate(path.tolist()):
+        if i % 2000 == 0:
+            buffer.begin(x, y)
+        else:
+            buffer.add(x, y)
+        if i % 33 == 32:
+            view.flush()
+    view.flush()
+    elapsed = time.perf_counter() - start
+    print(f"stroke input: {buffer.events:,} events, {len(recorder):,} recorded, {buffer.drawn:,} drawn; "
+          f"{len(view.items)} items, {view.updates} coords updates, {canvas.coordinates:,} coordinates "
+          f"sent ({elapsed * 1e6 / buffer.events:.2f} us per event)")
+    print(f"one item per segment: {buffer.events - 5:,} items, {4 * (buffer.events - 5):,} coordinates")
+
+    # Previews of growing jobs at the Draw tab's size: a wandering toolpath
+    # with a pen-up jump every 1,000 rows, as between the strokes of a drawing
+    for segments in (2000, 20000, 200000):
+        rows = np.zeros((segments, 4))
+        rows[:, :2] = np.cumsum(rng.normal(0, 8, (segments, 2)), axis=0)
+        rows[:, 2] = np.where(np.arange(segments) % 1000 < 5, 400, 0)
+        rows[:, 3] = planner.MAX_SPEED
+        blocks = [rows[i:i + job_import.BLOCK_ROWS] for i in range(0, segments, job_import.BLOCK_ROWS)]
+        start = time.perf_counter()
+        lines = preview_lines(blocks, 400, 200)
+        elapsed = time.perf_counter() - start
+        canvas = CountingCanvas()
+        for is_travel, coords in lines:
+            canvas.create_line(*coords)
+        print(f"preview {segments:7,} segments: {elapsed * 1000:6.1f} ms, {len(lines)} items, "
+              f"{canvas.coordinates // 2:,} points")
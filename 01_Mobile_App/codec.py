@@ -0,0 +1,248 @@
+# TriAxis Pro Command Codec
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Two encodings share one link. JSON lines start with '{'; binary frames
+# start with FRAME_SYNC and are only used once the device lists "bin1" in
+# its connect reply.
+#
+# Binary frame (little-endian):
+#   sync u8 | version u8 | type u8 | seq u16 | length u16 | payload | crc16
+# crc16 is CRC-16/CCITT-FALSE over everything before it.
+#
+# The emergency stop is always the same bytes in either encoding, so the
+# device can spot it in its receive buffer without parsing what is queued
+# ahead of it.
+#
+# Step tables (step_tables.py) are uploaded in "table" chunks: raw bytes in
+# a TABLE_DATA frame, base64 in JSON.
+#
+# Held jog buttons (jog.py) send "jog" with a signed velocity per axis and
+# then bare "jogKeep" frames; both go out with sequence 0.
+
+import base64
+import binascii
+import json
+import struct
+
+import numpy as np
+
+FRAME_SYNC = 0xA5
+FRAME_VERSION = 1
+BINARY_CODEC = "bin1"
+JSON_CODEC = "json"
+HEADER = struct.Struct('<BBBHH')
+CRC = struct.Struct('<H')
+MAX_PAYLOAD = 1024
+
+# Frame types; replies have the high bit set
+MOVE = 0x01
+MOVE_TO = 0x02
+SIGNATURE = 0x03
+STOP = 0x04
+STATUS = 0x05
+PLANNED_PATH = 0x06
+ESTOP = 0x07
+TABLE_DATA = 0x08
+JOG = 0x09
+JOG_KEEP = 0x0A
+STATUS_REPLY = 0x85
+ACK = 0x86
+STOPPED = 0x87
+
+AXES = ('X', 'Y', 'Z')
+STYLES = ('normal', 'embossed', 'calligraphy')
+
+MOVE_PAYLOAD = struct.Struct('<BiH')
+COUNT = struct.Struct('<H')
+SIGNATURE_HEADER = struct.Struct('<BH')
+STATUS_PAYLOAD = struct.Struct('<B3i3HBB')
+TABLE_OFFSET = struct.Struct('<I')
+JOG_PAYLOAD = struct.Struct('<3h')
+SEGMENT_DTYPE = np.dtype([('x', '<i4'), ('y', '<i4'), ('z', '<i4'), ('feed', '<u2')])
+# Look-ahead planned segments also carry their entry and exit speeds
+PLANNED_DTYPE = np.dtype([('x', '<i4'), ('y', '<i4'), ('z', '<i4'), ('feed', '<u2'),
+                          ('entry', '<u2'), ('exit', '<u2')])
+POINT_DTYPE = np.dtype([('x', '<i4'), ('y', '<i4'), ('z', '<i4')])
+
+
+class CodecError(Exception):
+    pass
+
+
+# --- JSON ---------------------------------------------------------------------
+
+def encode_json(command):
+    # Array payloads are kept as NumPy blocks until the last moment
+    seg = command.get("seg")
+    points = command.get("points")
+    data = command.get("data")
+    if isinstance(seg, np.ndarray) or isinstance(points, np.ndarray) or isinstance(data, bytes):
+        command = dict(command)
+        if isinstance(seg, np.ndarray):
+            command["seg"] = seg.tolist()
+        if isinstance(points, np.ndarray):
+            command["points"] = [{"x": x, "y": y, "z": z} for x, y, z in points.tolist()]
+        if isinstance(data, bytes):
+            command["data"] = base64.b64encode(data).decode('ascii')
+    return json.dumps(command, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+# --- Binary -------------------------------------------------------------------
+
+def frame(frame_type, seq, payload=b''):
+    if len(payload) > MAX_PAYLOAD:
+        raise CodecError(f"Payload too large: {len(payload)} bytes")
+    header = HEADER.pack(FRAME_SYNC, FRAME_VERSION, frame_type, seq & 0xFFFF, len(payload))
+    body = header + payload
+    return body + CRC.pack(binascii.crc_hqx(body, 0xFFFF))
+
+
+ESTOP_JSON = encode_json({"action": "estop"})
+ESTOP_FRAME = frame(ESTOP, 0)
+
+
+def encode_segments(rows):
+    # rows: (N, 4) [x, y, z, feed] or (N, 6) [x, y, z, feed, entry, exit]
+    rows = np.asarray(rows)
+    planned = rows.shape[1] == 6
+    block = np.empty(len(rows), dtype=PLANNED_DTYPE if planned else SEGMENT_DTYPE)
+    block['x'] = rows[:, 0]
+    block['y'] = rows[:, 1]
+    block['z'] = rows[:, 2]
+    block['feed'] = np.clip(rows[:, 3], 0, 0xFFFF)
+    if planned:
+        block['entry'] = np.clip(rows[:, 4], 0, 0xFFFF)
+        block['exit'] = np.clip(rows[:, 5], 0, 0xFFFF)
+    return COUNT.pack(len(block)) + block.tobytes()
+
+
+def encode_points(points, style):
+    points = np.asarray(points)
+    block = np.empty(len(points), dtype=POINT_DTYPE)
+    block['x'] = points[:, 0]
+    block['y'] = points[:, 1]
+    block['z'] = points[:, 2]
+    return SIGNATURE_HEADER.pack(STYLES.index(style), len(block)) + block.tobytes()
+
+
+def encode_binary(command, seq):
+    # Returns None for commands that only exist in JSON
+    action = command.get("action")
+    if action == "move":
+        payload = MOVE_PAYLOAD.pack(AXES.index(command["axis"]), int(command["steps"]),
+                                    int(command.get("speed", 1000)))
+        return frame(MOVE, seq, payload)
+    if action == "path":
+        frame_type = PLANNED_PATH if np.shape(command["seg"])[1] == 6 else MOVE_TO
+        return frame(frame_type, seq, encode_segments(command["seg"]))
+    if action == "signature" and isinstance(command.get("points"), np.ndarray):
+        return frame(SIGNATURE, seq, encode_points(command["points"], command.get("style", "normal")))
+    if action == "stop":
+        return frame(STOP, seq)
+    if action == "getStatus":
+        return frame(STATUS, seq)
+    if action == "table":
+        return frame(TABLE_DATA, seq, TABLE_OFFSET.pack(command["offset"]) + bytes(command["data"]))
+    if action == "jog":
+        return frame(JOG, seq, JOG_PAYLOAD.pack(*(max(-0x7FFF, min(0x7FFF, int(v))) for v in command["v"])))
+    if action == "jogKeep":
+        return frame(JOG_KEEP, seq)
+    return None
+
+
+def encode_estop(encoding):
+    # Sequence 0: outside any ack window
+    return ESTOP_FRAME if encoding == BINARY_CODEC else ESTOP_JSON
+
+
+def encode_stopped(encoding):
+    return frame(STOPPED, 0) if encoding == BINARY_CODEC else encode_json({"stopped": True})
+
+
+def encode_ack(seq):
+    # Cumulative: the device accepted every command up to `seq`
+    return frame(ACK, seq, COUNT.pack(seq))
+
+
+def encode_status(status, seq):
+    positions = status["positions"]
+    speeds = status["speeds"]
+    limits = status["limits"]
+    flags = int(bool(status["motorsEnabled"])) | int(bool(status["emergencyStop"])) << 1
+    limit_bits = sum(int(bool(limits[a])) << i for i, a in enumerate(AXES))
+    payload = STATUS_PAYLOAD.pack(flags, *(positions[a] for a in AXES),
+                                  *(speeds[a] for a in AXES), limit_bits,
+                                  status.get("queueFree", 0))
+    return frame(STATUS_REPLY, seq, payload)
+
+
+def decode_payload(frame_type, payload):
+    if frame_type == MOVE:
+        axis, steps, speed = MOVE_PAYLOAD.unpack(payload)
+        return {"action": "move", "axis": AXES[axis], "steps": steps, "speed": speed}
+    if frame_type in (MOVE_TO, PLANNED_PATH):
+        planned = frame_type == PLANNED_PATH
+        (count,) = COUNT.unpack_from(payload)
+        block = np.frombuffer(payload, dtype=PLANNED_DTYPE if planned else SEGMENT_DTYPE,
+                              count=count, offset=COUNT.size)
+        rows = np.empty((count, 6 if planned else 4), dtype=np.int32)
+        rows[:, 0] = block['x']
+        rows[:, 1] = block['y']
+        rows[:, 2] = block['z']
+        rows[:, 3] = block['feed']
+        if planned:
+            rows[:, 4] = block['entry']
+            rows[:, 5] = block['exit']
+        return {"action": "path", "seg": rows}
+    if frame_type == SIGNATURE:
+        style, count = SIGNATURE_HEADER.unpack_from(payload)
+        block = np.frombuffer(payload, dtype=POINT_DTYPE, count=count, offset=SIGNATURE_HEADER.size)
+        points = np.stack([block['x'], block['y'], block['z']], axis=1)
+        return {"action": "signature", "style": STYLES[style], "points": points}
+    if frame_type == STOP:
+        return {"action": "stop"}
+    if frame_type == ESTOP:
+        return {"action": "estop"}
+    if frame_type == STATUS:
+        return {"action": "getStatus"}
+    if frame_type == TABLE_DATA:
+        (offset,) = TABLE_OFFSET.unpack_from(payload)
+        return {"action": "table", "offset": offset, "data": payload[TABLE_OFFSET.size:]}
+    if frame_type == JOG:
+        return {"action": "jog", "v": list(JOG_PAYLOAD.unpack(payload))}
+    if frame_type == JOG_KEEP:
+        return {"action": "jogKeep"}
+    if frame_type == STATUS_REPLY:
+        values = STATUS_PAYLOAD.unpack(payload)
+        flags, limit_bits, queue_free = values[0], values[7], values[8]
+        return {"motorsEnabled": bool(flags & 1), "emergencyStop": bool(flags & 2),
+                "positions": dict(zip(AXES, values[1:4])),
+                "speeds": dict(zip(AXES, values[4:7])),
+                "limits": {a: (limit_bits >> i) & 1 for i, a in enumerate(AXES)},
+                "queueFree": queue_free}
+    if frame_type == ACK:
+        (seq,) = COUNT.unpack(payload)
+        return {"ack": seq}
+    if frame_type == STOPPED:
+        return {"stopped": True}
+    raise CodecError(f"Unknown frame type: {frame_type:#x}")
+
+
+def split_frame(buffer):
+    # Returns (frame_type, seq, payload, consumed) for a complete frame at the
+    # start of `buffer`, None if more bytes are needed. A bad frame raises
+    # CodecError; the caller drops the sync byte and resynchronises.
+    if len(buffer) < HEADER.size:
+        return None
+    sync, version, frame_type, seq, length = HEADER.unpack_from(buffer)
+    if sync != FRAME_SYNC or version != FRAME_VERSION or length > MAX_PAYLOAD:
+        raise CodecError("Bad frame header")
+    end = HEADER.size + length
+    if len(buffer) < end + CRC.size:
+        return None
+    (crc,) = CRC.unpack_from(buffer, end)
+    if crc != binascii.crc_hqx(bytes(buffer[:end]), 0xFFFF):
+        raise CodecError("Frame checksum mismatch")
+    return frame_type, seq, bytes(buffer[HEADER.size:end]), end + CRC.size
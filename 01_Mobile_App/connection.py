@@ -0,0 +1,216 @@
+# TriAxis Pro Connection Manager
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# One device session: connect, codec and ack negotiation, reconnects and
+# the settings replayed after them. Nothing here needs a UI toolkit, so
+# headless hosts (fleet mode, the tests and the demos) use it directly;
+# the Tk app builds its Connection tab on top of it.
+
+import startup
+import asyncio
+import functools
+import time
+
+transport = startup.lazy_import('transport')
+codec = startup.lazy_import('codec')
+discovery = startup.lazy_import('discovery')
+io_loop = startup.lazy_import('io_loop')
+
+CONNECT_TIMEOUT = 8.0   # seconds for a connect, link and handshake together
+RECONNECT_FIRST = 0.5   # seconds before the first reconnect attempt, doubling after
+RECONNECT_MAX = 16.0    # longest wait between reconnect attempts
+RECONNECT_ATTEMPTS = 8
+SESSION_ACTIONS = ('enable', 'setSpeed')   # settings sent again after a reconnect
+
+
+class ConnectionManager:
+    # Connects run on the shared I/O loop with a deadline and can be
+    # cancelled; a new connect cancels the one still running. A link that
+    # drops is reopened with backoff, and the settings sent on it (enable,
+    # speeds) are sent again. on_state(state, detail) reports "lost",
+    # "reconnecting", "restored" and "failed" from the loop.
+    def __init__(self):
+        self.connection_type = None
+        self.is_connected = False
+        self.device_info = {}
+        self.transport = None
+        self.metrics = None
+        self.recorder = None
+        self.on_state = None
+        self.target = None       # (kind, address, port) of the last good connect
+        self.session = {}        # (action, axis) -> newest settings command
+        self.reconnects = 0
+        self._operation = None
+    
+    @functools.cached_property
+    def discovery(self):
+        return discovery.DiscoveryEngine()
+        
+    def scan_bluetooth_devices(self):
+        return self.discovery.scan_blocking(discovery.BLUETOOTH)
+    
+    def scan_wifi_devices(self):
+        return self.discovery.scan_blocking(discovery.WIFI)
+    
+    def connect_bluetooth(self, device_address):
+        # Serial device paths (/dev/rfcomm0, a pty) or an RFCOMM address
+        self.connect("Bluetooth", device_address).result()
+        return True
+    
+    def connect_wifi(self, device_ip, port=None):
+        self.connect("WiFi", device_ip, port).result()
+        return True
+    
+    def connect(self, kind, address, port=None, on_done=None, timeout=CONNECT_TIMEOUT):
+        # Returns the connect's Future. on_done(error) is called from the
+        # loop, error being None on success; not at all if cancelled.
+        self.cancel()
+        future = io_loop.shared().submit(self._connect(kind, address, port, timeout))
+        self._operation = future
+        if on_done:
+            future.add_done_callback(lambda f: f.cancelled() or on_done(f.exception()))
+        return future
+    
+    def cancel(self):
+        # Stops a connect or reconnect that is still running
+        operation, self._operation = self._operation, None
+        if operation:
+            operation.cancel()
+    
+    async def _connect(self, kind, address, port, timeout):
+        self._close_link()
+        self.session = {}
+        try:
+            link, reply = await asyncio.wait_for(self._open(kind, address, port), timeout)
+        except asyncio.TimeoutError:
+            raise transport.TransportError(f"No answer from {address} within {timeout:g} s")
+        self._install(link, reply, kind, address, port)
+    
+    async def _open(self, kind, address, port):
+        if kind == "WiFi":
+            link = transport.TcpTransport(address, port) if port else transport.TcpTransport(address)
+        elif address.startswith('/'):
+            link = transport.SerialTransport(address)
+        else:
+            link = transport.BluetoothTransport(address)
+        started = time.perf_counter()
+        await link.open_async()
+        try:
+            reply = await link.request_async({"action": "connect", "acks": True,
+                                              "codecs": [codec.BINARY_CODEC, codec.JSON_CODEC]}, timeout=3.0)
+        except BaseException:
+            link.close()
+            raise
+        # Older firmware doesn't list codecs and only understands JSON
+        if codec.BINARY_CODEC in reply.get("codecs", []):
+            link.codec = codec.BINARY_CODEC
+        # Firmware that acks commands says how many may be in flight at once
+        if "window" in reply:
+            link.enable_acks(reply["window"], reply.get("buffer"))
+        if self.metrics is not None:
+            link.metrics = self.metrics.link(kind)
+            if self.metrics.enabled:
+                link.metrics.since('connect', started)
+        return link, reply
+    
+    def _install(self, link, reply, kind, address, port):
+        link.on_lost = self._on_lost
+        self.transport = link
+        self.connection_type = kind
+        self.is_connected = True
+        self.target = (kind, address, port)
+        self.device_info = dict(reply)
+        if kind == "WiFi":
+            self.device_info.update({"ip": address, "type": "WiFi"})
+        else:
+            self.device_info.update({"address": address, "type": "BT"})
+    
+    def _on_lost(self, link):
+        # On the I/O loop
+        if link is not self.transport:
+            return
+        self.is_connected = False
+        self._notify("lost", None)
+        self._operation = io_loop.shared().submit(self._reconnect())
+    
+    async def _reconnect(self):
+        kind, address, port = self.target
+        delay = RECONNECT_FIRST
+        error = None
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            self._notify("reconnecting", {"attempt": attempt, "delay": delay})
+            await asyncio.sleep(delay)
+            try:
+                link, reply = await asyncio.wait_for(self._open(kind, address, port), CONNECT_TIMEOUT)
+            except (transport.TransportError, OSError, asyncio.TimeoutError) as e:
+                error = e
+                delay = min(RECONNECT_MAX, 2 * delay)
+                continue
+            self._install(link, reply, kind, address, port)
+            # Settings only; motion that was under way is not resumed
+            settings = list(self.session.values())
+            if settings:
+                link.send_many(settings)
+            self.reconnects += 1
+            self._notify("restored", {"attempt": attempt, "settings": len(settings)})
+            return
+        self._close_link()
+        self._notify("failed", str(error or "No answer from device"))
+    
+    def _notify(self, state, detail):
+        if self.on_state:
+            self.on_state(state, detail)
+    
+    def _remember(self, commands):
+        for command in commands:
+            if command.get("action") in SESSION_ACTIONS:
+                self.session[(command["action"], command.get("axis"))] = command
+    
+    def _dropped(self):
+        # A write failed; the loop takes it from there as a lost link
+        link = self.transport
+        if link is not None and link.io is not None:
+            link.io.call(link.connection_lost)
+    
+    def send_command(self, command):
+        if not self.is_connected:
+            return False
+        try:
+            self.transport.send(command)
+        except (transport.TransportError, OSError):
+            self._dropped()
+            return False
+        self._remember((command,))
+        if self.recorder:
+            self.recorder.commands([command])
+        return True
+    
+    def send_commands(self, commands, epoch=None):
+        if not self.is_connected:
+            return False
+        try:
+            self.transport.send_many(commands, epoch)
+        except (transport.TransportError, OSError):
+            self._dropped()
+            return False
+        self._remember(commands)
+        if self.recorder:
+            self.recorder.commands(commands)
+        return True
+    
+    def _close_link(self):
+        link, self.transport = self.transport, None
+        if link:
+            link.on_lost = None
+            link.close()
+        self.connection_type = None
+        self.is_connected = False
+        self.device_info = {}
+    
+    def disconnect(self):
+        self.cancel()
+        self._close_link()
+        self.target = None
+        self.session = {}
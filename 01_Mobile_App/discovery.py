@@ -0,0 +1,195 @@
+# TriAxis Pro Device Discovery
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Finds controllers on both radios at once. WiFi is an asyncio sweep of the
+# controller port across the local /24 and the controller's own soft-AP
+# subnet; Bluetooth lists paired RFCOMM ports (and nearby devices when
+# PyBluez is installed). Every device is reported the moment it answers,
+# and results are cached per radio so switching tabs or radio buttons
+# doesn't start another sweep. Sweeps run on the shared I/O loop.
+
+import asyncio
+import glob
+import ipaddress
+import json
+import socket
+import threading
+import time
+
+import io_loop
+from transport import CONTROLLER_PORT
+
+try:
+    import bluetooth
+except ImportError:
+    bluetooth = None
+
+BLUETOOTH = "Bluetooth"
+WIFI = "WiFi"
+SOFT_AP_SUBNET = "192.168.4.0/24"
+CACHE_TTL = 30.0
+PROBE_TIMEOUT = 0.3
+PROBE_CONCURRENCY = 128
+
+
+def local_subnets():
+    subnets = [ipaddress.ip_network(SOFT_AP_SUBNET)]
+    try:
+        # No packet is sent; this only asks the OS which interface it would use
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        probe.connect(("10.255.255.255", 1))
+        address = probe.getsockname()[0]
+        probe.close()
+    except OSError:
+        return subnets
+    network = ipaddress.ip_network(f"{address}/24", strict=False)
+    if network not in subnets and not network.is_loopback:
+        subnets.insert(0, network)
+    return subnets
+
+
+class DiscoveryEngine:
+    def __init__(self, port=CONTROLLER_PORT, ttl=CACHE_TTL, timeout=PROBE_TIMEOUT,
+                 concurrency=PROBE_CONCURRENCY, hosts=None):
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # Explicit (ip, port) targets instead of a subnet sweep
+        self.hosts = hosts
+        self.cache = {}
+        self._lock = threading.Lock()
+        self._scanning = False
+        self._found = {BLUETOOTH: [], WIFI: []}
+        self._listeners = []
+
+    def cached(self, kind):
+        entry = self.cache.get(kind)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return list(entry[1])
+        return None
+
+    def invalidate(self):
+        self.cache.clear()
+
+    def scan(self, kind, on_device, on_done=None, force=False):
+        # on_device(device) for each controller of `kind` as it answers,
+        # then on_done(devices). Both are called from the I/O loop, cached
+        # results included.
+        io = io_loop.shared()
+        devices = None if force else self.cached(kind)
+        if devices is not None:
+            io.call(self._replay, devices, on_device, on_done)
+            return False
+
+        with self._lock:
+            listener = (kind, on_device, on_done)
+            self._listeners.append(listener)
+            if self._scanning:
+                # Join the sweep already running and catch up on its results
+                io.call(self._replay, list(self._found[kind]), on_device, None)
+                return True
+            self._scanning = True
+            self._found = {BLUETOOTH: [], WIFI: []}
+        io.submit(self._scan_all()).add_done_callback(self._finish)
+        return True
+
+    def scan_blocking(self, kind, force=False):
+        done = threading.Event()
+        result = []
+
+        def finish(devices):
+            result.extend(devices)
+            done.set()
+
+        self.scan(kind, lambda device: None, finish, force)
+        done.wait()
+        return result
+
+    def _replay(self, devices, on_device, on_done):
+        # On the I/O loop
+        for device in devices:
+            on_device(device)
+        if on_done:
+            on_done(devices)
+
+    def _report(self, kind, device):
+        # From the loop, or the executor thread the Bluetooth scan runs on
+        with self._lock:
+            self._found[kind].append(device)
+            listeners = [l for l in self._listeners if l[0] == kind]
+        io = io_loop.shared()
+        for _, on_device, _ in listeners:
+            if io.in_loop():
+                on_device(device)
+            else:
+                io.call(on_device, device)
+
+    def _finish(self, future):
+        # On the I/O loop, however the sweep ended
+        now = time.monotonic()
+        with self._lock:
+            for kind, devices in self._found.items():
+                self.cache[kind] = (now, list(devices))
+            listeners, self._listeners = self._listeners, []
+            self._scanning = False
+        for kind, _, on_done in listeners:
+            if on_done:
+                on_done(list(self.cache[kind][1]))
+
+    async def _scan_all(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(self._scan_wifi(),
+                             loop.run_in_executor(None, self._scan_bluetooth))
+
+    # --- WiFi -------------------------------------------------------------------
+
+    def _targets(self):
+        if self.hosts is not None:
+            return list(self.hosts)
+        return [(str(ip), self.port) for net in local_subnets() for ip in net.hosts()]
+
+    async def _scan_wifi(self):
+        limit = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._probe(ip, port, limit) for ip, port in self._targets()))
+
+    async def _probe(self, ip, port, limit):
+        async with limit:
+            start = time.monotonic()
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return
+            try:
+                writer.write(b'{"action":"connect"}\n')
+                await writer.drain()
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                reply = json.loads(line)
+            except (OSError, ValueError, asyncio.TimeoutError):
+                return
+            finally:
+                writer.close()
+        # Something else listening on the port; one odd reply must not end the sweep
+        if not isinstance(reply, dict):
+            return
+        latency = (time.monotonic() - start) * 1000
+        name = reply.get("device", "TriAxis")
+        self._report(WIFI, {"name": f"{name}_{ip}", "ip": ip, "port": port,
+                            "latency": round(latency, 1)})
+
+    # --- Bluetooth --------------------------------------------------------------
+
+    def _scan_bluetooth(self):
+        # Paired serial ports are free to list; an inquiry takes seconds
+        for path in sorted(glob.glob('/dev/rfcomm*')):
+            self._report(BLUETOOTH, {"name": f"TriAxis ({path.rsplit('/', 1)[-1]})", "address": path})
+        if bluetooth is None:
+            return
+        try:
+            nearby = bluetooth.discover_devices(duration=2, lookup_names=True)
+        except OSError:
+            return
+        for address, name in nearby:
+            self._report(BLUETOOTH, {"name": name or address, "address": address})
@@ -0,0 +1,226 @@
+# TriAxis Pro Command Dispatcher
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Sender thread that owns all device writes. The UI only calls submit(),
+# which never blocks; commands wait in a bounded queue where back-to-back
+# jogs on the same axis are merged into one move. Each batch is followed by
+# a getStatus round trip, so the send rate follows how fast the link acks.
+# Long jobs are queued as one lazy stream and pulled a batch at a time.
+# On a link whose transport has an ack window the device paces the sender
+# itself, so batches go out at full size without the status probe.
+# Each batch remembers the transport epoch it was taken in, so nothing
+# taken before an emergency stop is written after it.
+# With metrics enabled on the transport, each command's time in the queue
+# is recorded, and so are status round trips and motion completion.
+
+import collections
+import itertools
+import threading
+import time
+
+from transport import TransportError
+
+
+class CommandDispatcher:
+    def __init__(self, connection_manager, max_pending=64, max_batch=32, ack_timeout=1.0):
+        self.connection_manager = connection_manager
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.ack_timeout = ack_timeout
+        self.on_status = None
+        self.on_error = None
+
+        self.batch_size = 1
+        self.rtt = None
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+
+        self._pending = collections.deque()
+        self._fixed_batch = None
+        self._batch_timeout = ack_timeout
+        self._epoch = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify()
+
+    def submit(self, command):
+        with self._cond:
+            if self._pending and self._merge(self._pending[-1], command):
+                self.merged += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            command = dict(command)
+            if self._metrics():
+                command["_queued"] = time.perf_counter()
+            self._pending.append(command)
+            self._cond.notify()
+            return True
+
+    def submit_stream(self, commands, batch=None, ack_timeout=None):
+        # `commands` is any iterable; it is only consumed by the sender thread.
+        # A fixed `batch` with a long `ack_timeout` gives stop-and-wait flow
+        # control for commands the firmware executes before reading on.
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append({"_stream": iter(commands), "batch": batch,
+                                  "ack_timeout": ack_timeout, "_queued": time.perf_counter()})
+            self._cond.notify()
+            return True
+
+    def request_status(self):
+        # Ask for a fresh status without jumping the queue; duplicates merge
+        with self._cond:
+            if any(c.get('action') == 'getStatus' for c in self._pending):
+                return False
+        return self.submit({"action": "getStatus"})
+
+    def clear(self):
+        with self._cond:
+            self._pending.clear()
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _merge(self, last, command):
+        # Same-axis relative moves at the same speed add up to one move
+        if last.get('action') != 'move' or command.get('action') != 'move':
+            return False
+        if last.get('axis') != command.get('axis') or last.get('speed') != command.get('speed'):
+            return False
+        last['steps'] += command['steps']
+        return True
+
+    def _take_batch(self):
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return None
+            head = self._pending[0]
+            transport = self.connection_manager.transport
+            self._epoch = transport.epoch if transport else None
+            self._fixed_batch = None
+            self._batch_timeout = self.ack_timeout
+            metrics = self._metrics()
+            if "_stream" not in head:
+                batch = []
+                limit = self._batch_limit()
+                while self._pending and "_stream" not in self._pending[0] and len(batch) < limit:
+                    command = self._pending.popleft()
+                    queued = command.pop("_queued", None)
+                    if metrics and queued is not None:
+                        metrics.since('queue', queued)
+                    batch.append(command)
+                return batch
+            # A job's queue time ends when its first batch is taken
+            queued = head.pop("_queued", None)
+            if metrics and queued is not None:
+                metrics.since('queue', queued)
+        size = head["batch"] or self._batch_limit()
+        self._fixed_batch = head["batch"]
+        self._batch_timeout = head["ack_timeout"] or self.ack_timeout
+        # Pull from the stream outside the lock so submit() never waits on it
+        try:
+            batch = list(itertools.islice(head["_stream"], size))
+        except Exception as e:
+            # A broken job source ends that job, not the sender thread
+            batch = []
+            if self.on_error:
+                self.on_error(e)
+        if len(batch) < size:
+            with self._cond:
+                if self._pending and self._pending[0] is head:
+                    self._pending.popleft()
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            polls = [c for c in batch if c.get('action') == 'getStatus']
+            batch = [c for c in batch if c.get('action') != 'getStatus'
+                     and (c.get('action') != 'move' or c['steps'] != 0)]
+            if batch:
+                if not self.connection_manager.send_commands(batch, self._epoch):
+                    self.clear()
+                    continue
+                self.sent += len(batch)
+            if self._windowed():
+                # The window already waited for the device; only polls need asking
+                if polls:
+                    self._request_status(self.ack_timeout)
+            # A status request needs no send of its own: the ack probe is one
+            elif batch or polls:
+                self._await_ack()
+
+    def _windowed(self):
+        transport = self.connection_manager.transport
+        return transport is not None and transport.window is not None
+
+    def _metrics(self):
+        transport = self.connection_manager.transport
+        metrics = transport.metrics if transport is not None else None
+        return metrics if metrics is not None and metrics.enabled else None
+
+    def _batch_limit(self):
+        return self.max_batch if self._windowed() else self.batch_size
+
+    def _request_status(self, timeout):
+        transport = self.connection_manager.transport
+        try:
+            # Drop any late reply from a probe that already timed out
+            while not transport.replies.empty():
+                transport.replies.get_nowait()
+            status = transport.request({"action": "getStatus"}, timeout=timeout)
+        except (TransportError, OSError, AttributeError):
+            return None
+        metrics = self._metrics()
+        if metrics:
+            metrics.status(status)
+        recorder = self.connection_manager.recorder
+        if recorder:
+            recorder.status(status)
+        if self.on_status:
+            self.on_status(status)
+        return status
+
+    def _await_ack(self):
+        # The status reply doubles as the ack for everything sent before it
+        start = time.perf_counter()
+        if self._request_status(self._batch_timeout) is None:
+            self.batch_size = max(1, self.batch_size // 2)
+            return
+        if self._fixed_batch:
+            # Execution time, not link speed; keep it out of the estimate
+            return
+        rtt = time.perf_counter() - start
+        metrics = self._metrics()
+        if metrics:
+            metrics.record('ack', rtt)
+        self.rtt = rtt if self.rtt is None else 0.8 * self.rtt + 0.2 * rtt
+        # Grow while acks come back promptly, back off when the link slows down
+        if rtt <= 2 * self.rtt:
+            self.batch_size = min(self.max_batch, self.batch_size + 1)
+        else:
+            self.batch_size = max(1, self.batch_size // 2)
@@ -0,0 +1,109 @@
+# TriAxis Pro Emergency Stop
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# The STOP button's path to the devices. It empties the dispatcher queues,
+# then writes the fixed stop bytes straight onto every open link, ahead of
+# the ack window and anything the sender thread holds. With several links
+# the writes run at once on a pool of their own, so a link whose write
+# blocks holds up no other device's stop. The firmware spots
+# those bytes as they arrive, halts, drops what it had buffered and answers
+# "stopped"; the time from the press to that answer is kept for every link
+# and every press.
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from transport import TransportError
+
+STOP_TIMEOUT = 1.0     # seconds to wait for "stopped" before calling a link lost
+STOP_BUDGET = 0.25     # seconds from press to the slowest device's answer
+HISTORY_SIZE = 50
+STOP_WORKERS = 32      # links written to at once
+
+
+class EmergencyStop:
+    def __init__(self, budget=STOP_BUDGET, timeout=STOP_TIMEOUT):
+        self.budget = budget
+        self.timeout = timeout
+        self.history = collections.deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def trigger(self, links, dispatchers=(), on_result=None):
+        # `links` maps a name to an open Transport. With `on_result` this
+        # returns as soon as the stops are written and reports from a worker
+        # thread; without it, it waits and returns the result.
+        pressed = time.perf_counter()
+        for dispatcher in dispatchers:
+            dispatcher.clear()
+        if len(links) > 1:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(STOP_WORKERS, thread_name_prefix="triaxis-estop")
+            writes = {name: self._pool.submit(self._write, transport) for name, transport in links.items()}
+        else:
+            # One link: no hand-off, write it here
+            writes = {}
+            for name, transport in links.items():
+                writes[name] = concurrent.futures.Future()
+                writes[name].set_result(self._write(transport))
+        if on_result is None:
+            return self._collect(pressed, links, writes)
+        threading.Thread(target=lambda: on_result(self._collect(pressed, links, writes)),
+                         daemon=True).start()
+        return None
+
+    @staticmethod
+    def _write(transport):
+        # None once the stop bytes are out, else what went wrong
+        try:
+            transport.emergency_stop()
+        except (TransportError, OSError) as e:
+            return str(e)
+        return None
+
+    def _collect(self, pressed, links, writes):
+        deadline = pressed + self.timeout
+        latency = {}
+        errors = {}
+        for name, write in writes.items():
+            try:
+                error = write.result(max(0.0, deadline - time.perf_counter()))
+            except concurrent.futures.TimeoutError:
+                error = "stop still being written"
+            if error is not None:
+                errors[name] = error
+                latency[name] = None
+                continue
+            transport = links[name]
+            answered = transport.stopped.wait(max(0.0, deadline - time.perf_counter()))
+            latency[name] = transport.stopped_at - pressed if answered else None
+        times = list(latency.values())
+        worst = None if not times or None in times else max(times)
+        result = {"time": time.time(), "latency": latency, "errors": errors, "worst": worst,
+                  "within_budget": worst is not None and worst <= self.budget}
+        with self._lock:
+            self.history.append(result)
+        return result
+
+    def summary(self):
+        with self._lock:
+            worst = [r["worst"] for r in self.history if r["worst"] is not None]
+            return {"presses": len(self.history),
+                    "unanswered": sum(r["worst"] is None for r in self.history),
+                    "over_budget": sum(not r["within_budget"] for r in self.history),
+                    "worst": max(worst) if worst else None}
+
+
+def stop_summary(result):
+    # One line for the UI
+    if not result["latency"]:
+        return "No device connected"
+    missing = [name for name, seconds in result["latency"].items() if seconds is None]
+    if missing:
+        return "No stop confirmation from " + ", ".join(sorted(missing))
+    return f"All motors stopped, confirmed in {result['worst'] * 1000:.0f} ms"
+
@@ -0,0 +1,337 @@
+# TriAxis Pro Fill
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Area fills for engraving: a bitmap becomes one scanline per pixel row
+# over its dark pixels, and closed SVG shapes are hatched at an angle with
+# the even-odd rule, so holes stay empty. Both work on whole arrays: runs
+# are found from the edges of each row, hatch crossings from every edge at
+# once. Large jobs are cut into bands of TILE_LINES scanlines and the bands
+# handed to a process pool; the runs are put back together in serpentine
+# order, every other line right to left, so the head never runs back to
+# the start of a line. The result is the same [x, y, z, feed] rows as an
+# imported drawing, for the planner and the sender or a step table.
+
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+import job_import
+import planner
+
+PIXEL_MM = 0.1           # size of an image pixel on the work
+THRESHOLD = 128          # grey levels below this are engraved
+HATCH_SPACING = 0.5      # mm between hatch lines
+HATCH_ANGLE = 45.0       # degrees from the X axis
+FILL_FEED = job_import.SVG_FEED
+TILE_LINES = 256         # scanlines per band handed to a worker
+POOL_MIN_WORK = 2000000  # pixels or crossings below which one process is quicker
+
+NETPBM_FIELD = re.compile(rb'(?:\s|#[^\n]*\n?)*(\d+)')
+IMAGE_SUFFIXES = ('pgm', 'pbm', 'pnm', 'png', 'bmp', 'gif', 'jpg', 'jpeg', 'tif', 'tiff')
+
+
+class FillError(Exception):
+    pass
+
+
+def read_netpbm(path):
+    # Grey levels 0-255 from a PBM or PGM file, plain or raw
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic = data[:2]
+    if magic not in (b'P1', b'P2', b'P4', b'P5'):
+        raise FillError(f"Not a PBM or PGM image: {path}")
+    fields = []
+    position = 2
+    for _ in range(2 if magic in (b'P1', b'P4') else 3):
+        match = NETPBM_FIELD.match(data, position)
+        if match is None:
+            raise FillError(f"Bad image header: {path}")
+        fields.append(int(match.group(1)))
+        position = match.end()
+    width, height = fields[:2]
+    maxval = fields[2] if len(fields) > 2 else 1
+    raster = data[position + 1:]
+    try:
+        if magic == b'P4':
+            packed = np.frombuffer(raster, np.uint8, height * ((width + 7) // 8))
+            bits = np.unpackbits(packed.reshape(height, -1), axis=1)[:, :width]
+            return (1 - bits) * np.uint8(255)
+        if magic == b'P1':
+            bits = np.frombuffer(re.sub(rb'#[^\n]*|\s', b'', raster), np.uint8)[:width * height] - ord('0')
+            return ((1 - bits) * 255).astype(np.uint8).reshape(height, width)
+        if magic == b'P5':
+            values = np.frombuffer(raster, np.uint8 if maxval < 256 else '>u2', width * height)
+        else:
+            values = np.array(raster.split()[:width * height], dtype=np.int64)
+        values = values.reshape(height, width)
+    except ValueError:
+        raise FillError(f"Truncated image: {path}")
+    return (values * (255 / maxval)).astype(np.uint8)
+
+
+def load_bitmap(path, threshold=THRESHOLD):
+    # True where the image is darker than `threshold`: the pixels to engrave
+    suffix = str(path).lower().rsplit('.', 1)[-1]
+    if suffix in ('pgm', 'pbm', 'pnm'):
+        grey = read_netpbm(path)
+    elif Image is None:
+        raise FillError(f"Reading .{suffix} images needs Pillow; save the image as PGM instead")
+    else:
+        try:
+            with Image.open(path) as image:
+                grey = np.asarray(image.convert('L'))
+        except OSError as e:
+            raise FillError(f"Can't read image {path}: {e}")
+    return grey < threshold
+
+
+def _map_tiles(function, tiles, work, workers=None):
+    # function(tile) for every tile, in order. Spawned rather than forked
+    # processes, as the apps have threads running; where there is one core,
+    # little work or no process support, the tiles run here instead.
+    workers = min(workers or os.cpu_count() or 1, len(tiles))
+    if workers > 1 and work >= POOL_MIN_WORK:
+        try:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                return list(pool.map(function, tiles))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass
+    return [function(tile) for tile in tiles]
+
+
+def _raster_tile(tile):
+    # Runs of set pixels in a band of rows: (line, first column, end column)
+    packed, width, lines = tile
+    band = np.unpackbits(packed, axis=1, count=width).astype(bool)
+    padded = np.zeros((len(band), width + 2), dtype=bool)
+    padded[:, 1:-1] = band
+    edges = np.diff(padded.view(np.int8), axis=1)
+    # Row-major, so each row's rising and falling edges alternate
+    rows, columns = np.nonzero(edges)
+    rising = edges[rows, columns] > 0
+    return lines[rows[rising]], columns[rising], columns[~rising]
+
+
+def serpentine(lines, starts, ends):
+    # Runs ordered line by line, every other non-empty line right to left,
+    # as (line, from, to)
+    if not len(lines):
+        return lines, starts, ends
+    _, ordinal = np.unique(lines, return_inverse=True)
+    backwards = ordinal % 2 == 1
+    order = np.lexsort((np.where(backwards, -starts, starts), lines))
+    first = np.where(backwards, ends, starts)
+    last = np.where(backwards, starts, ends)
+    return lines[order], first[order], last[order]
+
+
+def raster_segments(mask, pixel_steps, line_step=1, workers=None, tile_lines=TILE_LINES):
+    # (N, 2, 2) [from, to] step coordinates scanning a boolean image, one
+    # line every `line_step` rows through the middle of the pixels. Image
+    # rows run downwards, machine Y upwards.
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim != 2:
+        raise FillError("A bitmap needs two dimensions")
+    lines = np.arange(0, mask.shape[0], line_step)
+    tiles = [(np.packbits(mask[lines[i:i + tile_lines]], axis=1), mask.shape[1], lines[i:i + tile_lines])
+             for i in range(0, len(lines), tile_lines)]
+    if not tiles:
+        return np.empty((0, 2, 2))
+    parts = _map_tiles(_raster_tile, tiles, len(lines) * mask.shape[1], workers)
+    lines, first, last = serpentine(*(np.concatenate(part) for part in zip(*parts)))
+    segments = np.empty((len(lines), 2, 2))
+    segments[:, 0, 0] = first
+    segments[:, 1, 0] = last
+    segments[:, :, 0] *= pixel_steps
+    segments[:, :, 1] = (-(lines + 0.5) * pixel_steps)[:, None]
+    return segments
+
+
+def _hatch_tile(tile):
+    # Crossings of hatch lines first..stop-1 with the edges, paired into
+    # spans: (line, from x, to x). Y is in line spacings. An edge counts
+    # from its lower end up to but not including its upper one, so a line
+    # through a vertex crosses once and every line crosses an even number
+    # of times.
+    edges, first, stop = tile
+    x0, y0, x1, y1 = edges.T
+    k0 = np.maximum(np.ceil(np.minimum(y0, y1)), first).astype(np.int64)
+    k1 = np.minimum(np.ceil(np.maximum(y0, y1)) - 1, stop - 1).astype(np.int64)
+    counts = np.maximum(k1 - k0 + 1, 0)
+    edge = np.repeat(np.arange(len(edges)), counts)
+    k = k0[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = x0[edge] + (k - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+    order = np.lexsort((x, k))
+    k = k[order]
+    x = x[order]
+    return k[0::2], x[0::2], x[1::2]
+
+
+def hatch_segments(polygons, spacing, angle=HATCH_ANGLE, workers=None, tile_lines=TILE_LINES):
+    # (N, 2, 2) [from, to] step coordinates hatching closed polygons (step
+    # arrays, closed here if they aren't) at `angle` degrees, `spacing`
+    # steps apart
+    if spacing <= 0:
+        raise FillError("Hatch spacing must be positive")
+    edges = []
+    for polygon in polygons:
+        points = np.asarray(polygon, dtype=np.float64)
+        if len(points) < 3:
+            continue
+        closed = np.vstack([points, points[:1]])
+        edges.append(np.hstack([closed[:-1], closed[1:]]))
+    if not edges:
+        return np.empty((0, 2, 2))
+    edges = np.vstack(edges)
+
+    # Turned by -angle so the hatch lines run along X, one unit of Y apart
+    cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    turned = np.empty_like(edges)
+    for i in (0, 2):
+        turned[:, i] = edges[:, i] * cos + edges[:, i + 1] * sin
+        turned[:, i + 1] = (edges[:, i + 1] * cos - edges[:, i] * sin) / spacing
+    turned = turned[turned[:, 1] != turned[:, 3]]
+    if not len(turned):
+        return np.empty((0, 2, 2))
+    low = np.ceil(np.minimum(turned[:, 1], turned[:, 3]))
+    high = np.ceil(np.maximum(turned[:, 1], turned[:, 3])) - 1
+    first, last = int(low.min()), int(high.max())
+    tiles = []
+    for start in range(first, last + 1, tile_lines):
+        stop = min(start + tile_lines, last + 1)
+        tiles.append((turned[(low < stop) & (high >= start)], start, stop))
+    work = int(np.maximum(high - low + 1, 0).sum())
+    parts = _map_tiles(_hatch_tile, tiles, work, workers)
+    lines, first_x, last_x = serpentine(*(np.concatenate(part) for part in zip(*parts)))
+    keep = first_x != last_x
+    lines, first_x, last_x = lines[keep], first_x[keep], last_x[keep]
+
+    y = lines * spacing
+    segments = np.empty((len(lines), 2, 2))
+    for end, x in ((0, first_x), (1, last_x)):
+        segments[:, end, 0] = x * cos - y * sin
+        segments[:, end, 1] = x * sin + y * cos
+    return segments
+
+
+def fill_rows(segments, feed, lift):
+    # [x, y, z, feed] int32 rows drawing each segment at Z=0, with pen-up
+    # travel at Z=lift between them. Rows that don't move are dropped.
+    segments = np.asarray(segments, dtype=np.float64)
+    rows = np.empty((len(segments), 4, 4))
+    rows[:, :2, :2] = segments[:, [0, 0]]
+    rows[:, 2:, :2] = segments[:, [1, 1]]
+    rows[:, :, 2] = [lift, 0, 0, lift]
+    rows[:, :, 3] = [job_import.RAPID_FEED, feed, feed, job_import.RAPID_FEED]
+    rows = rows.reshape(-1, 4)
+    rows[:, 3] = np.clip(rows[:, 3], planner.MIN_FEED, planner.MAX_SPEED)
+    rows = np.rint(rows).astype(np.int32)
+    if not len(rows):
+        return rows
+    moves = np.ones(len(rows), dtype=bool)
+    moves[1:] = np.any(rows[1:, :3] != rows[:-1, :3], axis=1)
+    return rows[moves]
+
+
+def fill_blocks(rows, block_rows=job_import.BLOCK_ROWS):
+    for start in range(0, len(rows), block_rows):
+        yield rows[start:start + block_rows]
+
+
+def load(path, steps_per_mm=job_import.STEPS_PER_MM, pixel_mm=PIXEL_MM, spacing=HATCH_SPACING,
+         angle=HATCH_ANGLE, feed=FILL_FEED, pen_lift=job_import.PEN_LIFT, threshold=THRESHOLD,
+         workers=None):
+    # Fill rows for an image or the closed shapes of an SVG, by extension
+    suffix = str(path).lower().rsplit('.', 1)[-1]
+    if suffix == 'svg':
+        segments = hatch_segments(job_import.svg_strokes(path, steps_per_mm), spacing * steps_per_mm,
+                                  angle, workers)
+    elif suffix in IMAGE_SUFFIXES:
+        segments = raster_segments(load_bitmap(path, threshold), pixel_mm * steps_per_mm,
+                                   workers=workers)
+    else:
+        raise FillError(f"Unsupported fill file: {path}")
+    if not len(segments):
+        raise FillError(f"Nothing to fill in {path}")
+    return fill_rows(segments, feed * steps_per_mm / 60, pen_lift * steps_per_mm)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # A 10 x 4 block of pixels with a two-pixel hole: serpentine runs
+    mask = np.zeros((6, 12), dtype=bool)
+    mask[1:5, 1:11] = True
+    mask[2, 4:6] = False
+    segments = raster_segments(mask, 1)
+    print("raster runs:", [(int(a[0]), int(b[0]), float(a[1])) for a, b in segments])
+
+    # A 100-step square with a 50-step square hole, hatched at 30 degrees:
+    # the drawn length is the area over the spacing
+    outer = np.array([[0, 0], [100, 0], [100, 100], [0, 100]], dtype=float)
+    inner = outer[::-1] * 0.5 + 25
+    segments = hatch_segments([outer, inner], 1.0, 30.0)
+    drawn = np.linalg.norm(segments[:, 1] - segments[:, 0], axis=1).sum()
+    print(f"hatch: {len(segments)} spans, drawn {drawn:.0f} steps against {100 * 100 - 50 * 50} expected")
+
+    # PGM round trip
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "block.pgm")
+        with open(path, 'wb') as f:
+            f.write(b"P5\n# test\n12 6\n255\n" + np.where(mask, 0, 255).astype(np.uint8).tobytes())
+        print("pgm:", "matches" if np.array_equal(load_bitmap(path), mask) else "DIFFERS",
+              f"| {len(load(path))} rows")
+
+    # A 4000 x 4000 engraving: rings over noise, as a photo would threshold
+    # to, then 20,000 circles hatched at 45 degrees
+    rng = np.random.default_rng(3)
+    y, x = np.mgrid[:4000, :4000].astype(np.float32)
+    radius = np.hypot(x - 2000, y - 2000)
+    image = ((radius.astype(np.int32) // 40) % 2 == 0) ^ (rng.random((4000, 4000)) < 0.02)
+    del x, y, radius
+    print(f"cores: {os.cpu_count()}")
+    for label, workers in (("one process", 1), ("process pool", None)):
+        start = time.perf_counter()
+        segments = raster_segments(image, PIXEL_MM * job_import.STEPS_PER_MM, workers=workers)
+        traced = time.perf_counter() - start
+        rows = fill_rows(segments, FILL_FEED * job_import.STEPS_PER_MM / 60,
+                         job_import.PEN_LIFT * job_import.STEPS_PER_MM)
+        print(f"raster 4000x4000, {label:12}: {traced:5.2f} s runs + {time.perf_counter() - start - traced:4.2f} s "
+              f"rows; {len(segments):,} runs, {len(rows):,} rows")
+
+    angles = np.linspace(0, 2 * np.pi, 33)[:-1]
+    circle = np.column_stack([np.cos(angles), np.sin(angles)])
+    centers = rng.uniform(0, 32000, (20000, 2))
+    radii = rng.uniform(20, 400, 20000)
+    circles = [center + r * circle for center, r in zip(centers, radii)]
+    for label, workers in (("one process", 1), ("process pool", None)):
+        start = time.perf_counter()
+        segments = hatch_segments(circles, HATCH_SPACING * job_import.STEPS_PER_MM, workers=workers)
+        print(f"hatch 20,000 circles, {label:12}: {time.perf_counter() - start:5.2f} s; "
+              f"{len(segments):,} spans")
+
+    # Serpentine against every line left to right: pen-up travel
+    def travel(segments):
+        return np.linalg.norm(segments[1:, 0] - segments[:-1, 1], axis=1).sum()
+
+    segments = raster_segments(image[:1000], PIXEL_MM * job_import.STEPS_PER_MM)
+    flipped = segments[:, 0, 0] > segments[:, 1, 0]
+    one_way = segments.copy()
+    one_way[flipped] = one_way[flipped][:, ::-1]
+    one_way = one_way[np.lexsort((one_way[:, 0, 0], -one_way[:, 0, 1]))]
+    print(f"pen-up travel, 1000 lines: serpentine {travel(segments) / 1e6:.1f}M steps, "
+          f"left to right {travel(one_way) / 1e6:.1f}M steps")
@@ -0,0 +1,208 @@
+# TriAxis Pro Fleet Mode
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Drives a row of identical controllers from one host. Each controller has
+# its own ConnectionManager session; connects, job broadcasts, status polls
+# and emergency stops fan out over a thread pool so every device works in
+# parallel.
+
+import concurrent.futures
+import queue
+import threading
+import time
+
+from connection import ConnectionManager
+from estop import EmergencyStop
+from transport import TransportError
+
+BROADCAST_CHUNK = 32
+
+
+class FleetSession:
+    def __init__(self, name, kind, address, port=None):
+        self.name = name
+        self.kind = kind
+        self.address = address
+        self.port = port
+        self.manager = ConnectionManager()
+        self.progress = 0.0
+        self.state = "idle"
+        self.error = None
+        self.commands_sent = 0
+        # Replies come back on one queue with nothing to match them to their
+        # request, so a broadcast and a status poll take turns
+        self._requests = threading.Lock()
+
+    @property
+    def connected(self):
+        return self.manager.is_connected
+
+    def connect(self):
+        if self.kind == "WiFi":
+            self.manager.connect_wifi(self.address, self.port)
+        else:
+            self.manager.connect_bluetooth(self.address)
+        self.state = "connected"
+        return True
+
+    def request(self, command, timeout):
+        with self._requests:
+            transport = self.manager.transport
+            # A reply that came in after an earlier request timed out
+            # would otherwise be taken as this one's
+            while True:
+                try:
+                    transport.replies.get_nowait()
+                except queue.Empty:
+                    break
+            return transport.request(command, timeout=timeout)
+
+
+class FleetManager:
+    def __init__(self, max_workers=32):
+        self.sessions = {}
+        self.groups = {}
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.estop = EmergencyStop()
+
+    def add_wifi(self, name, ip, port=None, group=None):
+        return self._add(FleetSession(name, "WiFi", ip, port), group)
+
+    def add_bluetooth(self, name, address, group=None):
+        return self._add(FleetSession(name, "Bluetooth", address), group)
+
+    def _add(self, session, group):
+        self.sessions[session.name] = session
+        if group:
+            self.groups.setdefault(group, set()).add(session.name)
+        return session
+
+    def select(self, group=None):
+        if group is None:
+            return list(self.sessions.values())
+        return [self.sessions[n] for n in sorted(self.groups.get(group, ()))]
+
+    def _fan_out(self, sessions, work):
+        # Run work(session) everywhere at once; map name -> result or exception
+        futures = {self.pool.submit(work, s): s.name for s in sessions}
+        results = {}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+        return results
+
+    def connect_all(self, group=None):
+        def connect(session):
+            try:
+                return session.connect()
+            except (TransportError, OSError) as e:
+                session.state = "error"
+                session.error = str(e)
+                raise
+
+        return self._fan_out(self.select(group), connect)
+
+    def disconnect_all(self):
+        for session in self.sessions.values():
+            session.manager.disconnect()
+            session.state = "idle"
+
+    def broadcast(self, commands, group=None, on_progress=None, chunk=BROADCAST_CHUNK,
+                  ack_timeout=5.0):
+        # Send the same job to every connected device in the group. Each chunk
+        # is closed by a getStatus round trip, which paces the device and
+        # gives per-device progress; on a link with an ack window the window
+        # already paces it and only the end of the job needs one.
+        commands = list(commands)
+        total = len(commands)
+
+        def run(session):
+            session.progress = 0.0
+            session.commands_sent = 0
+            session.state = "running"
+            transport = session.manager.transport
+            windowed = transport.window is not None
+            # An emergency stop moves the epoch on and ends the broadcast
+            epoch = transport.epoch
+            for start in range(0, total, chunk):
+                if transport.epoch != epoch:
+                    session.state = "stopped"
+                    return session.commands_sent
+                block = commands[start:start + chunk]
+                transport.send_many(block, epoch)
+                if not windowed:
+                    session.request({"action": "getStatus"}, ack_timeout)
+                session.commands_sent += len(block)
+                session.progress = session.commands_sent / total
+                if on_progress:
+                    on_progress(session.name, session.progress)
+            if windowed:
+                session.request({"action": "getStatus"}, ack_timeout)
+            session.state = "done"
+            return session.commands_sent
+
+        return self._fan_out([s for s in self.select(group) if s.connected], run)
+
+    def status_all(self, group=None, timeout=2.0):
+        # One view of every device: name -> status dict (None if unreachable)
+        def poll(session):
+            return session.request({"action": "getStatus"}, timeout)
+
+        results = self._fan_out([s for s in self.select(group) if s.connected], poll)
+        return {name: (None if isinstance(r, Exception) else r) for name, r in results.items()}
+
+    def aggregate_status(self, group=None):
+        rows = []
+        for name, status in sorted(self.status_all(group).items()):
+            session = self.sessions[name]
+            if status is None:
+                rows.append({"name": name, "online": False, "progress": session.progress})
+                continue
+            rows.append({"name": name, "online": True, "progress": session.progress,
+                         "enabled": status.get("motorsEnabled"),
+                         "emergencyStop": status.get("emergencyStop"),
+                         "positions": status.get("positions")})
+        return rows
+
+    def emergency_stop_all(self):
+        # The stop bytes go out on every connected link at once, ahead of
+        # any broadcast still sending; returns the EmergencyStop result
+        # with each device's press-to-confirmation latency
+        sessions = [s for s in self.sessions.values() if s.connected]
+        result = self.estop.trigger({s.name: s.manager.transport for s in sessions})
+        for session in sessions:
+            if result["latency"].get(session.name) is not None:
+                session.state = "stopped"
+        return result
+
+    def shutdown(self):
+        self.disconnect_all()
+        self.pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    from simulator import SimulatorServer, SimulatedController, BLUETOOTH
+
+    job_length = 600
+    job = [{"action": "move", "axis": "XYZ"[i % 3], "steps": 10 if i % 2 else -10, "speed": 500}
+           for i in range(job_length)]
+    print("devices  commands/s  per device")
+    for count in (1, 2, 4, 8, 16):
+        servers = [SimulatorServer(SimulatedController(BLUETOOTH), time_scale=1.0) for _ in range(count)]
+        fleet = FleetManager(max_workers=count)
+        for i, server in enumerate(servers):
+            host, port = server.start_tcp()
+            fleet.add_wifi(f"sim{i}", host, port)
+        fleet.connect_all()
+        start = time.perf_counter()
+        fleet.broadcast(job)
+        elapsed = time.perf_counter() - start
+        rate = count * job_length / elapsed
+        print(f"{count:7d}  {rate:10,.0f}  {rate / count:10,.0f}")
+        fleet.shutdown()
+        for server in servers:
+            server.stop()
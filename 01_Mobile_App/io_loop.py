@@ -0,0 +1,205 @@
+# TriAxis Pro I/O Loop
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# One asyncio loop on one background thread for all device I/O: connects,
+# link reads, retransmit timers, status polling and discovery. Nothing
+# waits on a thread of its own, so the thread count stays the same however
+# many links and operations there are, and an idle loop sleeps until a
+# socket or timer needs it. Work is started with submit(), whose Future
+# can be cancelled from any thread. Results go back to the UI through a
+# UiQueue, which wakes the UI thread once per burst of callbacks rather
+# than once per callback.
+
+import asyncio
+import collections
+import concurrent.futures
+import selectors
+import threading
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class _CountingSelector(selectors.DefaultSelector):
+    # Counts the loop's wakeups
+    def __init__(self):
+        super().__init__()
+        self.wakeups = 0
+
+    def select(self, timeout=None):
+        events = super().select(timeout)
+        self.wakeups += 1
+        return events
+
+
+class IOLoop:
+    def __init__(self):
+        self.selector = _CountingSelector()
+        self.loop = asyncio.SelectorEventLoop(self.selector)
+        self._thread = threading.Thread(target=self._run, name="triaxis-io", daemon=True)
+        self._thread.start()
+
+    @property
+    def wakeups(self):
+        return self.selector.wakeups
+
+    def in_loop(self):
+        return threading.get_ident() == self._thread.ident
+
+    def submit(self, coroutine):
+        # Runs a coroutine on the loop; the returned concurrent Future's
+        # cancel() cancels it wherever it is waiting
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call(self, callback, *args):
+        # callback(*args) on the loop, soon; from any thread
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_wait(self, callback, *args):
+        # callback(*args) on the loop, returning its result; run directly
+        # when already there
+        if self.in_loop():
+            return callback(*args)
+        done = concurrent.futures.Future()
+
+        def run():
+            try:
+                done.set_result(callback(*args))
+            except BaseException as e:
+                done.set_exception(e)
+
+        self.loop.call_soon_threadsafe(run)
+        return done.result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+def shared():
+    # The process's I/O loop, started on first use
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = IOLoop()
+        return _shared
+
+
+class UiQueue:
+    # Callbacks from the I/O loop, or any thread, run on the UI thread in
+    # order. `schedule(drain)` must run drain on the UI thread soon, e.g.
+    # lambda drain: root.after(0, drain) or Clock.schedule_once.
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.posted = 0
+        self.wakeups = 0
+        self._pending = collections.deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def post(self, callback, *args):
+        with self._lock:
+            self._pending.append((callback, args))
+            self.posted += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+            self.wakeups += 1
+        self.schedule(self._drain)
+
+    def wrap(self, callback):
+        # A function that posts callback with whatever it is called with
+        return lambda *args: self.post(callback, *args)
+
+    def _drain(self, *_):
+        with self._lock:
+            pending, self._pending = self._pending, collections.deque()
+            self._scheduled = False
+        for callback, args in pending:
+            callback(*args)
+
+
+if __name__ == "__main__":
+    import socket
+    import time
+
+    import io_loop
+    import simulator
+    from connection import ConnectionManager
+
+    # Threads of the process apart from the simulated devices' own
+    def client_threads():
+        server = ('_accept_loop', '_read_socket', '_clock_loop', '_read_fd')
+        return sum(not any(name in t.name for name in server) for t in threading.enumerate())
+
+    # The module the transports import, not this __main__ copy of it
+    io = io_loop.shared()
+    controller = simulator.SimulatedController(simulator.WIFI)
+    server = simulator.SimulatorServer(controller, time_scale=1.0)
+    host, port = server.start_tcp()
+    before = client_threads()
+
+    # 50 links opened at once, all with ack windows
+    managers = [ConnectionManager() for _ in range(50)]
+    started = time.perf_counter()
+    for future in [m.connect("WiFi", host, port) for m in managers]:
+        future.result()
+    opened = time.perf_counter() - started
+    print(f"50 links: connected in {opened * 1000:.0f} ms, threads {before} -> {client_threads()} "
+          f"(a reader and a retransmit timer per link before)")
+    wakeups = io.wakeups
+    time.sleep(2.0)
+    print(f"idle with 50 links: {(io.wakeups - wakeups) / 2:.1f} loop wakeups/s")
+    for manager in managers:
+        manager.disconnect()
+
+    # A device that takes the connection but never answers
+    silent = socket.socket()
+    silent.bind(('127.0.0.1', 0))
+    silent.listen(8)
+    silent_host, silent_port = silent.getsockname()
+    manager = ConnectionManager()
+    future = manager.connect("WiFi", silent_host, silent_port, timeout=0.5)
+    time.sleep(0.1)
+    started = time.perf_counter()
+    future.cancel()
+    while manager.transport is not None or not future.done():
+        time.sleep(0.001)
+    print(f"cancel: connect abandoned {(time.perf_counter() - started) * 1000:.1f} ms after cancel()")
+    started = time.perf_counter()
+    try:
+        manager.connect("WiFi", silent_host, silent_port, timeout=0.5).result()
+    except Exception as e:
+        print(f"deadline: {type(e).__name__} after {(time.perf_counter() - started) * 1000:.0f} ms ({e})")
+    for _ in range(20):
+        manager.connect("WiFi", silent_host, silent_port, timeout=5.0)
+    time.sleep(0.1)
+    print(f"20 clicks on Connect: {client_threads() - before} extra threads")
+    manager.disconnect()
+    silent.close()
+
+    # The device goes away and comes back on the same port with its
+    # settings lost; the link comes back with them
+    states = []
+    manager = ConnectionManager()
+    manager.on_state = lambda state, detail: states.append((time.perf_counter(), state, detail))
+    manager.connect("WiFi", host, port).result()
+    manager.send_commands([{"action": "enable", "state": True},
+                           {"action": "setSpeed", "axis": "X", "speed": 1234}])
+    time.sleep(0.2)
+    server.stop()
+    dropped = time.perf_counter()
+    manager.transport.sock.shutdown(socket.SHUT_RDWR)
+    time.sleep(1.0)
+    controller = simulator.SimulatedController(simulator.WIFI)
+    server = simulator.SimulatorServer(controller, time_scale=1.0)
+    server.start_tcp(host, port)
+    while not manager.is_connected and time.perf_counter() - dropped < 30:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    print("reconnect: " + ", ".join(f"{state} at {(at - dropped) * 1000:.0f} ms" for at, state, _ in states))
+    print(f"restored: motors enabled {controller.motors_enabled}, X speed {controller.speeds.get('X')}")
+    manager.disconnect()
+    server.stop()
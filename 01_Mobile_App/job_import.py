@@ -0,0 +1,429 @@
+# TriAxis Pro Job Import
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Turns CAM output (G-code) and vector drawings (SVG paths) into the same
+# [x, y, z, feed] step rows the planner streams as "path" commands. Both
+# parsers are generators over a memory-mapped or chunk-read file and hand
+# out fixed-size int32 blocks, so a job of any length is never held in
+# memory and the sender can start on the first block while the rest of the
+# file is still being parsed.
+
+import math
+import mmap
+import re
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+import numpy as np
+
+import planner
+import stroke_order
+
+STEPS_PER_MM = 80.0      # 1/16 microstepping, 20-tooth GT2 pulley
+BLOCK_ROWS = 4096        # segments per block handed to the sender
+RAPID_FEED = planner.MAX_SPEED
+SVG_FEED = 600.0         # mm/min for drawn SVG strokes
+SVG_MM_PER_UNIT = 25.4 / 96  # CSS pixels
+PEN_LIFT = 5.0           # mm of Z between SVG subpaths
+
+GCODE_WORD = re.compile(rb'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+GCODE_COMMENT = re.compile(rb'\([^)]*\)|;.*')
+SVG_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+SVG_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+
+class JobError(Exception):
+    pass
+
+
+class BlockWriter:
+    # Collects rows in a flat array('i') and releases them as (N, 4) int32
+    # blocks. Rows that don't move the machine are dropped.
+    def __init__(self, block_rows=BLOCK_ROWS):
+        self.block_rows = block_rows
+        self.rows = array('i')
+        self.last = None
+        self.segments = 0
+
+    def add(self, x, y, z, feed):
+        point = (round(x), round(y), round(z))
+        if point == self.last:
+            return
+        self.last = point
+        self.rows.extend(point)
+        self.rows.append(round(min(max(feed, planner.MIN_FEED), planner.MAX_SPEED)))
+        self.segments += 1
+
+    def add_many(self, points, feed):
+        # points: (N, 3) float array in steps
+        for x, y, z in np.rint(points).astype(np.int64).tolist():
+            self.add(x, y, z, feed)
+
+    def full(self):
+        return len(self.rows) >= 4 * self.block_rows
+
+    def take(self):
+        block = np.array(self.rows, dtype=np.int32).reshape(-1, 4)
+        self.rows = array('i')
+        return block
+
+
+def iter_lines(path):
+    # Lines of a file as bytes, paged in by the OS instead of read up front
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        with mapped:
+            yield from iter(mapped.readline, b'')
+
+
+def arc_points(start, end, center, clockwise, tolerance):
+    # Chords along a circular (or helical, when Z changes) arc in the XY plane
+    radius = math.hypot(start[0] - center[0], start[1] - center[1])
+    a0 = math.atan2(start[1] - center[1], start[0] - center[0])
+    a1 = math.atan2(end[1] - center[1], end[0] - center[0])
+    sweep = a1 - a0
+    if clockwise and sweep >= 0:
+        sweep -= 2 * math.pi
+    elif not clockwise and sweep <= 0:
+        sweep += 2 * math.pi
+    n = planner.segments_for_arc(radius, abs(sweep), tolerance)
+    t = np.linspace(0.0, 1.0, n + 1)[1:]
+    angles = a0 + sweep * t
+    points = np.empty((n, 3))
+    points[:, 0] = center[0] + radius * np.cos(angles)
+    points[:, 1] = center[1] + radius * np.sin(angles)
+    points[:, 2] = start[2] + (end[2] - start[2]) * t
+    points[-1] = end
+    return points
+
+
+def parse_gcode(lines, steps_per_mm=STEPS_PER_MM, block_rows=BLOCK_ROWS,
+                tolerance=planner.CHORD_TOLERANCE):
+    # G0/G1/G2/G3 with G20/G21 units, G90/G91 distance mode and F in units
+    # per minute. Positions are kept in steps; arcs are flattened to chords.
+    writer = BlockWriter(block_rows)
+    position = [0.0, 0.0, 0.0]
+    scale = steps_per_mm
+    absolute = True
+    motion = 0
+    feed = planner.MIN_FEED
+    for number, line in enumerate(lines, 1):
+        line = GCODE_COMMENT.sub(b'', line).upper()
+        words = GCODE_WORD.findall(line)
+        if not words:
+            continue
+        axes = {}
+        for letter, value in words:
+            value = float(value)
+            if letter == b'G':
+                if value in (0, 1, 2, 3):
+                    motion = int(value)
+                elif value == 20:
+                    scale = 25.4 * steps_per_mm
+                elif value == 21:
+                    scale = steps_per_mm
+                elif value == 90:
+                    absolute = True
+                elif value == 91:
+                    absolute = False
+            elif letter == b'F':
+                feed = value * scale / 60
+            else:
+                axes[letter.decode()] = value
+        if not any(a in axes for a in 'XYZ'):
+            continue
+
+        target = list(position)
+        for i, axis in enumerate('XYZ'):
+            if axis in axes:
+                value = axes[axis] * scale
+                target[i] = value if absolute else position[i] + value
+        if motion == 0:
+            writer.add(*target, RAPID_FEED)
+        elif motion == 1:
+            writer.add(*target, feed)
+        else:
+            if 'R' in axes:
+                try:
+                    center = _center_from_radius(position, target, axes['R'] * scale, motion == 2)
+                except JobError as e:
+                    raise JobError(f"Line {number}: {e}")
+            elif 'I' in axes or 'J' in axes:
+                center = (position[0] + axes.get('I', 0.0) * scale,
+                          position[1] + axes.get('J', 0.0) * scale)
+            else:
+                raise JobError(f"Line {number}: arc without I/J or R")
+            writer.add_many(arc_points(position, target, center, motion == 2, tolerance), feed)
+        position = target
+        if writer.full():
+            yield writer.take()
+    if writer.rows:
+        yield writer.take()
+
+
+def _center_from_radius(start, end, radius, clockwise):
+    # R-format arcs: the centre lies on the chord's perpendicular bisector;
+    # a negative R picks the arc longer than half a circle
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    chord = math.hypot(dx, dy)
+    if chord == 0 or chord > 2 * abs(radius) * (1 + 1e-4):
+        raise JobError("Arc radius too small to reach its end point")
+    offset = math.sqrt(max(radius * radius - chord * chord / 4, 0.0))
+    if clockwise == (radius > 0):
+        offset = -offset
+    return (start[0] + dx / 2 - offset * dy / chord,
+            start[1] + dy / 2 + offset * dx / chord)
+
+
+# --- SVG -------------------------------------------------------------------------
+
+
+def _bezier(points, tolerance):
+    # Flatten one quadratic or cubic Bezier; chord count from its control
+    # polygon, which always bounds the curve length
+    control = np.asarray(points)
+    length = np.sum(np.hypot(*np.diff(control, axis=0).T))
+    n = max(2, int(math.ceil(math.sqrt(length / max(tolerance, 1e-6)))))
+    t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+    if len(control) == 3:
+        p0, p1, p2 = control
+        return (1 - t) ** 2 * p0 + 2 * (1 - t) * t * p1 + t * t * p2
+    p0, p1, p2, p3 = control
+    return ((1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1
+            + 3 * (1 - t) * t * t * p2 + t ** 3 * p3)
+
+
+def _svg_arc(start, rx, ry, rotation, large, sweep, end, tolerance):
+    # SVG endpoint arc to centre form (SVG 1.1 appendix F.6)
+    if rx == 0 or ry == 0 or start == end:
+        return np.array([end])
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx = (start[0] - end[0]) / 2
+    dy = (start[1] - end[1]) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+    rx, ry = abs(rx), abs(ry)
+    grow = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if grow > 1:
+        rx *= math.sqrt(grow)
+        ry *= math.sqrt(grow)
+    num = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    den = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(num / den, 0.0))
+    if large == sweep:
+        factor = -factor
+    cx1 = factor * rx * y1 / ry
+    cy1 = -factor * ry * x1 / rx
+    cx = cos_phi * cx1 - sin_phi * cy1 + (start[0] + end[0]) / 2
+    cy = sin_phi * cx1 + cos_phi * cy1 + (start[1] + end[1]) / 2
+    a0 = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    a1 = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    delta = a1 - a0
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    n = planner.segments_for_arc(max(rx, ry), abs(delta), tolerance)
+    angles = a0 + delta * np.linspace(0.0, 1.0, n + 1)[1:]
+    points = np.empty((n, 2))
+    points[:, 0] = cx + rx * cos_phi * np.cos(angles) - ry * sin_phi * np.sin(angles)
+    points[:, 1] = cy + rx * sin_phi * np.cos(angles) + ry * cos_phi * np.sin(angles)
+    points[-1] = end
+    return points
+
+
+def svg_path_polylines(d, tolerance=0.1):
+    # Polylines (lists of (N, 2) arrays in SVG user units) for one path's
+    # "d" attribute, one per subpath
+    tokens = SVG_TOKEN.findall(d)
+    current = (0.0, 0.0)
+    start = current
+    control = None
+    command = None
+    parts = []
+    index = 0
+    while index < len(tokens):
+        if tokens[index].isalpha():
+            command = tokens[index]
+            index += 1
+        elif command is None:
+            raise JobError(f"SVG path data must start with a command: {d[:20]!r}")
+        upper = command.upper()
+        relative = command.islower()
+        count = SVG_ARGS[upper]
+        args = [float(t) for t in tokens[index:index + count]]
+        if len(args) < count:
+            raise JobError(f"Truncated SVG path command {command!r}")
+        index += count
+        ox, oy = current if relative else (0.0, 0.0)
+
+        if upper == 'M':
+            current = start = (ox + args[0], oy + args[1])
+            parts.append([np.array([current])])
+            # Further pairs after a moveto are linetos
+            command = 'l' if relative else 'L'
+            control = None
+            continue
+        if not parts:
+            parts.append([np.array([current])])
+        if upper == 'Z':
+            points = np.array([start])
+            end = start
+        elif upper in 'LHV':
+            if upper == 'L':
+                end = (ox + args[0], oy + args[1])
+            elif upper == 'H':
+                end = ((current[0] if relative else 0.0) + args[0], current[1])
+            else:
+                end = (current[0], (current[1] if relative else 0.0) + args[0])
+            points = np.array([end])
+        elif upper in 'CS':
+            if upper == 'C':
+                c1 = (ox + args[0], oy + args[1])
+                rest = args[2:]
+            else:
+                c1 = current if control is None or control[1] != 'C' else \
+                    (2 * current[0] - control[0][0], 2 * current[1] - control[0][1])
+                rest = args
+            c2 = (ox + rest[0], oy + rest[1])
+            end = (ox + rest[2], oy + rest[3])
+            points = _bezier([current, c1, c2, end], tolerance)
+            control = (c2, 'C')
+        elif upper in 'QT':
+            if upper == 'Q':
+                c1 = (ox + args[0], oy + args[1])
+                end = (ox + args[2], oy + args[3])
+            else:
+                c1 = current if control is None or control[1] != 'Q' else \
+                    (2 * current[0] - control[0][0], 2 * current[1] - control[0][1])
+                end = (ox + args[0], oy + args[1])
+            points = _bezier([current, c1, end], tolerance)
+            control = (c1, 'Q')
+        else:
+            end = (ox + args[5], oy + args[6])
+            points = _svg_arc(current, args[0], args[1], args[2], bool(args[3]), bool(args[4]),
+                              end, tolerance)
+        if upper not in 'CSQT':
+            control = None
+        parts[-1].append(points)
+        current = end
+    return [np.concatenate(part) for part in parts if len(part) > 1]
+
+
+def _svg_shape_polylines(element, tag):
+    if tag == 'path':
+        return svg_path_polylines(element.get('d', ''))
+    if tag == 'line':
+        coords = [float(element.get(k, 0)) for k in ('x1', 'y1', 'x2', 'y2')]
+        return [np.array(coords).reshape(2, 2)]
+    if tag in ('polyline', 'polygon'):
+        values = [float(v) for v in re.findall(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?',
+                                                element.get('points', ''))]
+        points = np.array(values[:len(values) // 2 * 2]).reshape(-1, 2)
+        if tag == 'polygon' and len(points):
+            points = np.vstack([points, points[:1]])
+        return [points] if len(points) > 1 else []
+    return []
+
+
+def svg_strokes(path, steps_per_mm=STEPS_PER_MM):
+    # (N, 2) step arrays, one per subpath or shape, in document order.
+    # Elements are read incrementally and released once converted.
+    # Transforms are not applied; flatten them in the drawing program first.
+    scale = SVG_MM_PER_UNIT * steps_per_mm
+    for _, element in ElementTree.iterparse(path, events=('end',)):
+        tag = element.tag.rsplit('}', 1)[-1]
+        for polyline in _svg_shape_polylines(element, tag):
+            stroke = np.empty((len(polyline), 2))
+            # SVG Y grows downwards, machine Y upwards
+            stroke[:, 0] = polyline[:, 0] * scale
+            stroke[:, 1] = -polyline[:, 1] * scale
+            yield stroke
+        if tag in ('path', 'line', 'polyline', 'polygon', 'g'):
+            element.clear()
+
+
+def stroke_blocks(strokes, draw_feed, lift, block_rows=BLOCK_ROWS):
+    # Strokes drawn at Z=0 with pen-up travel at Z=lift between them
+    writer = BlockWriter(block_rows)
+    for stroke in strokes:
+        if writer.last is not None:
+            writer.add(writer.last[0], writer.last[1], lift, RAPID_FEED)
+        writer.add(stroke[0, 0], stroke[0, 1], lift, RAPID_FEED)
+        points = np.zeros((len(stroke), 3))
+        points[:, :2] = stroke
+        writer.add_many(points, draw_feed)
+        if writer.full():
+            yield writer.take()
+    if writer.last is not None:
+        writer.add(writer.last[0], writer.last[1], lift, RAPID_FEED)
+    if writer.rows:
+        yield writer.take()
+
+
+def parse_svg(path, steps_per_mm=STEPS_PER_MM, block_rows=BLOCK_ROWS, feed=SVG_FEED,
+              pen_lift=PEN_LIFT, order=False, on_report=None):
+    # With `order`, the strokes are collected and reordered for the least
+    # pen-up travel before the first block; on_report(report) gets the
+    # before/after estimate
+    draw_feed = feed * steps_per_mm / 60
+    strokes = svg_strokes(path, steps_per_mm)
+    if order:
+        strokes, report = stroke_order.optimize(list(strokes), draw_speed=draw_feed,
+                                                travel_speed=RAPID_FEED)
+        if on_report:
+            on_report(report)
+    yield from stroke_blocks(strokes, draw_feed, pen_lift * steps_per_mm, block_rows)
+
+
+def load(path, steps_per_mm=STEPS_PER_MM, block_rows=BLOCK_ROWS, order=False, on_report=None):
+    # Block generator for a job file, chosen by extension. G-code keeps its
+    # own order; only drawings are reordered.
+    suffix = str(path).lower().rsplit('.', 1)[-1]
+    if suffix == 'svg':
+        return parse_svg(path, steps_per_mm, block_rows, order=order, on_report=on_report)
+    if suffix in ('gcode', 'nc', 'ngc', 'tap', 'gc', 'g'):
+        return parse_gcode(iter_lines(path), steps_per_mm, block_rows)
+    raise JobError(f"Unsupported job file: {path}")
+
+
+def job_commands(blocks, chunk=planner.PATH_CHUNK):
+    # "path" commands over the blocks as they arrive
+    for block in blocks:
+        for start in range(0, len(block), chunk):
+            yield {"action": "path", "seg": block[start:start + chunk]}
+
+
+if __name__ == "__main__":
+    import os
+    import resource
+    import tempfile
+    import time
+
+    lines = 1_000_000
+    with tempfile.NamedTemporaryFile('w', suffix='.gcode', delete=False) as f:
+        f.write("G21 G90 (zigzag)\nF1200\n")
+        for i in range(lines):
+            f.write(f"G1 X{i % 200 * 0.5:.2f} Y{i // 200 * 0.1:.2f}\n" if i % 50 != 25
+                    else f"G2 X{i % 200 * 0.5:.2f} Y{i // 200 * 0.1:.2f} R5\n")
+        path = f.name
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    blocks = load(path)
+    first = next(blocks)
+    to_first = time.perf_counter() - start
+    segments = len(first) + sum(len(block) for block in blocks)
+    elapsed = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    os.unlink(path)
+    print(f"{lines:,} lines -> {segments:,} segments in {elapsed:.2f} s "
+          f"({lines / elapsed:,.0f} lines/s)")
+    print(f"first block after {to_first * 1000:.1f} ms, peak memory grew {rss_growth:,} KiB")
@@ -0,0 +1,97 @@
+# TriAxis Pro Jog
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Press-and-hold jogging. Pressing a jog button sends the held axes'
+# velocities ("jog", signed steps/s per axis); while anything is held a
+# small "jogKeep" frame follows every JOG_KEEPALIVE seconds. The controller
+# runs each axis towards a far target at its speed with the usual ramps,
+# and ramps it down on a zero velocity or when no frame has come for
+# JOG_TIMEOUT, so a dropped link or a frozen app can't leave an axis
+# running. Axes held together move together, which gives diagonals.
+#
+# Jog frames go straight onto the link, outside the ack window and the
+# dispatcher queue: a keepalive that waits behind a job is worse than one
+# that is lost, and the deadman covers losses. Velocity changes still go
+# to the session recorder, if one is given; keepalives don't. State lives
+# on the shared I/O loop; press() and release() can be called from any
+# thread. An emergency stop ends the jog, and held buttons must be pressed
+# again.
+
+import codec
+import io_loop
+import transport
+
+JOG_KEEPALIVE = 0.1    # seconds between keepalives while a button is held
+JOG_TIMEOUT = 0.18     # the controller's deadman (JOG_TIMEOUT_MS in the firmware)
+MAX_JOG_SPEED = 2000   # steps/s, the controller's top speed
+KEEPALIVE = {"action": "jogKeep"}
+
+
+class JogController:
+    def __init__(self, link, io=None, recorder=None):
+        self.link = link
+        self.io = io or io_loop.shared()
+        self.recorder = recorder   # a SessionRecorder, or anything with commands()
+        self.velocity = dict.fromkeys(codec.AXES, 0)
+        self.frames_sent = 0
+        self._epoch = None       # link epoch at the press
+        self._timer = None
+
+    @property
+    def active(self):
+        return any(self.velocity.values())
+
+    def press(self, velocities):
+        # axis -> signed steps/s; axes not given keep their velocity
+        self.io.call(self._update, dict(velocities))
+
+    def release(self, axes=None):
+        # The given axes, or every one
+        self.io.call(self._update, dict.fromkeys(axes or codec.AXES, 0))
+
+    def _update(self, changes):
+        if self._epoch is not None and self.link.epoch != self._epoch:
+            self._end()
+        was_active = self.active
+        for axis, speed in changes.items():
+            self.velocity[axis] = int(max(-MAX_JOG_SPEED, min(MAX_JOG_SPEED, speed)))
+        if not was_active:
+            if not self.active:
+                return
+            self._epoch = self.link.epoch
+        if not self._send({"action": "jog", "v": [self.velocity[a] for a in codec.AXES]}):
+            return
+        if not self.active:
+            self._end()
+        elif self._timer is None:
+            self._timer = self.io.loop.call_later(JOG_KEEPALIVE, self._keepalive)
+
+    def _keepalive(self):
+        self._timer = None
+        if self.link.epoch != self._epoch:
+            self._end()
+            return
+        if self._send(KEEPALIVE) and self.active:
+            self._timer = self.io.loop.call_later(JOG_KEEPALIVE, self._keepalive)
+
+    def _send(self, command):
+        try:
+            self.link.send_raw(self.link.encode(command), epoch=self._epoch)
+        except (transport.TransportError, OSError):
+            # The link is gone; the controller's deadman stops the axes
+            self._end()
+            return False
+        self.frames_sent += 1
+        if self.recorder is not None and command is not KEEPALIVE:
+            self.recorder.commands([command])
+        return True
+
+    def _end(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.velocity = dict.fromkeys(codec.AXES, 0)
+        self._epoch = None
+
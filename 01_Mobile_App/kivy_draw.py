@@ -0,0 +1,93 @@
+# TriAxis Pro Kivy Drawing
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# The Kivy app's Draw tab canvas: the signature pad and job preview on top
+# of canvas_view. Kept out of main.py so the app starts without it; it is
+# imported when the Draw tab is first opened.
+
+from kivy.uix.widget import Widget
+from kivy.graphics import Color, Line, PushMatrix, PopMatrix, Translate, Scale, InstructionGroup
+from kivy.clock import Clock
+
+import signature
+import canvas_view
+
+
+class KivyStrokeView(canvas_view.StrokeView):
+    # Strokes as Line instructions whose points grow in place; the canvas
+    # sets their colour once
+    def __init__(self, canvas, buffer, width=1.5):
+        super().__init__(buffer)
+        self.canvas = canvas
+        self.width = width
+
+    def clear(self):
+        for item in self.items:
+            self.canvas.remove(item)
+        super().clear()
+
+    def _create(self, coords):
+        line = Line(points=list(coords), width=self.width, cap='round', joint='round')
+        self.canvas.add(line)
+        return line
+
+    def _update(self, item, coords):
+        item.points = list(coords)
+
+
+class DrawCanvas(Widget):
+    # Signature pad and job preview. Drawing happens in a frame flipped to
+    # canvas coordinates (origin top left, Y down), the same ones the Tk
+    # app records, so the recorder and the preview work unchanged.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = signature.StrokeRecorder()
+        self.buffer = canvas_view.StrokeBuffer(self.recorder)
+        with self.canvas.before:
+            PushMatrix()
+            self.origin = Translate(0, 0)
+            Scale(1, -1, 1)
+            self.preview = InstructionGroup()
+        with self.canvas:
+            Color(0.17, 0.24, 0.31)
+        with self.canvas.after:
+            PopMatrix()
+        self.view = KivyStrokeView(self.canvas, self.buffer)
+        self.bind(pos=self.place, size=self.place)
+        Clock.schedule_interval(lambda dt: self.view.flush(), canvas_view.FRAME_INTERVAL / 1000)
+
+    def place(self, *args):
+        self.origin.xy = (self.x, self.top)
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        touch.grab(self)
+        self.buffer.begin(touch.x - self.x, self.top - touch.y)
+        return True
+
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+        # Drawn with the next frame, not per event
+        self.buffer.add(touch.x - self.x, self.top - touch.y)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        return True
+
+    def show_preview(self, lines):
+        self.preview.clear()
+        for is_travel, coords in lines:
+            self.preview.add(Color(0.84, 0.85, 0.86) if is_travel else Color(0.16, 0.5, 0.73))
+            self.preview.add(Line(points=coords, width=1))
+
+    def clear(self):
+        self.view.clear()
+        self.recorder.clear()
+        self.preview.clear()
@@ -1,114 +1,193 @@
+import startup  # first, so the startup clock starts at launch
 from kivy.app import App
-from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.button import Button
-from kivy.uix.label import Label
-from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
-from kivy.uix.slider import Slider
-from kivy.uix.gridlayout import GridLayout
-from kivy.uix.popup import Popup
-import json
+from kivy.clock import Clock
+from kivy.factory import Factory
+import threading
+import time
+
+# Widgets come from the Factory, which imports each one the first time it
+# is made; these modules load on first use too
+estop = startup.lazy_import('estop')
+discovery = startup.lazy_import('discovery')
+transport = startup.lazy_import('transport')
+codec = startup.lazy_import('codec')
+job_import = startup.lazy_import('job_import')
+canvas_view = startup.lazy_import('canvas_view')
+kivy_draw = startup.lazy_import('kivy_draw')
+jog = startup.lazy_import('jog')
+planner = startup.lazy_import('planner')
+pattern_cache = startup.lazy_import('pattern_cache')
+IMPORTED = time.perf_counter()
+
+TABS = ('Connect', 'Manual', 'Patterns', 'Draw', 'About')
+SOFT_AP = {'name': 'TriAxis_Controller', 'ip': '192.168.4.1'}   # the controller's own access point
 
 class TriAxisApp(App):
     def __init__(self):
         super().__init__()
         self.motor_positions = {'X': 0, 'Y': 0, 'Z': 0}
+        self.motor_speeds = {'X': 500, 'Y': 500, 'Z': 500}
         self.is_connected = False
+        self.links = {}  # name -> open Transport
+        self.joggers = {}  # name -> JogController for that link
+        self.draw_canvas = None
+        self._estop = None
+        self._pattern_cache = None
+        self.discovery = None
+        self.devices = {}  # kind -> devices found by the last scan
+        self.scans_left = 0
+        self.startup = startup.StartupTimer("Kivy app")
+        self.startup.mark('import', IMPORTED)
         
     def build(self):
         self.title = "TriAxis Pro - APEX PRECISION MECHATRONIX"
         
         # Main layout
-        main_layout = BoxLayout(orientation='vertical')
+        main_layout = Factory.BoxLayout(orientation='vertical')
         
         # Header
-        header = BoxLayout(size_hint_y=0.15, orientation='horizontal')
-        title_label = Label(text='TriAxis Pro\nby Amol M. | APEX PRECISION MECHATRONIX PVT. LTD.', 
-                           font_size='16sp', halign='left')
-        emergency_btn = Button(text='STOP', size_hint_x=0.2, background_color=[1, 0, 0, 1])
+        header = Factory.BoxLayout(size_hint_y=0.15, orientation='horizontal')
+        title_label = Factory.Label(text='TriAxis Pro\nby Amol M. | APEX PRECISION MECHATRONIX PVT. LTD.', 
+                                   font_size='16sp', halign='left')
+        emergency_btn = Factory.Button(text='STOP', size_hint_x=0.2, background_color=[1, 0, 0, 1])
         emergency_btn.bind(on_press=self.emergency_stop)
         
         header.add_widget(title_label)
         header.add_widget(emergency_btn)
         main_layout.add_widget(header)
         
-        # Tabbed panel
-        tab_panel = TabbedPanel(do_default_tab=False)
-        
-        # Connect Tab
-        connect_tab = TabbedPanelItem(text='Connect')
-        connect_layout = self.create_connect_tab()
-        connect_tab.add_widget(connect_layout)
-        tab_panel.add_widget(connect_tab)
-        
-        # Manual Tab
-        manual_tab = TabbedPanelItem(text='Manual')
-        manual_layout = self.create_manual_tab()
-        manual_tab.add_widget(manual_layout)
-        tab_panel.add_widget(manual_tab)
-        
-        # Patterns Tab
-        patterns_tab = TabbedPanelItem(text='Patterns')
-        patterns_layout = self.create_patterns_tab()
-        patterns_tab.add_widget(patterns_layout)
-        tab_panel.add_widget(patterns_tab)
-        
-        # About Tab
-        about_tab = TabbedPanelItem(text='About')
-        about_layout = self.create_about_tab()
-        about_tab.add_widget(about_layout)
-        tab_panel.add_widget(about_tab)
+        # Tabbed panel; only the Connect tab is built up front, the others
+        # the first time they are opened
+        tab_panel = Factory.TabbedPanel(do_default_tab=False)
+        self.tab_builders = {
+            'Connect': self.create_connect_tab,
+            'Manual': self.create_manual_tab,
+            'Patterns': self.create_patterns_tab,
+            'Draw': self.create_draw_tab,
+            'About': self.create_about_tab
+        }
+        self.tabs = {}
+        for name in TABS:
+            tab = Factory.TabbedPanelItem(text=name)
+            tab.bind(on_press=self.open_tab)
+            tab_panel.add_widget(tab)
+            self.tabs[name] = tab
+        self.open_tab(self.tabs['Connect'])
         
         main_layout.add_widget(tab_panel)
+        self.startup.mark('build')
         return main_layout
     
+    def on_start(self):
+        # The window exists by now; its first flip is the first painted frame
+        from kivy.core.window import Window
+        Window.bind(on_flip=self.on_first_frame)
+    
+    def on_stop(self):
+        self.disconnect()
+    
+    def on_first_frame(self, window):
+        window.unbind(on_flip=self.on_first_frame)
+        self.startup.mark('first_paint')
+        self.scan_devices()
+    
+    def open_tab(self, tab):
+        # Runs on press, before the panel switches to the tab on release
+        if tab.content is None:
+            tab.add_widget(self.tab_builders[tab.text]())
+    
+    def invalidate_tabs(self, *names):
+        # Rebuilt the next time they are opened
+        for name in names:
+            tab = self.tabs[name]
+            if tab.content is not None:
+                tab.remove_widget(tab.content)
+    
     def create_connect_tab(self):
-        layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
+        layout = Factory.BoxLayout(orientation='vertical', padding=20, spacing=10)
         
-        layout.add_widget(Label(text='Device Connection', font_size='20sp', size_hint_y=0.2))
+        layout.add_widget(Factory.Label(text='Device Connection', font_size='20sp', size_hint_y=0.2))
         
         # Connection buttons
-        bt_btn = Button(text='🔵 Connect via Bluetooth', size_hint_y=0.3)
+        bt_btn = Factory.Button(text='🔵 Connect via Bluetooth', size_hint_y=0.3)
         bt_btn.bind(on_press=self.connect_bluetooth)
         layout.add_widget(bt_btn)
         
-        wifi_btn = Button(text='📶 Connect via WiFi', size_hint_y=0.3)
+        wifi_btn = Factory.Button(text='📶 Connect via WiFi', size_hint_y=0.3)
         wifi_btn.bind(on_press=self.connect_wifi)
         layout.add_widget(wifi_btn)
         
-        self.status_label = Label(text='Ready to connect', size_hint_y=0.2)
+        self.status_label = Factory.Label(text='Ready to connect', size_hint_y=0.2)
         layout.add_widget(self.status_label)
         
+        # Filled in by discovery, which starts after the first frame
+        self.device_list = Factory.BoxLayout(orientation='vertical', size_hint_y=0.4)
+        layout.add_widget(self.device_list)
+        
         return layout
     
+    def scan_devices(self):
+        # Both radios are swept at once; devices show up as they answer
+        if self.discovery is None:
+            self.discovery = discovery.DiscoveryEngine()
+        self.device_list.clear_widgets()
+        self.devices = {}
+        self.status_label.text = 'Scanning for devices...'
+        self.scans_left = 2
+        for kind in (discovery.BLUETOOTH, discovery.WIFI):
+            self.discovery.scan(kind,
+                                lambda device, k=kind: Clock.schedule_once(lambda dt: self.add_device(device, k)),
+                                lambda devices: Clock.schedule_once(lambda dt: self.scan_done()))
+    
+    def add_device(self, device, kind):
+        self.startup.mark('first_device')
+        self.devices.setdefault(kind, []).append(device)
+        icon = '🔵' if kind == discovery.BLUETOOTH else '📶'
+        btn = Factory.Button(text=f"{icon} {device.get('name', 'TriAxis')}")
+        btn.bind(on_press=lambda x, d=device: self.connect_device(kind, d))
+        self.device_list.add_widget(btn)
+    
+    def scan_done(self):
+        self.scans_left -= 1
+        if self.scans_left:
+            return
+        found = len(self.device_list.children)
+        self.status_label.text = f'Found {found} device(s)' if found else 'No devices found'
+        self.startup.finish()
+    
     def create_manual_tab(self):
-        layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
+        layout = Factory.BoxLayout(orientation='vertical', padding=20, spacing=10)
         
         if not self.is_connected:
-            layout.add_widget(Label(text='⚠️ Please connect to device first', font_size='16sp'))
+            layout.add_widget(Factory.Label(text='⚠️ Please connect to device first', font_size='16sp'))
             return layout
         
-        layout.add_widget(Label(text='Manual Control', font_size='20sp', size_hint_y=0.1))
+        layout.add_widget(Factory.Label(text='Manual Control', font_size='20sp', size_hint_y=0.1))
         
         # Position display
-        pos_layout = GridLayout(cols=3, size_hint_y=0.2)
+        pos_layout = Factory.GridLayout(cols=3, size_hint_y=0.2)
         for axis in ['X', 'Y', 'Z']:
-            pos_layout.add_widget(Label(text=f'{axis}: 0.00'))
+            pos_layout.add_widget(Factory.Label(text=f'{axis}: 0.00'))
         layout.add_widget(pos_layout)
         
-        # Motor controls
+        # Motor controls: an axis runs at its slider speed while its button
+        # is held; two fingers on two axes jog a diagonal
         for axis in ['X', 'Y', 'Z']:
-            motor_layout = BoxLayout(orientation='horizontal', size_hint_y=0.2)
-            motor_layout.add_widget(Label(text=f'{axis}-Axis', size_hint_x=0.2))
+            motor_layout = Factory.BoxLayout(orientation='horizontal', size_hint_y=0.2)
+            motor_layout.add_widget(Factory.Label(text=f'{axis}-Axis', size_hint_x=0.2))
             
-            left_btn = Button(text='←', size_hint_x=0.2)
-            left_btn.bind(on_press=lambda x, a=axis: self.move_motor(a, -1))
+            left_btn = Factory.Button(text='←', size_hint_x=0.2)
+            left_btn.bind(on_press=lambda x, a=axis: self.start_jog(a, -1))
+            left_btn.bind(on_release=lambda x, a=axis: self.stop_jog(a))
             motor_layout.add_widget(left_btn)
             
-            speed_slider = Slider(min=0, max=1000, value=500, size_hint_x=0.4)
+            speed_slider = Factory.Slider(min=0, max=1000, value=self.motor_speeds[axis], size_hint_x=0.4)
+            speed_slider.bind(value=lambda slider, value, a=axis: self.motor_speeds.__setitem__(a, int(value)))
             motor_layout.add_widget(speed_slider)
             
-            right_btn = Button(text='→', size_hint_x=0.2)
-            right_btn.bind(on_press=lambda x, a=axis: self.move_motor(a, 1))
+            right_btn = Factory.Button(text='→', size_hint_x=0.2)
+            right_btn.bind(on_press=lambda x, a=axis: self.start_jog(a, 1))
+            right_btn.bind(on_release=lambda x, a=axis: self.stop_jog(a))
             motor_layout.add_widget(right_btn)
             
             layout.add_widget(motor_layout)
@@ -116,20 +195,64 @@ class TriAxisApp(App):
         return layout
     
     def create_patterns_tab(self):
-        layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
+        layout = Factory.BoxLayout(orientation='vertical', padding=20, spacing=10)
         
-        layout.add_widget(Label(text='Pattern Library', font_size='20sp', size_hint_y=0.2))
+        layout.add_widget(Factory.Label(text='Pattern Library', font_size='20sp', size_hint_y=0.2))
         
         patterns = ['Circle Pattern', 'Square Pattern', 'Spiral Pattern']
         for pattern in patterns:
-            btn = Button(text=pattern, size_hint_y=0.2)
+            btn = Factory.Button(text=pattern, size_hint_y=0.2)
             btn.bind(on_press=lambda x, p=pattern: self.execute_pattern(p))
             layout.add_widget(btn)
         
         return layout
     
+    def create_draw_tab(self):
+        layout = Factory.BoxLayout(orientation='vertical', padding=20, spacing=10)
+        
+        layout.add_widget(Factory.Label(text='3D Signature Replicator', font_size='20sp', size_hint_y=0.1))
+        
+        self.draw_canvas = kivy_draw.DrawCanvas(size_hint_y=0.75)
+        layout.add_widget(self.draw_canvas)
+        
+        buttons = Factory.BoxLayout(orientation='horizontal', size_hint_y=0.15, spacing=10)
+        clear_btn = Factory.Button(text='Clear')
+        clear_btn.bind(on_press=lambda x: self.draw_canvas.clear())
+        buttons.add_widget(clear_btn)
+        preview_btn = Factory.Button(text='Preview Job...')
+        preview_btn.bind(on_press=self.choose_job)
+        buttons.add_widget(preview_btn)
+        layout.add_widget(buttons)
+        
+        return layout
+    
+    def choose_job(self, instance):
+        chooser = Factory.FileChooserListView(filters=['*.gcode', '*.nc', '*.ngc', '*.tap', '*.svg'])
+        popup = Factory.Popup(title='Preview Job', content=chooser, size_hint=(0.9, 0.9))
+        
+        def on_submit(chooser, selection, touch):
+            popup.dismiss()
+            if selection:
+                threading.Thread(target=self.build_job_preview, args=(selection[0],), daemon=True).start()
+        
+        chooser.bind(on_submit=on_submit)
+        popup.open()
+    
+    def build_job_preview(self, path):
+        # Parsing a large job takes a moment, so it stays off the UI thread
+        size = (self.draw_canvas.width, self.draw_canvas.height)
+        try:
+            lines = canvas_view.preview_lines(job_import.load(path, order=True), *size)
+        except (job_import.JobError, OSError, ValueError) as e:
+            message = str(e)
+            Clock.schedule_once(lambda dt: Factory.Popup(title='Preview Failed',
+                                                         content=Factory.Label(text=message),
+                                                         size_hint=(0.8, 0.4)).open())
+            return
+        Clock.schedule_once(lambda dt: self.draw_canvas.show_preview(lines))
+    
     def create_about_tab(self):
-        layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
+        layout = Factory.BoxLayout(orientation='vertical', padding=20, spacing=10)
         
         about_text = """TriAxis Pro
 Professional 3-Axis Stepper Motor Controller
@@ -146,42 +269,163 @@ Features:
 
 Version 1.0 | © 2024 APEX PRECISION MECHATRONIX"""
         
-        layout.add_widget(Label(text=about_text, font_size='14sp'))
+        layout.add_widget(Factory.Label(text=about_text, font_size='14sp'))
         
         return layout
     
     def connect_bluetooth(self, instance):
-        self.is_connected = True
-        self.status_label.text = '✅ Connected via Bluetooth'
-        popup = Popup(title='Connection Successful', 
-                     content=Label(text='Connected to TriAxis_Motor_Hub'),
-                     size_hint=(0.8, 0.4))
-        popup.open()
+        # The first controller the last scan found
+        devices = self.devices.get(discovery.BLUETOOTH)
+        if not devices:
+            self.status_label.text = 'No Bluetooth device found; pair the controller and scan again'
+            return
+        self.connect_device(discovery.BLUETOOTH, devices[0])
     
     def connect_wifi(self, instance):
+        # Without a scan result, the controller's own access point
+        devices = self.devices.get(discovery.WIFI) or [SOFT_AP]
+        self.connect_device(discovery.WIFI, devices[0])
+    
+    def connect_device(self, kind, device):
+        self.status_label.text = f"Connecting to {device.get('name', 'TriAxis')}..."
+        threading.Thread(target=self.open_link, args=(kind, device), daemon=True).start()
+    
+    def open_link(self, kind, device):
+        # Off the UI thread: the connect and the greeting can take seconds
+        if kind == discovery.WIFI:
+            link = transport.TcpTransport(device['ip'], device.get('port') or transport.CONTROLLER_PORT)
+        elif device['address'].startswith('/'):
+            link = transport.SerialTransport(device['address'])
+        else:
+            link = transport.BluetoothTransport(device['address'])
+        try:
+            link.open()
+            reply = link.request({"action": "connect", "acks": True,
+                                  "codecs": [codec.BINARY_CODEC, codec.JSON_CODEC]}, timeout=3.0)
+        except (transport.TransportError, OSError) as e:
+            link.close()
+            message = str(e)
+            Clock.schedule_once(lambda dt: self.on_connect_failed(message))
+            return
+        if codec.BINARY_CODEC in reply.get("codecs", []):
+            link.codec = codec.BINARY_CODEC
+        # The ack window paces streamed paths to what the device can take
+        if "window" in reply:
+            link.enable_acks(reply["window"], reply.get("buffer"))
+        Clock.schedule_once(lambda dt: self.on_connected(kind, device, link))
+    
+    def on_connected(self, kind, device, link):
+        self.disconnect()
+        link.on_lost = lambda lost: Clock.schedule_once(lambda dt: self.on_link_lost(kind, lost))
+        self.links = {kind: link}
         self.is_connected = True
-        self.status_label.text = '✅ Connected via WiFi'
-        popup = Popup(title='Connection Successful', 
-                     content=Label(text='Connected to TriAxis_Controller'),
-                     size_hint=(0.8, 0.4))
+        self.status_label.text = f'✅ Connected via {kind}'
+        self.invalidate_tabs('Manual')
+        popup = Factory.Popup(title='Connection Successful', 
+                             content=Factory.Label(text=f"Connected to {device.get('name', 'TriAxis')}"),
+                             size_hint=(0.8, 0.4))
         popup.open()
     
-    def move_motor(self, axis, direction):
+    def on_connect_failed(self, message):
+        self.status_label.text = '❌ Connection failed'
+        popup = Factory.Popup(title='Connection Failed', 
+                             content=Factory.Label(text=message),
+                             size_hint=(0.8, 0.4))
+        popup.open()
+    
+    def on_link_lost(self, kind, link):
+        if self.links.get(kind) is not link:
+            return
+        del self.links[kind]
+        self.is_connected = bool(self.links)
+        self.status_label.text = f'⚠️ {kind} connection lost'
+        self.invalidate_tabs('Manual')
+    
+    def disconnect(self):
+        links, self.links = self.links, {}
+        for link in links.values():
+            link.on_lost = None
+            link.close()
+        self.joggers = {}
+        self.is_connected = False
+    
+    def jog_controllers(self):
+        # One per open link, made again when a link is replaced
+        for name, link in self.links.items():
+            if name not in self.joggers or self.joggers[name].link is not link:
+                self.joggers[name] = jog.JogController(link)
+        return [self.joggers[name] for name in self.links]
+    
+    def start_jog(self, axis, direction):
         if self.is_connected:
-            self.motor_positions[axis] += direction * 10
-            print(f"Moving {axis} axis: {direction * 10} steps")
+            speed = direction * self.motor_speeds[axis]
+            for jogger in self.jog_controllers():
+                jogger.press({axis: speed})
+    
+    def stop_jog(self, axis):
+        for jogger in self.joggers.values():
+            jogger.release([axis])
+    
+    @property
+    def pattern_cache(self):
+        # Made on first use; planned patterns are kept on disk between runs
+        if self._pattern_cache is None:
+            self._pattern_cache = pattern_cache.PatternCache()
+        return self._pattern_cache
     
     def execute_pattern(self, pattern):
-        if self.is_connected:
-            popup = Popup(title='Pattern Execution', 
-                         content=Label(text=f'Executing {pattern}...'),
-                         size_hint=(0.8, 0.4))
-            popup.open()
+        if not self.links:
+            return
+        threading.Thread(target=self.stream_pattern, args=(pattern.split()[0], dict(self.links)),
+                         daemon=True).start()
+        popup = Factory.Popup(title='Pattern Execution', 
+                             content=Factory.Label(text=f'Executing {pattern}...'),
+                             size_hint=(0.8, 0.4))
+        popup.open()
+    
+    def stream_pattern(self, pattern, links):
+        # Planned once (or read from the cache), then streamed to every link
+        # at once; the ack window paces each, and an emergency stop drops
+        # whatever is still to go
+        commands = list(planner.planned_commands([self.pattern_cache.pattern(pattern)]))
+        
+        def send(name, link):
+            try:
+                link.send_many(commands, link.epoch)
+            except (transport.TransportError, OSError) as e:
+                message = f'{name}: {e}'
+                Clock.schedule_once(lambda dt: Factory.Popup(title='Pattern Failed',
+                                                             content=Factory.Label(text=message),
+                                                             size_hint=(0.8, 0.4)).open())
+        
+        for name, link in links.items():
+            threading.Thread(target=send, args=(name, link), daemon=True).start()
+    
+    @property
+    def estop(self):
+        # Made on the first press; estop brings in the transport and NumPy
+        if self._estop is None:
+            self._estop = estop.EmergencyStop()
+        return self._estop
     
     def emergency_stop(self, instance):
-        popup = Popup(title='Emergency Stop', 
-                     content=Label(text='All motors stopped!'),
-                     size_hint=(0.8, 0.4))
+        # Goes out on every open link at once; the popup waits for the
+        # devices to confirm
+        if not self.links:
+            # Nothing to send it on; say so rather than seem to have stopped
+            popup = Factory.Popup(title='Emergency Stop', 
+                                 content=Factory.Label(text='STOP NOT SENT: no open link to the device.\n'
+                                                            'Use the hardware stop.'),
+                                 size_hint=(0.8, 0.4))
+            popup.open()
+            return
+        self.estop.trigger(self.links, on_result=lambda result: Clock.schedule_once(
+            lambda dt: self.show_stop_result(result)))
+    
+    def show_stop_result(self, result):
+        popup = Factory.Popup(title='Emergency Stop', 
+                             content=Factory.Label(text=estop.stop_summary(result)),
+                             size_hint=(0.8, 0.4))
         popup.open()
 
 if __name__ == '__main__':
@@ -0,0 +1,290 @@
+# TriAxis Pro Metrics
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Where a command's time goes, per connection type. Each stage of the
+# command path (UI handler, dispatcher queue, encode, write, ack, motion
+# complete, plus connect and scan) feeds a log-linear histogram in the
+# style of HdrHistogram: fixed memory, about 1% error at any magnitude.
+# Writes also count commands and bytes for throughput. The transport and
+# dispatcher only hold a LinkMetrics when the app has one, and every call
+# site checks `enabled` first, so switched off it costs an attribute read.
+
+import csv
+import json
+import threading
+import time
+
+import numpy as np
+
+STAGES = ('ui', 'queue', 'encode', 'write', 'ack', 'motion', 'connect', 'scan')
+PERCENTILES = (50, 90, 99, 99.9)
+SUB_BITS = 7                    # 128 buckets per power of two
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+MAX_MICROSECONDS = 1 << 36      # about 19 hours; longer values are clamped
+BUCKETS = (36 - SUB_BITS + 2) * HALF_COUNT
+
+
+def bucket_index(microseconds):
+    # Exact below SUB_COUNT, then HALF_COUNT buckets per doubling
+    if microseconds < SUB_COUNT:
+        return microseconds
+    shift = microseconds.bit_length() - SUB_BITS
+    return shift * HALF_COUNT + (microseconds >> shift)
+
+
+def bucket_values():
+    # Lowest value each bucket holds, and its width
+    index = np.arange(BUCKETS)
+    shift = np.maximum(index // HALF_COUNT - 1, 0)
+    low = np.where(index < SUB_COUNT, index, (index - shift * HALF_COUNT) << shift)
+    return low, np.left_shift(1, shift)
+
+
+BUCKET_LOW, BUCKET_WIDTH = bucket_values()
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        microseconds = min(max(int(seconds * 1e6), 0), MAX_MICROSECONDS - 1)
+        index = bucket_index(microseconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    def percentiles(self, percentiles=PERCENTILES):
+        # Seconds; each value is the middle of the bucket it falls in
+        with self._lock:
+            counts = np.array(self.counts, dtype=np.int64)
+            count = self.count
+        if not count:
+            return {p: None for p in percentiles}
+        cumulative = np.cumsum(counts)
+        result = {}
+        for p in percentiles:
+            index = int(np.searchsorted(cumulative, max(1, int(np.ceil(count * p / 100)))))
+            result[p] = (BUCKET_LOW[index] + (BUCKET_WIDTH[index] - 1) / 2) / 1e6
+        return result
+
+    def summary(self):
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        result = {"count": count, "mean": total / count if count else None, "min": low, "max": high}
+        result.update({f"p{p:g}": value for p, value in self.percentiles().items()})
+        return result
+
+
+class LinkMetrics:
+    # Histograms and counters for one connection type
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # In place: transports keep hold of this object
+        with self._lock:
+            self.stages = {stage: LatencyHistogram() for stage in STAGES}
+            self.commands = 0
+            self.bytes = 0
+            self.writes = 0
+            self.started = time.monotonic()
+            self.last_write = None      # perf_counter at the newest write; cleared when motion ends
+            self._previous_positions = None
+            self._queue_capacity = 0
+
+    @property
+    def enabled(self):
+        return self.metrics.enabled
+
+    def record(self, stage, seconds):
+        self.stages[stage].record(seconds)
+
+    def since(self, stage, started):
+        self.stages[stage].record(time.perf_counter() - started)
+
+    def wrote(self, started, count, size):
+        now = time.perf_counter()
+        self.stages['write'].record(now - started)
+        with self._lock:
+            self.commands += count
+            self.bytes += size
+            self.writes += 1
+            self.last_write = now
+
+    def status(self, status):
+        # Motion is complete once positions stop changing with the device's
+        # segment queue empty; measured from the last write before that
+        now = time.perf_counter()
+        positions = status.get("positions")
+        queue_free = status.get("queueFree", 0)
+        with self._lock:
+            self._queue_capacity = max(self._queue_capacity, queue_free)
+            settled = positions == self._previous_positions and queue_free >= self._queue_capacity
+            self._previous_positions = positions
+            last_write = self.last_write
+            if settled and last_write is not None:
+                self.last_write = None
+        if settled and last_write is not None:
+            self.stages['motion'].record(now - last_write)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            throughput = {"commands": self.commands, "bytes": self.bytes, "writes": self.writes,
+                          "seconds": elapsed, "commands_per_s": self.commands / elapsed,
+                          "bytes_per_s": self.bytes / elapsed}
+        return {"stages": {stage: h.summary() for stage, h in self.stages.items()},
+                "throughput": throughput}
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.links = {}
+        self._lock = threading.Lock()
+
+    def link(self, name):
+        with self._lock:
+            if name not in self.links:
+                self.links[name] = LinkMetrics(self, name)
+            return self.links[name]
+
+    def reset(self):
+        with self._lock:
+            links = list(self.links.values())
+        for link in links:
+            link.reset()
+
+    def snapshot(self):
+        with self._lock:
+            links = dict(self.links)
+        return {"time": time.time(), "enabled": self.enabled,
+                "links": {name: link.snapshot() for name, link in links.items()}}
+
+    def rows(self):
+        # One flat row per connection and stage, times in milliseconds
+        rows = []
+        for name, link in self.snapshot()["links"].items():
+            for stage, summary in link["stages"].items():
+                row = {"connection": name, "stage": stage, "count": summary["count"]}
+                for key in ("mean", "min", "p50", "p90", "p99", "p99.9", "max"):
+                    value = summary[key]
+                    row[f"{key}_ms"] = None if value is None else round(value * 1000, 3)
+                row["commands_per_s"] = round(link["throughput"]["commands_per_s"], 1)
+                row["bytes_per_s"] = round(link["throughput"]["bytes_per_s"], 1)
+                rows.append(row)
+        return rows
+
+    def export(self, path):
+        # .csv gets the flat rows, anything else the full JSON snapshot
+        if path.lower().endswith('.csv'):
+            rows = self.rows()
+            with open(path, 'w', newline='') as f:
+                if rows:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def overlay_text(self, stages=('ui', 'queue', 'ack', 'motion')):
+        # Live p50/p99 lines for the About tab
+        lines = []
+        for name, link in self.snapshot()["links"].items():
+            lines.append(f"{name}: {link['throughput']['commands_per_s']:.1f} cmd/s")
+            for stage in stages:
+                summary = link["stages"][stage]
+                if summary["count"]:
+                    lines.append(f"  {stage:7} p50 {summary['p50'] * 1000:8.2f} ms"
+                                 f"  p99 {summary['p99'] * 1000:8.2f} ms  (n={summary['count']})")
+        return "\n".join(lines) if lines else "No commands measured yet"
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    import simulator
+    from connection import ConnectionManager
+    from dispatcher import CommandDispatcher
+
+    # Accuracy against exact percentiles of a heavy-tailed sample
+    rng = np.random.default_rng(3)
+    samples = rng.lognormal(np.log(0.004), 1.0, 200000)
+    histogram = LatencyHistogram()
+    for value in samples:
+        histogram.record(value)
+    for p, value in histogram.percentiles().items():
+        exact = np.percentile(samples, p)
+        print(f"p{p:<5g} exact {exact * 1000:9.3f} ms  histogram {value * 1000:9.3f} ms"
+              f"  error {abs(value - exact) / exact * 100:.2f}%")
+
+    # Cost of a jog going through the whole path, metrics off and on
+    print()
+    for enabled in (False, True):
+        metrics = Metrics(enabled)
+        controller = simulator.SimulatedController(simulator.BLUETOOTH_SPP)
+        controller.execute({"action": "enable", "state": True})
+        server = simulator.SimulatorServer(controller, time_scale=20.0)
+        host, port = server.start_tcp()
+        manager = ConnectionManager()
+        manager.metrics = metrics
+        manager.connect_wifi(host, port)
+        dispatcher = CommandDispatcher(manager).start()
+        dispatcher.on_status = lambda status: None
+        start = time.perf_counter()
+        for i in range(500):
+            # A full queue turns jogs away; wait for room like a held key would
+            while not dispatcher.submit({"action": "move", "axis": "XYZ"[i % 3], "steps": 10,
+                                         "speed": 1000}):
+                time.sleep(0.0005)
+            if i % 50 == 49:
+                dispatcher.request_status()
+        while dispatcher.pending():
+            time.sleep(0.001)
+        manager.transport.window.wait_empty(10.0)
+        elapsed = time.perf_counter() - start
+        for _ in range(3):
+            dispatcher.request_status()
+            time.sleep(0.1)
+        print(f"metrics {'on ' if enabled else 'off'}: 500 jogs submitted and acked in {elapsed * 1000:.0f} ms")
+        dispatcher.stop()
+        manager.disconnect()
+        server.stop()
+
+    per_call = {}
+    for enabled in (None, False, True):
+        link = Metrics(bool(enabled)).link("bench")
+        start = time.perf_counter()
+        for _ in range(100000):
+            if enabled is not None and link.enabled:
+                link.record('encode', 0.0001)
+        per_call[enabled] = (time.perf_counter() - start) / 100000 * 1e9
+    print(f"per call site over an empty loop: {per_call[False] - per_call[None]:.0f} ns off, "
+          f"{per_call[True] - per_call[None]:.0f} ns on")
+
+    print()
+    print(metrics.overlay_text(STAGES))
+    directory = tempfile.mkdtemp()
+    for name in ("metrics.json", "metrics.csv"):
+        path = metrics.export(os.path.join(directory, name))
+        print(f"exported {os.path.getsize(path):,} bytes to {name}")
@@ -0,0 +1,201 @@
+# TriAxis Pro Pattern Cache
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Compiled trajectories (planned path rows, signature points) keyed by what
+# they were built from: the job's parameters, the planner settings and the
+# axis calibration. Recent results stay in a size-bounded in-memory LRU;
+# every result is also saved as a .npy file and memory-mapped when it is
+# needed again, so a rerun streams straight away even after a restart.
+# Changing the calibration drops everything built with the old one.
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import job_import
+import planner
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".triaxis", "patterns")
+MAX_MEMORY = 64 * 1024 * 1024   # bytes of arrays held in the LRU
+MAX_ENTRIES = 256
+
+DEFAULT_CALIBRATION = {
+    "steps_per_mm": job_import.STEPS_PER_MM,
+    "max_speed": planner.MAX_SPEED,
+    "acceleration": planner.ACCELERATION,
+}
+
+
+def digest(data):
+    # Stable short hash of JSON-able parameters or raw bytes
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        data = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:20]
+
+
+class PatternCache:
+    def __init__(self, calibration=None, directory=CACHE_DIR, max_memory=MAX_MEMORY,
+                 max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.memory = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.calibration = None
+        self.set_calibration(calibration or DEFAULT_CALIBRATION)
+
+    def set_calibration(self, calibration):
+        # Results built under another calibration are dropped from memory
+        # and disk; they can never be hit again
+        calibration = dict(calibration)
+        with self._lock:
+            if calibration == self.calibration:
+                return False
+            self.calibration = calibration
+            self.calibration_key = digest(calibration)
+            self.entries.clear()
+            self.memory = 0
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name != self.calibration_key:
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return True
+
+    def get(self, kind, params, build):
+        # The compiled array for (kind, params), calling build() only when
+        # neither memory nor disk has it
+        key = f"{kind}-{digest(params)}"
+        with self._lock:
+            rows = self.entries.get(key)
+            if rows is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return rows
+
+        rows = self._load(key)
+        if rows is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, rows)
+            return rows
+
+        rows = np.ascontiguousarray(build())
+        with self._lock:
+            self.misses += 1
+        self._save(key, rows)
+        self._remember(key, rows)
+        return rows
+
+    def pattern(self, pattern, radius=100, speed=500, tolerance=planner.CHORD_TOLERANCE,
+                window=planner.LOOKAHEAD, deviation=planner.JUNCTION_DEVIATION):
+        # Look-ahead planned [x, y, z, feed, entry, exit] rows for a pattern
+        acceleration = self.calibration["acceleration"]
+        speed = min(speed, self.calibration["max_speed"])
+        params = {"pattern": pattern.lower(), "radius": radius, "speed": speed,
+                  "tolerance": tolerance, "window": window, "deviation": deviation}
+
+        def build():
+            trajectory = planner.plan_pattern(pattern, radius, speed, tolerance, acceleration,
+                                              profile='lookahead')
+            blocks = planner.lookahead_blocks([trajectory.segments()], window, acceleration, deviation)
+            return np.vstack(list(blocks))
+
+        return self.get("pattern", params, build)
+
+    def invalidate(self):
+        with self._lock:
+            self.entries.clear()
+            self.memory = 0
+        if self.directory:
+            shutil.rmtree(os.path.join(self.directory, self.calibration_key), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "entries": len(self.entries),
+                    "memory": self.memory}
+
+    def _remember(self, key, rows):
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = rows
+            self.memory += self._size(rows)
+            while self.entries and (self.memory > self.max_memory or len(self.entries) > self.max_entries):
+                _, old = self.entries.popitem(last=False)
+                self.memory -= self._size(old)
+                self.evictions += 1
+
+    @staticmethod
+    def _size(rows):
+        # Memory-mapped arrays cost page cache, not heap
+        return 0 if isinstance(rows, np.memmap) else rows.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, self.calibration_key, key + ".npy")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            return np.load(self._path(key), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key, rows):
+        if not self.directory:
+            return
+        path = self._path(key)
+        # Write then rename, so a reader never maps a half-written file
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, 'wb') as f:
+                np.save(f, rows)
+            os.replace(partial, path)
+        except OSError:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    directory = tempfile.mkdtemp()
+    try:
+        for pattern, radius in (('circle', 2000), ('spiral', 20000)):
+            timings = []
+            cache = PatternCache(directory=directory)
+            for label in ("cold", "memory"):
+                start = time.perf_counter()
+                rows = cache.pattern(pattern, radius, 2000, tolerance=0.01)
+                timings.append((label, time.perf_counter() - start))
+            # A fresh cache is what the app sees after a restart
+            cache = PatternCache(directory=directory)
+            start = time.perf_counter()
+            cache.pattern(pattern, radius, 2000, tolerance=0.01)
+            timings.append(("disk", time.perf_counter() - start))
+            print(f"{pattern} r={radius} ({len(rows):,} rows): " +
+                  ", ".join(f"{label} {seconds * 1000:.3f} ms" for label, seconds in timings))
+        print(cache.stats())
+        cache.set_calibration(dict(DEFAULT_CALIBRATION, acceleration=800.0))
+        print("after calibration change:", os.listdir(directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
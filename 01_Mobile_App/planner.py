@@ -0,0 +1,310 @@
+# TriAxis Pro Trajectory Planner
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Builds the Pattern Library shapes on the host as dense polylines and gives
+# every segment a feed from a trapezoidal or S-curve velocity profile along
+# the whole path, so the controller runs them at constant feed instead of
+# stopping at each vertex. All geometry is vectorized with NumPy.
+#
+# For streamed paths the look-ahead planner gives every segment an entry
+# and exit speed instead: corners are limited GRBL-style by junction
+# deviation, and backward/forward passes over a sliding window keep every
+# speed change within the acceleration limit.
+
+import math
+
+import numpy as np
+
+import signature
+
+# Firmware defaults (stepperX.setMaxSpeed / setAcceleration)
+MAX_SPEED = 2000.0      # steps/s
+ACCELERATION = 1000.0   # steps/s^2
+CHORD_TOLERANCE = 0.5   # steps
+MIN_FEED = 20.0         # steps/s, keeps the first and last segment moving
+
+# Segments per "path" command so one line, seq included, fits the
+# firmware's 1024-byte DynamicJsonDocument: [x,y,z,feed] rows, and planned
+# [x,y,z,feed,entry,exit] rows
+PATH_CHUNK = signature.rows_per_chunk(4)
+PLANNED_CHUNK = signature.rows_per_chunk(6)
+
+JUNCTION_DEVIATION = 1.0  # steps; how far a corner may be rounded off
+LOOKAHEAD = 128           # segments re-planned with each new block
+
+
+class Trajectory:
+    def __init__(self, points, feeds):
+        # points: (N, 3) int32 absolute targets in steps
+        # feeds:  (N,) float32 path speed for the segment ending at each point
+        self.points = points
+        self.feeds = feeds
+
+    def __len__(self):
+        return len(self.points)
+
+    def lengths(self):
+        return np.linalg.norm(np.diff(self.points, axis=0).astype(np.float64), axis=1)
+
+    def duration(self):
+        lengths = self.lengths()
+        return float(np.sum(lengths / self.feeds[1:]))
+
+    def segments(self):
+        # Ready-to-stream rows of [x, y, z, feed]
+        rows = np.empty((len(self.points), 4), dtype=np.int32)
+        rows[:, :3] = self.points
+        rows[:, 3] = np.rint(self.feeds)
+        return rows
+
+    def path_commands(self, chunk=PATH_CHUNK):
+        # Rows stay NumPy blocks; the codec turns them into JSON or binary
+        rows = self.segments()
+        for start in range(0, len(rows), chunk):
+            yield {"action": "path", "seg": rows[start:start + chunk]}
+
+    def planned_commands(self, window=LOOKAHEAD, chunk=PLANNED_CHUNK):
+        # Feeds are taken as nominal speeds; look-ahead adds the ramps
+        return planned_commands(lookahead_blocks([self.segments()], window), chunk)
+
+
+def segments_for_arc(radius, sweep, tolerance=CHORD_TOLERANCE):
+    # Fewest chords whose sagitta stays within tolerance
+    if radius <= tolerance:
+        return max(4, int(math.ceil(sweep / (math.pi / 2))))
+    step = 2.0 * math.acos(1.0 - tolerance / radius)
+    return max(4, int(math.ceil(sweep / step)))
+
+
+def circle_points(radius, tolerance=CHORD_TOLERANCE, segments=None):
+    n = segments or segments_for_arc(radius, 2 * math.pi, tolerance)
+    angles = np.linspace(0.0, 2 * math.pi, n + 1)
+    xy = np.empty((n + 1, 2))
+    xy[:, 0] = radius * np.cos(angles)
+    xy[:, 1] = radius * np.sin(angles)
+    return xy
+
+
+def square_points(size):
+    return np.array([[0, 0], [size, 0], [size, size], [0, size], [0, 0]], dtype=np.float64)
+
+
+def spiral_points(max_radius, turns=2.0, tolerance=CHORD_TOLERANCE, segments=None):
+    # Archimedean spiral from the centre out to max_radius
+    sweep = 2 * math.pi * turns
+    n = segments or segments_for_arc(max_radius, sweep, tolerance)
+    angles = np.linspace(0.0, sweep, n + 1)
+    radii = max_radius * angles / sweep
+    xy = np.empty((n + 1, 2))
+    xy[:, 0] = radii * np.cos(angles)
+    xy[:, 1] = radii * np.sin(angles)
+    return xy
+
+
+def _ramp_table(peak, acceleration, profile, samples=256):
+    # Distance and speed along an acceleration ramp from rest to `peak`
+    if profile == 'scurve':
+        # Sinusoidal ramp whose peak acceleration equals `acceleration`
+        duration = math.pi * peak / (2 * acceleration)
+        t = np.linspace(0.0, duration, samples)
+        phase = math.pi * t / duration
+        speed = peak / 2 * (1 - np.cos(phase))
+        distance = peak / 2 * (t - duration / math.pi * np.sin(phase))
+    else:
+        duration = peak / acceleration
+        t = np.linspace(0.0, duration, samples)
+        speed = acceleration * t
+        distance = acceleration * t * t / 2
+    return distance, speed
+
+
+def velocity_profile(points, max_speed=MAX_SPEED, acceleration=ACCELERATION, profile='trapezoid'):
+    # Path speed at every point for one continuous move from rest to rest
+    lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    distance = np.concatenate(([0.0], np.cumsum(lengths)))
+    total = distance[-1]
+    if total == 0:
+        return np.zeros(len(points))
+
+    peak = max_speed
+    ramp_distance, _ = _ramp_table(peak, acceleration, profile, 2)
+    if 2 * ramp_distance[-1] > total:
+        # Triangle profile: never reaches max_speed
+        if profile == 'scurve':
+            peak = math.sqrt(2 * acceleration * total / math.pi)
+        else:
+            peak = math.sqrt(acceleration * total)
+
+    ramp_s, ramp_v = _ramp_table(peak, acceleration, profile)
+    speed_up = np.interp(distance, ramp_s, ramp_v, right=peak)
+    slow_down = np.interp(total - distance, ramp_s, ramp_v, right=peak)
+    return np.minimum(speed_up, slow_down)
+
+
+def plan(xy, z=None, max_speed=MAX_SPEED, acceleration=ACCELERATION, profile='trapezoid'):
+    points = np.zeros((len(xy), 3))
+    points[:, :2] = xy
+    if z is not None:
+        points[:, 2] = z
+
+    # Round to whole steps and drop points that collapse onto their neighbour
+    steps = np.rint(points).astype(np.int32)
+    keep = np.ones(len(steps), dtype=bool)
+    keep[1:] = np.any(steps[1:] != steps[:-1], axis=1)
+    steps = steps[keep]
+
+    if profile == 'lookahead':
+        # Nominal speed only; lookahead_blocks() plans the ramps and corners
+        return Trajectory(steps, np.full(len(steps), max_speed, dtype=np.float32))
+    speed = velocity_profile(steps.astype(np.float64), max_speed, acceleration, profile)
+    # Each segment runs at the mean of its end speeds
+    feeds = np.empty(len(steps), dtype=np.float32)
+    feeds[0] = MIN_FEED
+    feeds[1:] = np.maximum((speed[1:] + speed[:-1]) / 2, MIN_FEED)
+    return Trajectory(steps, feeds)
+
+
+def plan_pattern(pattern, radius=100, speed=500, tolerance=CHORD_TOLERANCE,
+                 acceleration=ACCELERATION, profile='trapezoid', segments=None):
+    # Same parameters as the firmware "pattern" action
+    pattern = pattern.lower()
+    if pattern == 'circle':
+        xy = circle_points(radius, tolerance, segments)
+    elif pattern == 'square':
+        xy = square_points(radius)
+    elif pattern == 'spiral':
+        xy = spiral_points(radius, tolerance=tolerance, segments=segments)
+    else:
+        raise ValueError(f"Unknown pattern: {pattern}")
+    return plan(xy, max_speed=min(speed, MAX_SPEED), acceleration=acceleration, profile=profile)
+
+
+# --- Look-ahead -------------------------------------------------------------------
+
+
+def junction_limits(points, feeds, acceleration=ACCELERATION, deviation=JUNCTION_DEVIATION):
+    # Segment lengths and the squared speed allowed through each interior
+    # junction. points: (N+1, 3) float, feeds: (N,) nominal segment speeds
+    delta = np.diff(points, axis=0)
+    lengths = np.linalg.norm(delta, axis=1)
+    units = np.divide(delta, lengths[:, None], out=np.zeros_like(delta), where=lengths[:, None] > 0)
+    # Cosine of the angle the path turns through; -1 is straight on
+    cos_theta = -np.sum(units[:-1] * units[1:], axis=1)
+    sin_half = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+    with np.errstate(divide='ignore'):
+        corner = np.where(sin_half < 0.999999,
+                          acceleration * deviation * sin_half / (1.0 - sin_half), np.inf)
+    cruise = np.minimum(feeds[:-1], feeds[1:])
+    return lengths, np.minimum(corner, cruise * cruise)
+
+
+def lookahead_speeds(points, feeds, entry_speed=0.0, exit_speed=0.0, acceleration=ACCELERATION,
+                     deviation=JUNCTION_DEVIATION):
+    # Entry and exit speed of every segment. Both passes work on squared
+    # speeds, where "v^2 grows by at most 2*a*L over a segment" turns the
+    # usual per-segment loops into running minimums.
+    feeds = np.asarray(feeds, dtype=np.float64)
+    lengths, corners = junction_limits(points, feeds, acceleration, deviation)
+    limit = np.empty(len(lengths) + 1)
+    limit[0] = entry_speed * entry_speed
+    limit[1:-1] = corners
+    limit[-1] = exit_speed * exit_speed
+    gain = 2.0 * acceleration * lengths
+
+    # Backward: slow enough to brake for everything that follows
+    after = np.zeros(len(limit))
+    after[:-1] = np.cumsum(gain[::-1])[::-1]
+    backward = np.minimum.accumulate((limit - after)[::-1])[::-1] + after
+    # Forward: no faster than we can accelerate to
+    before = np.zeros(len(limit))
+    before[1:] = np.cumsum(gain)
+    forward = np.minimum.accumulate(backward - before) + before
+
+    speeds = np.sqrt(np.maximum(forward, 0.0))
+    return speeds[:-1], speeds[1:]
+
+
+def lookahead_blocks(blocks, window=LOOKAHEAD, acceleration=ACCELERATION,
+                     deviation=JUNCTION_DEVIATION, start=None):
+    # Plans a stream of [x, y, z, feed] blocks into [x, y, z, feed, entry,
+    # exit] blocks. The last `window` rows are held back and re-planned with
+    # the next block, and only the final row is planned to stop: rows sent
+    # earlier keep the exits planned into the held-back ones. The
+    # controller caps those at what its queue lets it stop within, so a
+    # stalled stream ramps down at the end of what arrived.
+    pending = np.zeros((0, 4))
+    previous = None if start is None else np.asarray(start, dtype=np.float64)
+    entry = 0.0
+
+    def emit(count, exit_speed):
+        nonlocal pending, previous, entry
+        points = np.vstack([previous[None, :], pending[:, :3]])
+        entries, exits = lookahead_speeds(points, pending[:, 3], entry, exit_speed,
+                                          acceleration, deviation)
+        rows = np.empty((count, 6), dtype=np.int32)
+        rows[:, :4] = pending[:count]
+        rows[:, 4] = np.floor(entries[:count])
+        rows[:, 5] = np.floor(exits[:count])
+        previous = pending[count - 1, :3]
+        entry = exits[count - 1]
+        pending = pending[count:]
+        return rows
+
+    for block in blocks:
+        if not len(block):
+            continue
+        if previous is None:
+            previous = np.asarray(block[0, :3], dtype=np.float64)
+        pending = np.vstack([pending, block[:, :4]])
+        if len(pending) > window:
+            yield emit(len(pending) - window, 0.0)
+    if len(pending):
+        yield emit(len(pending), 0.0)
+
+
+def planned_commands(blocks, chunk=PLANNED_CHUNK):
+    for block in blocks:
+        for start in range(0, len(block), chunk):
+            yield {"action": "path", "seg": block[start:start + chunk]}
+
+
+def segment_speed(travelled, length, entry, cruise, exit, acceleration=ACCELERATION):
+    # Speed profile a controller follows inside one planned segment
+    speed = min(cruise, math.sqrt(entry * entry + 2 * acceleration * travelled),
+                math.sqrt(exit * exit + 2 * acceleration * max(length - travelled, 0.0)))
+    return max(speed, MIN_FEED)
+
+
+def planned_duration(rows, start, acceleration=ACCELERATION):
+    # Seconds to run planned rows from `start`, ramps included
+    points = np.vstack([np.asarray(start, dtype=np.float64)[None, :], rows[:, :3]])
+    lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    cruise = np.maximum(rows[:, 3].astype(np.float64), MIN_FEED)
+    entry = np.clip(rows[:, 4], MIN_FEED, cruise)
+    exit = np.clip(rows[:, 5], MIN_FEED, cruise)
+    up = (cruise * cruise - entry * entry) / (2 * acceleration)
+    down = (cruise * cruise - exit * exit) / (2 * acceleration)
+    flat = lengths - up - down
+    # Segments too short to reach cruise peak where the two ramps meet
+    peak = np.sqrt(np.maximum((2 * acceleration * lengths + entry * entry + exit * exit) / 2, 0.0))
+    peak = np.where(flat >= 0, cruise, np.maximum(peak, np.maximum(entry, exit)))
+    ramps = (peak - entry) / acceleration + (peak - exit) / acceleration
+    return float(np.sum(ramps + np.maximum(flat, 0.0) / cruise))
+
+
+if __name__ == "__main__":
+    from simulator import SimulatedController, IDEAL
+
+    def run(commands):
+        sim = SimulatedController(IDEAL)
+        sim.execute({"action": "enable", "state": True})
+        return sim.run_commands(commands)
+
+    print("pattern  radius  per-vertex stops  look-ahead  speed-up")
+    for pattern in ('circle', 'square', 'spiral'):
+        for radius in (500, 2000):
+            firmware = run([{"action": "pattern", "type": pattern, "radius": radius, "speed": MAX_SPEED}])
+            planned = run(plan_pattern(pattern, radius, MAX_SPEED, profile='lookahead').planned_commands())
+            print(f"{pattern:7s}  {radius:6d}  {firmware:15.2f}s  {planned:9.2f}s  {firmware / planned:7.1f}x")
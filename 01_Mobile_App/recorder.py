@@ -0,0 +1,664 @@
+# TriAxis Pro Session Recorder
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Records every command sent to the device and every status sample into an
+# append-only log of fixed-size 24 byte records. Each record stores its
+# time as a delta from the one before, in 100 us ticks. Callers only append
+# to an in-memory list; a writer thread turns it into records and writes
+# them out a few times a second.
+#
+# A saved log is memory-mapped, so reopening a long session costs nothing
+# up front. It can be replayed to a device or the simulator in real time
+# or faster; jogs are pinned to the positions sampled while they ran, so
+# a compressed replay still ends where the session did, and planned path
+# rows are re-chunked. The recorded motion can also be run as
+# a planned path, which is how recordings appear in the Pattern Library.
+
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import codec
+import planner
+import signature
+
+RECORDINGS_DIR = os.path.join(os.path.expanduser("~"), ".triaxis", "recordings")
+EXTENSION = ".txrec"
+MAGIC = b"TXREC"
+VERSION = 1
+TICK = 1e-4              # seconds per timestamp unit
+FLUSH_INTERVAL = 0.25    # seconds between writes
+MERGE_WINDOW = 0.05      # wall seconds; jogs closer together than this merge on a compressed replay
+
+RECORD_DTYPE = np.dtype([('dt', '<u4'), ('kind', 'u1'), ('flags', 'u1'), ('speed', '<u2'),
+                         ('x', '<i4'), ('y', '<i4'), ('z', '<i4'), ('entry', '<u2'), ('exit', '<u2')])
+HEADER = struct.Struct('<5sBHd8x')   # magic, version, record size, start (unix time)
+assert HEADER.size == RECORD_DTYPE.itemsize == 24
+
+# Record kinds. `flags` holds the axis, style, pattern or state byte.
+MOVE = 1        # x = steps on axis `flags`
+SEGMENT = 2     # x, y, z target, speed = feed; flags 1 when entry/exit are planned
+POINT = 3       # signature point, flags = style
+STOP = 4
+STATUS = 5      # x, y, z positions, speed = free queue slots, flags bit 0 enabled, bit 1 e-stop
+PATTERN = 6     # flags = pattern, x = radius
+HOME = 7
+ENABLE = 8      # flags = state
+SET_SPEED = 9   # flags = axis
+JOG = 10        # x, y, z velocity in steps/s; keepalives aren't recorded
+
+PATTERNS = ('circle', 'square', 'spiral')
+
+
+class RecorderError(Exception):
+    pass
+
+
+def command_records(command):
+    # The records for one outgoing command; None for commands not recorded
+    # (status requests, connect)
+    action = command.get("action")
+    if action == "move":
+        if command.get("axis") not in codec.AXES:
+            return None
+        records = np.zeros(1, dtype=RECORD_DTYPE)
+        records['kind'] = MOVE
+        records['flags'] = codec.AXES.index(command["axis"])
+        records['x'] = command.get("steps", 0)
+        records['speed'] = min(int(command.get("speed", 0)), 0xFFFF)
+        return records
+    if action == "path":
+        rows = np.asarray(command["seg"], dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] < 3:
+            return None
+        records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+        records['kind'] = SEGMENT
+        for column, name in enumerate(('x', 'y', 'z')):
+            records[name] = np.rint(rows[:, column])
+        if rows.shape[1] > 3:
+            records['speed'] = np.clip(np.rint(rows[:, 3]), 0, 0xFFFF)
+        if rows.shape[1] >= 6:
+            records['flags'] = 1
+            records['entry'] = np.clip(np.rint(rows[:, 4]), 0, 0xFFFF)
+            records['exit'] = np.clip(np.rint(rows[:, 5]), 0, 0xFFFF)
+        return records
+    if action == "jog":
+        records = np.zeros(1, dtype=RECORD_DTYPE)
+        records['kind'] = JOG
+        for name, velocity in zip(('x', 'y', 'z'), command.get("v", ())):
+            records[name] = int(velocity)
+        return records
+    if action == "signature":
+        points = command["points"]
+        if isinstance(points, np.ndarray):
+            xyz = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        else:
+            xyz = np.array([[p["x"], p["y"], p.get("z", 0)] for p in points], dtype=np.float64).reshape(-1, 3)
+        records = np.zeros(len(xyz), dtype=RECORD_DTYPE)
+        records['kind'] = POINT
+        style = command.get("style", "normal")
+        records['flags'] = codec.STYLES.index(style) if style in codec.STYLES else 0
+        for column, name in enumerate(('x', 'y', 'z')):
+            records[name] = np.rint(xyz[:, column])
+        return records
+    records = np.zeros(1, dtype=RECORD_DTYPE)
+    if action == "stop":
+        records['kind'] = STOP
+    elif action == "home":
+        records['kind'] = HOME
+    elif action == "enable":
+        records['kind'] = ENABLE
+        records['flags'] = bool(command.get("state"))
+    elif action == "setSpeed" and command.get("axis") in codec.AXES:
+        records['kind'] = SET_SPEED
+        records['flags'] = codec.AXES.index(command["axis"])
+        records['speed'] = min(int(command.get("speed", 0)), 0xFFFF)
+    elif action == "pattern" and command.get("type") in PATTERNS:
+        records['kind'] = PATTERN
+        records['flags'] = PATTERNS.index(command["type"])
+        records['x'] = command.get("radius", 100)
+        records['speed'] = min(int(command.get("speed", 500)), 0xFFFF)
+    else:
+        return None
+    return records
+
+
+def status_record(status):
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record['kind'] = STATUS
+    positions = status.get("positions", {})
+    record['x'] = positions.get('X', 0)
+    record['y'] = positions.get('Y', 0)
+    record['z'] = positions.get('Z', 0)
+    record['speed'] = min(int(status.get("queueFree", 0)), 0xFFFF)
+    record['flags'] = bool(status.get("motorsEnabled")) | bool(status.get("emergencyStop")) << 1
+    return record
+
+
+class SessionRecorder:
+    def __init__(self):
+        self.path = None
+        self.records = 0
+        self.skipped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._file = None
+        self._start = None
+        self._last_tick = 0
+
+    @property
+    def recording(self):
+        return self._file is not None
+
+    def start(self, path=None):
+        # A new log; the default name is the current date and time
+        if self.recording:
+            self.stop()
+        if path is None:
+            os.makedirs(RECORDINGS_DIR, exist_ok=True)
+            path = os.path.join(RECORDINGS_DIR, time.strftime("session-%Y%m%d-%H%M%S") + EXTENSION)
+        self._file = open(path, 'wb')
+        start = time.time()
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, start))
+        self.path = path
+        self.records = 0
+        self.skipped = 0
+        self._start = time.perf_counter()
+        self._last_tick = 0
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+        return path
+
+    def stop(self):
+        # Writes out what is still pending and closes the log
+        if not self.recording:
+            return self.path
+        thread = self._thread
+        self._thread = None
+        self._wake.set()
+        thread.join()
+        self._flush()
+        self._file.close()
+        self._file = None
+        return self.path
+
+    def commands(self, commands):
+        # Called with each batch as it is written to the device; only the
+        # raw commands and a timestamp are kept here
+        if self.recording:
+            now = time.perf_counter()
+            with self._lock:
+                self._pending.append((now, commands, None))
+
+    def status(self, status):
+        if self.recording:
+            now = time.perf_counter()
+            with self._lock:
+                self._pending.append((now, None, status))
+
+    def _writer_loop(self):
+        while self._thread is threading.current_thread():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        parts = []
+        for now, commands, status in pending:
+            tick = int((now - self._start) / TICK)
+            first = True
+            for records in ([status_record(status)] if status is not None else
+                            (command_records(c) for c in commands)):
+                if records is None:
+                    self.skipped += 1
+                    continue
+                if first:
+                    records['dt'][0] = min(max(tick - self._last_tick, 0), 0xFFFFFFFF)
+                    self._last_tick = max(tick, self._last_tick)
+                    first = False
+                parts.append(records)
+        if parts:
+            block = np.concatenate(parts)
+            self._file.write(block.tobytes())
+            self._file.flush()
+            self.records += len(block)
+
+
+class SessionLog:
+    # A saved recording, memory-mapped
+    def __init__(self, path):
+        self.path = path
+        size = os.path.getsize(path)
+        if size < HEADER.size:
+            raise RecorderError("Not a session recording")
+        with open(path, 'rb') as f:
+            magic, version, record_size, self.start_time = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise RecorderError("Not a session recording")
+        # A trailing partial record means the app died mid-write; skip it
+        count = (size - HEADER.size) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def times(self):
+        # Seconds since the recording started, per record
+        return np.cumsum(self.records['dt'], dtype=np.int64) * TICK
+
+    @property
+    def duration(self):
+        return float(self.times()[-1]) if len(self) else 0.0
+
+    def statuses(self):
+        mask = self.records['kind'] == STATUS
+        records = self.records[mask]
+        return self.times()[mask], np.column_stack([records['x'], records['y'], records['z']])
+
+    def commands(self, merge_window=MERGE_WINDOW):
+        # (time, command) pairs to send again. Same-axis, same-speed jogs
+        # less than `merge_window` recorded seconds apart become one move
+        # (None merges all of them, 0 none); path rows and signature points
+        # are grouped back into full-size commands.
+        #
+        # Where overlapping jogs end depends on when they landed, so each
+        # run of jogs is pinned to the status samples taken during it.
+        # Compressed (`merge_window` not 0), the jogs up to the last sample
+        # are replaced by path rows through the sampled positions; in real
+        # time they are sent as recorded, and a run that ends on a sample
+        # gets a path row to it. Path rows are absolute targets, so either
+        # way the machine is where the session had it. Held jogs can't be
+        # sent again without their keepalives, so they only ever replay as
+        # path rows, one per sample at its time in real time.
+        times = self.times()
+        recorded = np.asarray(self.records)
+        kinds = recorded['kind']
+        mask = (kinds != STATUS) & (kinds != JOG)
+        pins = []
+        for span in _jog_spans(kinds):
+            samples = span[kinds[span] == STATUS]
+            if not len(samples):
+                continue
+            held = span[kinds[span] == JOG]
+            velocities = np.column_stack([recorded['x'][held], recorded['y'][held], recorded['z'][held]])
+            feed = max(recorded['speed'][span[kinds[span] == MOVE]].max(initial=0),
+                       np.abs(velocities).max(initial=0)) or planner.MAX_SPEED
+            feed = int(min(feed, planner.MAX_SPEED))
+            if merge_window != 0:
+                mask[span[0]:samples[-1] + 1] = False
+                pins.append((span[0], samples, feed))
+            elif len(held):
+                pins.extend((sample, samples[i:i + 1], feed) for i, sample in enumerate(samples))
+            elif samples[-1] == span[-1]:
+                pins.append((samples[-1], samples[-1:], feed))
+        indices = np.flatnonzero(mask)
+        pinned = 0
+
+        def pins_before(index):
+            # The path rows for the pins ahead of record `index`
+            nonlocal pinned
+            while pinned < len(pins) and pins[pinned][0] < index:
+                at, samples, feed = pins[pinned]
+                pinned += 1
+                rows = np.column_stack([recorded['x'][samples], recorded['y'][samples], recorded['z'][samples],
+                                        np.full(len(samples), feed)]).astype(np.float64)
+                keep = np.concatenate([[True], np.any(np.diff(rows[:, :3], axis=0) != 0, axis=1)])
+                rows = rows[keep]
+                for offset in range(0, len(rows), planner.PATH_CHUNK):
+                    yield float(times[at]), {"action": "path", "seg": rows[offset:offset + planner.PATH_CHUNK]}
+
+        records = recorded[mask]
+        times_kept = times[mask]
+        if not len(records):
+            yield from pins_before(len(mask))
+            return
+        kinds = records['kind']
+        # Runs of one kind; a change of axis/style/planned flag or speed
+        # also ends a run of moves
+        key_change = (kinds[1:] != kinds[:-1]) | (records['flags'][1:] != records['flags'][:-1])
+        move_change = (kinds[1:] == MOVE) & (records['speed'][1:] != records['speed'][:-1])
+        if merge_window is not None:
+            move_change |= (kinds[1:] == MOVE) & (np.diff(times_kept) >= merge_window)
+        # Nor does a move run carry on across a pin
+        pin_change = np.searchsorted(indices, [at for at, _, _ in pins], side='right')
+        starts = np.unique(np.concatenate([[0], np.flatnonzero(key_change | move_change) + 1,
+                                           pin_change[pin_change < len(records)]]))
+        ends = np.append(starts[1:], len(records))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield from pins_before(indices[start])
+            kind = int(kinds[start])
+            run = records[start:end]
+            if kind == MOVE:
+                steps = int(run['x'].astype(np.int64).sum())
+                if steps:
+                    yield float(times_kept[start]), {"action": "move", "axis": codec.AXES[run['flags'][0]],
+                                                     "steps": steps, "speed": int(run['speed'][0])}
+            elif kind == SEGMENT:
+                planned = run['flags'][0] == 1
+                columns = [run['x'], run['y'], run['z'], run['speed']]
+                if planned:
+                    columns += [run['entry'], run['exit']]
+                rows = np.column_stack(columns).astype(np.float64)
+                chunk = planner.PLANNED_CHUNK if planned else planner.PATH_CHUNK
+                for offset in range(0, len(rows), chunk):
+                    yield float(times_kept[start + offset]), {"action": "path", "seg": rows[offset:offset + chunk]}
+            elif kind == POINT:
+                points = np.column_stack([run['x'], run['y'], run['z']]).astype(np.int32)
+                style = codec.STYLES[run['flags'][0]] if run['flags'][0] < len(codec.STYLES) else "normal"
+                for command in signature.signature_commands(points, style):
+                    yield float(times_kept[start]), command
+            else:
+                for index in range(start, end):
+                    yield float(times_kept[index]), self._single(records[index])
+        yield from pins_before(len(mask))
+
+    @staticmethod
+    def _single(record):
+        kind = int(record['kind'])
+        if kind == STOP:
+            return {"action": "stop"}
+        if kind == HOME:
+            return {"action": "home"}
+        if kind == ENABLE:
+            return {"action": "enable", "state": bool(record['flags'])}
+        if kind == SET_SPEED:
+            return {"action": "setSpeed", "axis": codec.AXES[record['flags']], "speed": int(record['speed'])}
+        return {"action": "pattern", "type": PATTERNS[record['flags']], "radius": int(record['x']),
+                "speed": int(record['speed'])}
+
+    def waypoints(self, start=None):
+        # Where the session took the machine, as an (N, 3) array. Path rows
+        # and signature points are targets. A jog moves from wherever its
+        # axis is when it lands and is cut short by the next jog on that
+        # axis, so after jogs the status samples (telemetry polls while the
+        # machine moves) say where it really went; without samples the
+        # steps are added up. Held jogs only have the samples. The first sample, `start` or the origin
+        # anchors the start.
+        kinds = self.records['kind']
+        if start is None:
+            statuses = self.records[kinds == STATUS]
+            start = (statuses[0]['x'], statuses[0]['y'], statuses[0]['z']) if len(statuses) else (0, 0, 0)
+        # Homing ends at the origin; its record's x, y, z are zero
+        records = np.asarray(self.records[np.isin(kinds, (MOVE, JOG, SEGMENT, POINT, HOME, STATUS))])
+        position = np.array(start, dtype=np.int64)
+        points = [position.copy()]
+        pending = []
+        jogging = False
+
+        def add_steps(position):
+            for run in pending:
+                deltas = np.zeros((len(run), 3), dtype=np.int64)
+                deltas[np.arange(len(run)), run['flags']] = run['x']
+                xyz = position + np.cumsum(deltas, axis=0)
+                points.append(xyz)
+                position = xyz[-1].copy()
+            pending.clear()
+            return position
+
+        category = np.select([records['kind'] == MOVE, records['kind'] == STATUS, records['kind'] == JOG],
+                             [0, 1, 3], 2)
+        for start_index, end_index, kind in _runs(category):
+            run = records[start_index:end_index]
+            if kind == 0:
+                jogging = True
+                pending.append(run)
+                continue
+            if kind == 3:
+                jogging = True
+                continue
+            xyz = np.column_stack([run['x'], run['y'], run['z']]).astype(np.int64)
+            if kind == 1:
+                if not jogging:
+                    continue
+                pending.clear()
+            else:
+                position = add_steps(position)
+                jogging = False
+            points.append(xyz)
+            position = xyz[-1].copy()
+        add_steps(position)
+        path = np.vstack(points)
+        # Drop repeats so the planner gets no zero-length segments
+        keep = np.concatenate([[True], np.any(np.diff(path, axis=0) != 0, axis=1)])
+        return path[keep]
+
+    def planned_rows(self, max_speed=planner.MAX_SPEED, acceleration=planner.ACCELERATION):
+        # The recorded motion as one look-ahead planned path
+        points = self.waypoints()
+        if len(points) < 2:
+            return np.zeros((0, 6))
+        trajectory = planner.plan(points[:, :2].astype(np.float64), points[:, 2].astype(np.float64),
+                                  max_speed, acceleration, profile='lookahead')
+        blocks = planner.lookahead_blocks([trajectory.segments()], acceleration=acceleration)
+        return np.vstack(list(blocks))
+
+
+def _jog_spans(kinds):
+    # Index arrays of each stretch of moves, held jogs and status samples
+    # from its first move or jog on
+    spans = []
+    for start, end, jog in _runs(np.isin(kinds, (MOVE, JOG, STATUS))):
+        moves = np.flatnonzero(kinds[start:end] != STATUS)
+        if jog and len(moves):
+            spans.append(np.arange(start + moves[0], end))
+    return spans
+
+
+def _runs(values):
+    # (start, end, value) for each run of equal values
+    if not len(values):
+        return []
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    ends = np.append(starts[1:], len(values))
+    return [(int(s), int(e), int(values[s])) for s, e in zip(starts, ends)]
+
+
+def list_recordings(directory=RECORDINGS_DIR):
+    # Newest first
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(EXTENSION)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+class Replayer:
+    # Re-sends a log through a CommandDispatcher on its own thread. `speed`
+    # 1.0 keeps the recorded timing, 10.0 runs ten times faster, None sends
+    # as fast as the dispatcher takes them. Jogs that overlapped cut each
+    # other short on the device, so their timing can't be compressed; a
+    # faster replay drives through the positions sampled during them
+    # instead (see SessionLog.commands), and jogs after the last sample
+    # that would land within MERGE_WINDOW of each other are sent as one
+    # move.
+    def __init__(self, log, dispatcher, speed=1.0, merge_window=MERGE_WINDOW):
+        self.log = log
+        self.dispatcher = dispatcher
+        self.speed = speed
+        if speed is None:
+            self.merge_window = None
+        else:
+            self.merge_window = merge_window * speed if speed > 1.0 else 0.0
+        self.sent = 0
+        self.done = threading.Event()
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+
+    def _submit(self, command):
+        if command["action"] == "signature":
+            # Run before the next line is read, as execute_signature sends them
+            return self.dispatcher.submit_stream([command], batch=1, ack_timeout=30.0)
+        return self.dispatcher.submit(command)
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            for at, command in self.log.commands(self.merge_window):
+                if not self._running:
+                    return
+                if self.speed:
+                    delay = started + at / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                # A full queue turns commands away; wait for room
+                while not self._submit(command):
+                    if not self._running:
+                        return
+                    time.sleep(0.001)
+                self.sent += 1
+        finally:
+            self._running = False
+            self.done.set()
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    import simulator
+    from connection import ConnectionManager
+    from dispatcher import CommandDispatcher
+    from jog import JogController
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Recording cost on the caller's thread, and size on disk
+        path = os.path.join(directory, "jogs" + EXTENSION)
+        session = SessionRecorder()
+        session.start(path)
+        count = 200000
+        jog = [{"action": "move", "axis": "X", "steps": 1, "speed": 1000}]
+        status = {"positions": {"X": 1, "Y": 2, "Z": 3}, "queueFree": 64, "motorsEnabled": True}
+        start = time.perf_counter()
+        for i in range(count):
+            if i % 10:
+                session.commands(jog)
+            else:
+                session.status(status)
+        per_call = (time.perf_counter() - start) / count
+        session.stop()
+        size = os.path.getsize(path)
+        print(f"record: {per_call * 1e6:.2f} us per call on the caller's thread, "
+              f"{count:,} records in {size / 1024:.0f} KiB ({(size - HEADER.size) / count:.0f} bytes each)")
+        start = time.perf_counter()
+        log = SessionLog(path)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        merged = list(log.commands(None))
+        print(f"reload: open {opened * 1000:.2f} ms, {len(log):,} records -> {len(merged)} merged command(s)"
+              f" in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        # A jog session recorded live against the simulator, then replayed
+        # to a fresh one in real time and compressed
+        def connect():
+            controller = simulator.SimulatedController(simulator.WIFI)
+            controller.execute({"action": "enable", "state": True})
+            server = simulator.SimulatorServer(controller, time_scale=1.0)
+            host, port = server.start_tcp()
+            manager = ConnectionManager()
+            manager.connect_wifi(host, port)
+            return controller, server, manager, CommandDispatcher(manager).start()
+
+        def settle(controller, manager, dispatcher):
+            while dispatcher.pending():
+                time.sleep(0.005)
+            manager.transport.window.wait_empty(10.0)
+            while controller.moving():
+                time.sleep(0.005)
+            return controller.status()["positions"]
+
+        def replay(log, recorded, speeds):
+            for speed in speeds:
+                controller, server, manager, dispatcher = connect()
+                start = time.perf_counter()
+                replayer = Replayer(log, dispatcher, speed).start()
+                replayer.done.wait()
+                positions = settle(controller, manager, dispatcher)
+                elapsed = time.perf_counter() - start
+                off = max(abs(positions[a] - recorded[a]) for a in codec.AXES)
+                label = "as fast as possible" if speed is None else f"{speed:g}x"
+                print(f"  replay {label:19}: {replayer.sent:3d} commands in {elapsed:5.2f} s, "
+                      f"ended at {positions}, {off} steps from the recording")
+                dispatcher.stop()
+                manager.disconnect()
+                server.stop()
+
+        def record(name, job):
+            controller, server, manager, dispatcher = connect()
+            session = SessionRecorder()
+            manager.recorder = session
+            session.start(os.path.join(directory, name + EXTENSION))
+            job(dispatcher)
+            recorded = settle(controller, manager, dispatcher)
+            dispatcher.request_status()
+            settle(controller, manager, dispatcher)
+            time.sleep(0.1)   # for the reply to reach the recorder
+            session.stop()
+            dispatcher.stop()
+            manager.disconnect()
+            server.stop()
+            log = SessionLog(session.path)
+            print(f"{name}: {len(log)} records over {log.duration:.2f} s, ended at {recorded}")
+            return log, recorded
+
+        # Jogs that overlap start from wherever the axis has got to, so the
+        # end position depends on timing as well as on the steps sent
+        def jogs(dispatcher):
+            rng = np.random.default_rng(5)
+            for i in range(60):
+                dispatcher.submit({"action": "move", "axis": "XY"[rng.integers(2)],
+                                   "steps": int(rng.integers(-40, 80)), "speed": 2000})
+                if i % 10 == 9:
+                    dispatcher.request_status()
+                time.sleep(0.02)
+
+        # Held jogs with telemetry polls, as the Manual tab sends them
+        def held(dispatcher):
+            manager = dispatcher.connection_manager
+            jogger = JogController(manager.transport, recorder=manager.recorder)
+            for velocities, hold in (({'X': 900}, 0.4), ({'X': 900, 'Y': -600}, 0.3), ({'Y': 1500}, 0.25)):
+                jogger.press(velocities)
+                for _ in range(int(hold / 0.05)):
+                    dispatcher.request_status()
+                    time.sleep(0.05)
+                jogger.release()
+                time.sleep(0.1)
+
+        def circle(dispatcher):
+            dispatcher.submit_stream(planner.planned_commands([planner.plan_pattern(
+                'circle', 300, 2000, profile='lookahead').segments()]))
+            time.sleep(0.5)
+
+        replay(*record("circle", circle), (4.0, None))
+        log, recorded = record("jogs", jogs)
+        replay(log, recorded, (1.0, 4.0, None))
+        held_log, held_end = record("held jogs", held)
+        replay(held_log, held_end, (1.0, 4.0, None))
+
+        # As a Pattern Library entry: the positions the machine went through
+        for name, pattern_log in (("jogs", log), ("held jogs", held_log)):
+            rows = pattern_log.planned_rows()
+            print(f"{name} as a pattern: {len(pattern_log.waypoints())} waypoints -> {len(rows)} planned rows, "
+                  f"ends at {rows[-1, :3].astype(int).tolist()}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,138 @@
+# TriAxis Pro Signature Capture
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Records strokes from the Draw tab canvas into compact arrays, simplifies
+# them with Ramer-Douglas-Peucker and splits the result into "signature"
+# commands small enough for the firmware's 1024-byte DynamicJsonDocument.
+
+import hashlib
+from array import array
+
+import numpy as np
+
+import codec
+
+STEPS_PER_PIXEL = 5
+SIMPLIFY_TOLERANCE = 2.0  # steps
+PEN_LIFT = 50             # steps on Z between strokes
+
+# ArduinoJson 6 on the ESP32: 16 bytes per slot, keys are copied
+JSON_DOC_SIZE = 1024
+ROOT_COST = 3 * 16 + 48   # action/points/style members and their strings
+POINT_COST = 16 + 3 * 16 + 6  # array slot, x/y/z members and key strings
+PATH_ROOT_COST = 2 * 16 + 16  # action/seg members and their strings
+SEQ_COST = 16 + 4         # "seq", added on links with an ack window
+
+
+def points_per_chunk(doc_size=JSON_DOC_SIZE, sequenced=True):
+    return (doc_size - ROOT_COST - SEQ_COST * sequenced) // POINT_COST
+
+
+def rows_per_chunk(columns, doc_size=JSON_DOC_SIZE, sequenced=True):
+    # "path" rows: an array slot and one slot per value
+    return (doc_size - PATH_ROOT_COST - SEQ_COST * sequenced) // (16 + 16 * columns)
+
+
+class StrokeRecorder:
+    def __init__(self, steps_per_pixel=STEPS_PER_PIXEL):
+        self.steps_per_pixel = steps_per_pixel
+        # All strokes share two flat coordinate arrays; starts[i] is where
+        # stroke i begins
+        self.xs = array('f')
+        self.ys = array('f')
+        self.starts = array('I')
+
+    def begin(self, x, y):
+        self.starts.append(len(self.xs))
+        self.add(x, y)
+
+    def add(self, x, y):
+        if not self.starts:
+            self.starts.append(0)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def clear(self):
+        del self.xs[:]
+        del self.ys[:]
+        del self.starts[:]
+
+    def __len__(self):
+        return len(self.xs)
+
+    def fingerprint(self):
+        # Identifies the drawing, e.g. to reuse its compiled points
+        raw = self.xs.tobytes() + self.ys.tobytes() + self.starts.tobytes()
+        return hashlib.sha1(raw).hexdigest()
+
+    def strokes(self):
+        # (N, 2) arrays in steps; canvas Y grows downwards, machine Y upwards
+        xs = np.frombuffer(self.xs, dtype=np.float32)
+        ys = np.frombuffer(self.ys, dtype=np.float32)
+        bounds = list(self.starts) + [len(xs)]
+        result = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end > start:
+                stroke = np.empty((end - start, 2))
+                stroke[:, 0] = xs[start:end] * self.steps_per_pixel
+                stroke[:, 1] = -ys[start:end] * self.steps_per_pixel
+                result.append(stroke)
+        return result
+
+
+def simplify(points, tolerance=SIMPLIFY_TOLERANCE):
+    # Ramer-Douglas-Peucker with an explicit stack; distances per span are
+    # computed in one vectorized pass
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start = points[first]
+        chord = points[last] - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(chord[0], chord[1])
+        if length == 0:
+            distance = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distance = np.abs(chord[0] * inner[:, 1] - chord[1] * inner[:, 0]) / length
+        index = int(np.argmax(distance))
+        if distance[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def signature_points(strokes, tolerance=SIMPLIFY_TOLERANCE, pen_lift=PEN_LIFT):
+    # One (N, 3) integer array for the whole signature, with pen-up moves
+    # between strokes
+    parts = []
+    for stroke in strokes:
+        simplified = np.rint(simplify(stroke, tolerance)).astype(np.int32)
+        path = np.zeros((len(simplified) + 2, 3), dtype=np.int32)
+        path[1:-1, :2] = simplified
+        path[0, :2] = simplified[0]
+        path[-1, :2] = simplified[-1]
+        path[0, 2] = path[-1, 2] = pen_lift
+        parts.append(path)
+    if not parts:
+        return np.zeros((0, 3), dtype=np.int32)
+    return np.concatenate(parts)
+
+
+def signature_commands(points, style="normal", chunk=None):
+    chunk = chunk or points_per_chunk()
+    for start in range(0, len(points), chunk):
+        yield {"action": "signature", "style": style, "points": points[start:start + chunk]}
+
+
+def command_size(command):
+    return len(codec.encode_json(command))
@@ -0,0 +1,871 @@
+# TriAxis Pro Controller Simulator
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Software stand-in for TriAxis_Controller.ino. It runs the same command set
+# (JSON lines and bin1 frames) against three AccelStepper-style axes with
+# acceleration, limit switches and the emergency-stop latch, and it models
+# the link: latency, bandwidth and per-command parse cost.
+#
+# Everything runs on a virtual clock. SimulatorServer exposes the device
+# over TCP or a pty and runs the clock `time_scale` times faster than the
+# wall clock; run_commands() drives it with no sockets at all, as fast as
+# Python allows.
+#
+# Uploaded step tables play like the firmware's step timer: each axis sits
+# on the last step whose tick has passed.
+#
+# Jogs run like the firmware's too: a far target at the jog speed, ramped
+# down by a zero velocity or by JOG_TIMEOUT without a jog frame.
+
+import base64
+import collections
+import json
+import math
+import os
+import select
+import socket
+import threading
+import time
+
+import numpy as np
+
+import codec
+import planner
+import step_tables
+
+MAX_SPEED = 2000.0
+ACCELERATION = 1000.0
+SEGMENT_QUEUE_SIZE = 64
+RX_WINDOW = 64        # unacknowledged commands a host may have in flight
+RX_PACKET = 128       # bytes per radio packet on links with a bounded buffer
+ESTOP_SCAN = max(len(codec.ESTOP_JSON), len(codec.ESTOP_FRAME)) - 1
+MOTION_STEP = 0.001   # virtual seconds per motion update
+HOMING_SPEED = 500.0
+JOG_TIMEOUT = 0.18    # seconds without a jog frame before a jog ramps down
+JOG_REACH = 1e9       # steps; a jog's target, never reached
+
+
+class LinkProfile:
+    def __init__(self, name, latency, bandwidth, parse_cost, rx_buffer=None):
+        self.name = name
+        self.latency = latency          # one-way, seconds
+        self.bandwidth = bandwidth      # bytes per second
+        self.parse_cost = parse_cost    # seconds of controller time per command
+        self.rx_buffer = rx_buffer      # unread bytes kept; the rest is lost
+
+
+# SPP at 115200 baud vs. the ESP32 soft AP
+BLUETOOTH = LinkProfile("Bluetooth", 0.030, 11520, 0.0015)
+WIFI = LinkProfile("WiFi", 0.004, 1000000, 0.0003)
+IDEAL = LinkProfile("Ideal", 0.0, float('inf'), 0.0)
+# The ESP32 BluetoothSerial RX queue drops what doesn't fit while the
+# firmware is busy and not reading
+BLUETOOTH_SPP = LinkProfile("Bluetooth SPP", 0.030, 11520, 0.0015, rx_buffer=512)
+
+
+class SimAxis:
+    def __init__(self, name):
+        self.name = name
+        self.position = 0.0
+        self.speed = 0.0
+        self.target = 0.0
+        self.max_speed = MAX_SPEED
+        self.acceleration = ACCELERATION
+        self.constant_speed = None
+        self.stopping = False
+        self.limit_min = None           # switch closes at or below this position
+
+    def current_position(self):
+        return int(round(self.position))
+
+    def limit_pressed(self):
+        return self.limit_min is not None and self.position <= self.limit_min
+
+    def is_running(self):
+        return self.speed != 0.0 or abs(self.target - self.position) >= 0.5
+
+    def move(self, steps):
+        self.move_to(self.position + steps)
+
+    def move_to(self, target):
+        self.constant_speed = None
+        self.stopping = False
+        self.target = float(target)
+
+    def run_at(self, target, speed):
+        # runSpeedToPosition: no ramps, straight to target at `speed`
+        self.target = float(target)
+        self.stopping = False
+        self.constant_speed = abs(speed)
+        self.speed = math.copysign(self.constant_speed, self.target - self.position)
+
+    def stop(self):
+        # AccelStepper::stop(): decelerate from the current speed
+        self.constant_speed = None
+        self.stopping = True
+        stopping = self.speed * self.speed / (2 * self.acceleration)
+        self.target = self.position + math.copysign(stopping, self.speed)
+
+    def halt(self):
+        self.constant_speed = None
+        self.speed = 0.0
+        self.target = self.position
+
+    def set_zero(self):
+        self.position = self.target = self.speed = 0.0
+
+    def update(self, dt):
+        remaining = self.target - self.position
+        if self.constant_speed is not None:
+            delta = math.copysign(self.constant_speed * dt, remaining)
+            if abs(delta) >= abs(remaining):
+                self.position = self.target
+                self.speed = 0.0
+                self.constant_speed = None
+            else:
+                self.position += delta
+            return
+        if remaining == 0 and self.speed == 0:
+            return
+        stopping = self.speed * self.speed / (2 * self.acceleration)
+        heading_away = self.speed * remaining < 0
+        # Half a step of slack absorbs rounding in stop()'s target
+        if heading_away or stopping >= abs(remaining) - 0.5:
+            change = min(abs(self.speed), self.acceleration * dt)
+            self.speed -= math.copysign(change, self.speed)
+        else:
+            self.speed += math.copysign(self.acceleration * dt, remaining)
+            self.speed = max(-self.max_speed, min(self.max_speed, self.speed))
+        self.position += self.speed * dt
+        if abs(self.target - self.position) <= 1 and abs(self.speed) <= self.acceleration * dt * 2:
+            self.position = self.target
+            self.speed = 0.0
+
+
+class SimLink:
+    # One connected host: input waiting to be parsed and replies in flight
+    def __init__(self, profile, write):
+        self.profile = profile
+        self.write = write
+        self.arrivals = collections.deque()   # (time, bytes)
+        self.rx_buffer = bytearray()
+        self.rx_free = 0.0
+        self.replies = collections.deque()    # (time, bytes)
+        self.tx_free = 0.0
+        self.closed = False
+        self.bytes_dropped = 0
+        self.sequenced = False                # host asked for acks
+        self.last_accepted = 0
+
+
+class SimulatedController:
+    def __init__(self, profile=WIFI, codecs=(codec.JSON_CODEC, codec.BINARY_CODEC)):
+        self.profile = profile
+        self.codecs = list(codecs)
+        self.now = 0.0
+        self.axes = {a: SimAxis(a) for a in codec.AXES}
+        self.motors_enabled = False
+        self.emergency_stop = False
+        self.speeds = {a: 1000 for a in codec.AXES}
+        self.segments = collections.deque()
+        self.segment_active = False
+        self.segment = None                   # (targets, deltas, length, entry, feed, exit)
+        self.travelled = 0.0
+        self.path_speed = 0.0                 # path speed the last tick ran at
+        self.queue_limit = None               # see _queue_entry_limit(); None when the queue changed
+        self.program = collections.deque()    # blocking point-to-point moves
+        self.homing = False
+        self.table_data = None                # step table being uploaded
+        self.table_size = 0
+        self.table = None                     # (StepTable, start time) while playing
+        self.table_positions = None
+        self.table_played = None              # figures from the last table played
+        self.table_error = None
+        self.jog_driving = set()              # axes with a nonzero jog velocity
+        self.jog_rest = {}                    # jogged axis -> max speed to go back to
+        self.jog_kept = 0.0                   # time of the last jog frame
+        self.jog_timeouts = 0
+        self.busy_until = 0.0
+        self.links = []
+        self.local_link = None
+        self.commands_processed = 0
+        self.bytes_received = 0
+        self.estops = 0
+        self.lock = threading.RLock()
+
+    # --- links ----------------------------------------------------------------
+
+    def attach(self, write, profile=None):
+        link = SimLink(profile or self.profile, write)
+        with self.lock:
+            self.links.append(link)
+        return link
+
+    def receive(self, link, data):
+        # Bytes leave the host now and arrive after serialisation + latency
+        with self.lock:
+            # A bounded buffer fills packet by packet, so it can be read
+            # while a long write is still arriving
+            step = RX_PACKET if link.profile.rx_buffer is not None else max(len(data), 1)
+            for offset in range(0, len(data), step):
+                piece = bytes(data[offset:offset + step])
+                start = max(self.now, link.rx_free)
+                link.rx_free = start + len(piece) / link.profile.bandwidth
+                link.arrivals.append((link.rx_free + link.profile.latency, piece))
+            self.bytes_received += len(data)
+
+    def reply(self, link, data):
+        start = max(self.now, link.tx_free)
+        link.tx_free = start + len(data) / link.profile.bandwidth
+        link.replies.append((link.tx_free + link.profile.latency, data))
+
+    def flush_replies(self):
+        with self.lock:
+            for link in self.links:
+                while link.replies and link.replies[0][0] <= self.now:
+                    _, data = link.replies.popleft()
+                    if not link.closed:
+                        try:
+                            link.write(data)
+                        except OSError:
+                            link.closed = True
+
+    # --- clock ----------------------------------------------------------------
+
+    def moving(self):
+        if self.emergency_stop:
+            return False
+        if self.homing or self.program:
+            return True
+        if not self.motors_enabled:
+            return False
+        return (self.table is not None or self.segment_active or bool(self.segments)
+                or any(a.is_running() for a in self.axes.values()))
+
+    def blocked(self):
+        # The firmware stops reading while a blocking routine runs or the
+        # segment queue is full
+        return (self.homing or bool(self.program)
+                or len(self.segments) > SEGMENT_QUEUE_SIZE)
+
+    def idle(self):
+        with self.lock:
+            return (not self.moving() and self.busy_until <= self.now
+                    and not any(l.arrivals or l.rx_buffer or l.replies for l in self.links))
+
+    def advance(self, dt):
+        with self.lock:
+            end = self.now + dt
+            while self.now < end:
+                self._process_input()
+                if self.moving():
+                    step = min(MOTION_STEP, end - self.now)
+                else:
+                    step = min(self._next_event(), end) - self.now
+                    if step <= 0:
+                        step = min(MOTION_STEP, end - self.now)
+                self._update_motion(step)
+                self.now += step
+            self._process_input()
+
+    def _next_event(self):
+        times = [self.busy_until] if self.busy_until > self.now else []
+        for link in self.links:
+            if link.arrivals:
+                times.append(link.arrivals[0][0])
+            if link.replies:
+                times.append(link.replies[0][0])
+        return min(times) if times else float('inf')
+
+    def _process_input(self):
+        for link in self.links:
+            while link.arrivals and link.arrivals[0][0] <= self.now:
+                data = self._scan_estop(link, link.arrivals.popleft()[1])
+                # The RX queue only fills while the firmware isn't reading it;
+                # otherwise bytes move straight on into its line buffer
+                capacity = link.profile.rx_buffer
+                if (capacity is not None and self.blocked()
+                        and len(link.rx_buffer) + len(data) > capacity):
+                    keep = max(0, capacity - len(link.rx_buffer))
+                    link.bytes_dropped += len(data) - keep
+                    data = data[:keep]
+                link.rx_buffer += data
+        for link in self.links:
+            while self.busy_until <= self.now and not self.blocked():
+                command = self._next_command(link)
+                if command is None:
+                    break
+                self.busy_until = max(self.busy_until, self.now) + link.profile.parse_cost
+                if self._accept(link, command):
+                    self.commands_processed += 1
+                    self.execute(command, link)
+
+    def _scan_estop(self, link, data):
+        # The firmware looks for the stop bytes as they come in, busy or not,
+        # and throws away everything buffered ahead of them
+        tail = bytes(link.rx_buffer[-ESTOP_SCAN:]) + data
+        found = [(tail.rfind(pattern) + len(pattern), encoding)
+                 for pattern, encoding in ((codec.ESTOP_JSON, codec.JSON_CODEC),
+                                           (codec.ESTOP_FRAME, codec.BINARY_CODEC))
+                 if pattern in tail]
+        if not found:
+            return data
+        end, encoding = max(found)
+        link.rx_buffer.clear()
+        self._emergency_halt(link, encoding)
+        return tail[end:]
+
+    def _emergency_halt(self, link, encoding):
+        # Stop where we are and forget queued work; unlike the hardware
+        # button nothing latches, so the next command runs normally
+        self.table = None
+        self._clear_segments()
+        self.program.clear()
+        self.homing = False
+        self.jog_driving.clear()
+        for axis in self.axes.values():
+            axis.halt()
+        link.last_accepted = 0
+        self.estops += 1
+        self.reply(link, codec.encode_stopped(encoding))
+
+    def _accept(self, link, command):
+        # Go-back-N receiver: only the next sequence number runs; the newest
+        # accepted one is acked either way so the host resends from there
+        seq = command.get("seq", command.get("_seq"))
+        if not link.sequenced or not seq:
+            return True
+        accepted = seq == link.last_accepted % 0xFFFF + 1
+        if accepted:
+            link.last_accepted = seq
+        if "_seq" in command:
+            self.reply(link, codec.encode_ack(link.last_accepted))
+        else:
+            self.reply(link, codec.encode_json({"ack": link.last_accepted}))
+        return accepted
+
+    def _next_command(self, link):
+        buffer = link.rx_buffer
+        while buffer:
+            if buffer[0] == codec.FRAME_SYNC:
+                try:
+                    parts = codec.split_frame(buffer)
+                except codec.CodecError:
+                    del buffer[:1]
+                    continue
+                if parts is None:
+                    # A torn header can claim more than the buffer will ever hold
+                    if link.profile.rx_buffer is not None and len(buffer) >= link.profile.rx_buffer:
+                        del buffer[:1]
+                        continue
+                    return None
+                frame_type, seq, payload, consumed = parts
+                del buffer[:consumed]
+                command = codec.decode_payload(frame_type, payload)
+                command["_seq"] = seq
+                return command
+            end = buffer.find(b'\n')
+            sync = buffer.find(codec.FRAME_SYNC)
+            if sync > 0 and (end < 0 or sync < end):
+                # Tail of a frame torn by dropped bytes; JSON is ASCII and
+                # never holds the sync byte
+                del buffer[:sync]
+                continue
+            if end < 0:
+                return None
+            line = bytes(buffer[:end]).strip()
+            del buffer[:end + 1]
+            if not line:
+                continue
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+        return None
+
+    # --- motion ---------------------------------------------------------------
+
+    def _update_motion(self, dt):
+        if self.emergency_stop:
+            return
+        self._check_jog()
+        if self.homing:
+            self._update_homing(dt)
+            return
+        if self.program:
+            # Blocking routines run the steppers directly, like the firmware
+            self._run_program(dt)
+            return
+        if not self.motors_enabled:
+            return
+        if self.table is not None:
+            self._run_table(dt)
+            return
+        if self.segment_active or self.segments:
+            self._run_segments(dt)
+        else:
+            for axis in self.axes.values():
+                axis.update(dt)
+        self._check_limits()
+
+    def _run_program(self, dt):
+        if not any(a.is_running() for a in self.axes.values()):
+            x, y, z = self.program.popleft()
+            for axis, value in zip(self.axes.values(), (x, y, z)):
+                if value is not None:
+                    axis.move_to(value)
+        for axis in self.axes.values():
+            axis.update(dt)
+
+    def _run_segments(self, dt):
+        axes = list(self.axes.values())
+        if not self.segment_active and self.segments:
+            x, y, z, feed, entry, exit = self.segments.popleft()
+            self.queue_limit = None
+            deltas = [t - a.position for a, t in zip(axes, (x, y, z))]
+            length = math.sqrt(sum(d * d for d in deltas))
+            if length > 0 and feed > 0:
+                self.segment = ((x, y, z), deltas, length, entry, feed, exit)
+                self.travelled = 0.0
+                self.segment_active = True
+        if self.segment_active:
+            # Path speed from the planned profile, split so all axes arrive together
+            targets, deltas, length, entry, feed, exit = self.segment
+            # As the firmware: no faster than the queue behind allows, so a
+            # stalled stream ramps down to stop at the end of what arrived,
+            # and speeding up again only from the speed actually reached
+            exit = min(exit, self._queue_entry_limit())
+            speed = planner.segment_speed(self.travelled, length, entry, feed, exit, ACCELERATION)
+            speed = min(speed, max(self.path_speed + ACCELERATION * dt, planner.MIN_FEED))
+            self.path_speed = speed
+            for axis, target, delta in zip(axes, targets, deltas):
+                axis.run_at(target, abs(delta) / length * speed)
+            self.travelled += speed * dt
+        for axis in axes:
+            axis.update(dt)
+        if self.segment_active and not any(a.is_running() for a in axes):
+            self.segment_active = False
+            self.segment = None
+            if not self.segments:
+                self.path_speed = 0.0
+
+    def _queue_entry_limit(self):
+        # The firmware's replanQueue(): backwards from the end of the queue,
+        # the fastest it can be entered and still stop by its end
+        if self.queue_limit is None:
+            if self.segment is not None:
+                start = self.segment[0]
+            else:
+                start = tuple(a.position for a in self.axes.values())
+            ends = [start] + [row[:3] for row in self.segments]
+            entry2 = 0.0
+            for (x, y, z, feed, entry, exit), before in zip(reversed(self.segments), reversed(ends[:-1])):
+                length = math.dist((x, y, z), before)
+                exit = min(exit, math.sqrt(entry2))
+                entry2 = exit * exit + 2 * ACCELERATION * length
+            self.queue_limit = math.sqrt(entry2)
+        return self.queue_limit
+
+    def _run_table(self, dt):
+        # No ramps to follow: the table says when every step falls
+        table, started = self.table
+        tick = (self.now + dt - started) * table.tick_hz
+        for axis, ticks, positions in zip(self.axes.values(), table.ticks, self.table_positions):
+            was = axis.position
+            axis.position = axis.target = float(positions[np.searchsorted(ticks, tick, side='right')])
+            if axis.limit_pressed() and axis.position < was:
+                # As the firmware: playback ends on a switch it runs into
+                self.table = None
+                self.table_error = f"limit switch on {axis.name}"
+                return
+        if tick >= table.length:
+            self.table = None
+            self.table_played = {"started": started, "seconds": self.now + dt - started,
+                                 "peak_rates": table.peak_rates()}
+
+    def _update_homing(self, dt):
+        homing = False
+        for axis in self.axes.values():
+            if not axis.limit_pressed() and axis.limit_min is not None:
+                axis.position -= HOMING_SPEED * dt
+                homing = True
+        if not homing:
+            for axis in self.axes.values():
+                axis.set_zero()
+            self.homing = False
+
+    def _check_jog(self):
+        # Deadman: a held jog with no frame for JOG_TIMEOUT ramps down
+        if self.jog_driving and self.now - self.jog_kept > JOG_TIMEOUT:
+            self._end_jog()
+            self.jog_timeouts += 1
+        # Back to the set speed once a jogged axis is at rest
+        for name in list(self.jog_rest):
+            axis = self.axes[name]
+            if name not in self.jog_driving and not axis.is_running():
+                axis.max_speed = self.jog_rest.pop(name)
+
+    def _end_jog(self):
+        for name in self.jog_driving:
+            self.axes[name].stop()
+        self.jog_driving.clear()
+
+    def _check_limits(self):
+        for axis in self.axes.values():
+            if axis.limit_pressed() and axis.speed < 0 and not axis.stopping:
+                axis.stop()
+
+    def trigger_emergency_stop(self):
+        # The hardware button: latched until reset()
+        with self.lock:
+            self.emergency_stop = True
+            self._disable_motors()
+
+    def reset(self):
+        with self.lock:
+            self.emergency_stop = False
+
+    def _disable_motors(self):
+        # Drivers lose power, so the axes stop where they are
+        self.motors_enabled = False
+        self.table = None
+        self._clear_segments()
+        self.program.clear()
+        self.homing = False
+        self.jog_driving.clear()
+        for axis in self.axes.values():
+            axis.halt()
+
+    def _motion_locked(self):
+        # Motion commands are ignored while latched or playing a table
+        return self.emergency_stop or self.table is not None
+
+    def _clear_segments(self):
+        self.segments.clear()
+        self.segment_active = False
+        self.segment = None
+        self.path_speed = 0.0
+        self.queue_limit = None
+
+    # --- commands -------------------------------------------------------------
+
+    def execute(self, command, link=None):
+        action = command.get("action")
+        handler = getattr(self, "_handle_" + str(action), None)
+        if handler:
+            handler(command, link)
+
+    def _send(self, link, message):
+        if link is not None:
+            self.reply(link, codec.encode_json(message))
+
+    def _handle_connect(self, command, link):
+        reply = {"status": "connected", "device": "TriAxis_Motor_Hub",
+                 "company": "APEX PRECISION MECHATRONIX PVT. LTD.",
+                 "version": "1.0", "connection": link.profile.name if link else "",
+                 "codecs": self.codecs}
+        if command.get("acks") and link is not None:
+            link.sequenced = True
+            link.last_accepted = 0
+            reply["window"] = RX_WINDOW
+            if link.profile.rx_buffer is not None:
+                reply["buffer"] = link.profile.rx_buffer
+        self._send(link, reply)
+
+    def _handle_move(self, command, link):
+        if self._motion_locked():
+            return
+        axis = self.axes.get(command.get("axis"))
+        if axis:
+            axis.move(int(command.get("steps", 0)))
+
+    def _handle_setSpeed(self, command, link):
+        axis = self.axes.get(command.get("axis"))
+        if axis:
+            if axis.name in self.jog_rest:
+                self.jog_rest[axis.name] = float(command.get("speed", 0))   # once the jog is over
+            else:
+                axis.max_speed = float(command.get("speed", 0))
+            self.speeds[axis.name] = int(command.get("speed", 0))
+
+    def _handle_jog(self, command, link):
+        # v: signed steps/s per axis. A moving axis heads for a far target
+        # at that speed; 0 ramps a jogging axis down.
+        if self._motion_locked() or self.segment_active or self.segments:
+            return
+        for axis, velocity in zip(self.axes.values(), command.get("v", ())):
+            velocity = max(-MAX_SPEED, min(MAX_SPEED, float(velocity)))
+            if velocity:
+                self.jog_rest.setdefault(axis.name, axis.max_speed)
+                axis.max_speed = abs(velocity)
+                axis.move_to(axis.position + math.copysign(JOG_REACH, velocity))
+                self.jog_driving.add(axis.name)
+            elif axis.name in self.jog_driving:
+                axis.stop()
+                self.jog_driving.discard(axis.name)
+        self.jog_kept = self.now
+
+    def _handle_jogKeep(self, command, link):
+        if self.jog_driving:
+            self.jog_kept = self.now
+
+    def _handle_home(self, command, link):
+        if self._motion_locked():
+            return
+        self.homing = True
+
+    def _handle_stop(self, command, link):
+        # A table has no ramp down to follow; it stops on the spot
+        self.table = None
+        self._clear_segments()
+        self.program.clear()
+        self.jog_driving.clear()
+        for axis in self.axes.values():
+            axis.stop()
+
+    def _handle_enable(self, command, link):
+        self.motors_enabled = bool(command.get("state"))
+
+    def _handle_getStatus(self, command, link):
+        if "_seq" in command:
+            if link is not None:
+                self.reply(link, codec.encode_status(self.status(), command["_seq"]))
+            return
+        self._send(link, self.status())
+
+    def _handle_pattern(self, command, link):
+        if self._motion_locked():
+            return
+        kind = command.get("type")
+        radius = command.get("radius", 100)
+        if kind == "circle":
+            for angle in range(0, 360, 5):
+                a = math.radians(angle)
+                self.program.append((int(radius * math.cos(a)), int(radius * math.sin(a)), None))
+        elif kind == "square":
+            for x, y in ((0, 0), (radius, 0), (radius, radius), (0, radius), (0, 0)):
+                self.program.append((x, y, None))
+        elif kind == "spiral":
+            for i in range(0, 720, 5):
+                r = radius * i / 720.0
+                a = math.radians(i)
+                self.program.append((int(r * math.cos(a)), int(r * math.sin(a)), None))
+
+    def _handle_signature(self, command, link):
+        if self._motion_locked():
+            return
+        style = command.get("style", "normal")
+        points = command.get("points", [])
+        if not hasattr(points, "tolist"):
+            points = [(p.get("x", 0), p.get("y", 0), p.get("z", 0)) for p in points]
+        else:
+            points = points.tolist()
+        last_x = self.axes['X'].position
+        for x, y, z in points:
+            if style == "embossed":
+                z = math.sin(x * 0.1) * 20
+            elif style == "calligraphy":
+                z = abs(x - last_x) * 0.1
+            self.program.append((int(x), int(y), int(z)))
+            last_x = x
+
+    def _handle_path(self, command, link):
+        if self._motion_locked():
+            return
+        for row in (command["seg"].tolist() if hasattr(command["seg"], "tolist") else command["seg"]):
+            if len(row) < 3:
+                continue   # garbled in transit; the firmware skips it too
+            feed = row[3] if len(row) > 3 else 500
+            # Unplanned rows run at their feed from end to end
+            entry, exit = (row[4], row[5]) if len(row) > 5 else (feed, feed)
+            self.segments.append((row[0], row[1], row[2], feed, entry, exit))
+            self.queue_limit = None
+
+    def _handle_tableLoad(self, command, link):
+        self.table_data = bytearray()
+        self.table_size = int(command.get("size", 0))
+        self.table_error = None
+
+    def _handle_table(self, command, link):
+        # Chunks are written in order; anything else spoils the upload
+        data = command.get("data", b"")
+        if isinstance(data, str):
+            data = base64.b64decode(data)
+        if self.table_data is None or command.get("offset") != len(self.table_data):
+            self.table_error = "chunk out of order"
+            self.table_data = None
+            return
+        self.table_data += data
+
+    def _handle_tableRun(self, command, link):
+        if self._motion_locked() or not self.motors_enabled:
+            return
+        if self.table_data is None or len(self.table_data) != self.table_size:
+            self.table_error = self.table_error or "upload incomplete"
+            return
+        try:
+            table = step_tables.decode(self.table_data)
+        except step_tables.StepTableError as e:
+            self.table_error = str(e)
+            return
+        here = tuple(a.current_position() for a in self.axes.values())
+        if here != table.start:
+            self.table_error = f"table starts at {table.start}, axes are at {here}"
+            return
+        for axis in self.axes.values():
+            axis.halt()
+        self.table_positions = [start + np.concatenate([[0], np.cumsum(d, dtype=np.int64)])
+                                for start, d in zip(table.start, table.directions)]
+        self.table = (table, self.now)
+        self.table_played = None
+
+    def status(self):
+        return {"motorsEnabled": self.motors_enabled,
+                "emergencyStop": self.emergency_stop,
+                "positions": {a: s.current_position() for a, s in self.axes.items()},
+                "speeds": dict(self.speeds),
+                "limits": {a: 0 if s.limit_pressed() else 1 for a, s in self.axes.items()},
+                "queueFree": max(0, SEGMENT_QUEUE_SIZE - len(self.segments))}
+
+    # --- headless runs ----------------------------------------------------------
+
+    def run_commands(self, commands, encoding=codec.JSON_CODEC, max_time=3600.0, link=None):
+        # Push a whole job through one link and run the clock until the
+        # controller is idle again. Returns the job time in virtual seconds.
+        if link is None:
+            if self.local_link is None:
+                self.local_link = self.attach(lambda data: None)
+            link = self.local_link
+        start = self.now
+        seq = 0
+        for command in commands:
+            seq += 1
+            data = None
+            if encoding == codec.BINARY_CODEC:
+                data = codec.encode_binary(command, seq)
+            self.receive(link, data if data is not None else codec.encode_json(command))
+        while not self.idle() and self.now - start < max_time:
+            self.advance(0.05)
+            self.flush_replies()
+        return self.now - start
+
+
+class SimulatorServer:
+    # Serves one SimulatedController over TCP and/or a pty
+    def __init__(self, controller=None, time_scale=50.0, tick=0.001):
+        self.controller = controller or SimulatedController()
+        self.time_scale = time_scale
+        self.tick = tick
+        self.running = False
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        self.running = True
+        self._spawn(self._clock_loop)
+        return self
+
+    def start_tcp(self, host='127.0.0.1', port=0):
+        if not self.running:
+            self.start()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(8)
+        self._spawn(self._accept_loop)
+        return self._server.getsockname()
+
+    def start_pty(self, profile=None):
+        if not self.running:
+            self.start()
+        master, slave = os.openpty()
+        import tty
+        tty.setraw(slave)
+        path = os.ttyname(slave)
+
+        def write(data):
+            os.write(master, data)
+
+        link = self.controller.attach(write, profile)
+        self._spawn(self._read_fd, master, link)
+        self._slave = slave
+        return path
+
+    def stop(self):
+        self.running = False
+        if self._server:
+            self._server.close()
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _clock_loop(self):
+        last = time.perf_counter()
+        while self.running:
+            time.sleep(self.tick)
+            now = time.perf_counter()
+            self.controller.advance((now - last) * self.time_scale)
+            self.controller.flush_replies()
+            last = now
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            link = self.controller.attach(conn.sendall)
+            self._spawn(self._read_socket, conn, link)
+
+    def _read_socket(self, conn, link):
+        while self.running:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            self.controller.receive(link, data)
+        link.closed = True
+        conn.close()
+
+    def _read_fd(self, fd, link):
+        while self.running:
+            ready, _, _ = select.select([fd], [], [], 0.2)
+            if not ready:
+                continue
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                break
+            if not data:
+                break
+            self.controller.receive(link, data)
+        link.closed = True
+
+
+if __name__ == "__main__":
+    trajectory = planner.plan_pattern('spiral', 2000, 2000)
+    jobs = 1000
+    for profile in (BLUETOOTH, WIFI):
+        for encoding in (codec.JSON_CODEC, codec.BINARY_CODEC):
+            sim = SimulatedController(profile)
+            sim.execute({"action": "enable", "state": True})
+            wall = time.perf_counter()
+            job_time = sim.run_commands(trajectory.path_commands(), encoding)
+            wall = time.perf_counter() - wall
+            print(f"{profile.name:9} {encoding:4}: spiral job {job_time:6.2f} s virtual "
+                  f"in {wall * 1000:6.1f} ms wall ({sim.bytes_received} bytes)")
+
+    sim = SimulatedController(IDEAL)
+    sim.execute({"action": "enable", "state": True})
+    moves = [{"action": "move", "axis": "X", "steps": s, "speed": 500} for s in (100, -100)]
+    wall = time.perf_counter()
+    for _ in range(jobs):
+        sim.run_commands(moves)
+    print(f"{jobs} short jobs in {time.perf_counter() - wall:.2f} s wall")
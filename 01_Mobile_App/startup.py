@@ -0,0 +1,127 @@
+# TriAxis Pro Startup
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Time to first interaction for both apps. Import this module first: its
+# import time is the clock's zero. Modules that are only needed once a
+# device is connected come in through lazy_import(), which returns the
+# module at once and runs it on first attribute access, from whichever
+# thread gets there first; the others wait for it. Each app marks the
+# phases of its startup on a StartupTimer, which prints one report line
+# against STARTUP_TARGETS and appends it to STARTUP_LOG, so relaunches can
+# be tracked over time.
+
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+STARTED = time.perf_counter()
+STARTUP_LOG = os.path.join(os.path.expanduser("~"), ".triaxis", "startup.jsonl")
+PHASES = ('import', 'build', 'first_paint', 'first_device')
+# Seconds from launch by which each phase should be done
+STARTUP_TARGETS = {'import': 0.15, 'build': 0.3, 'first_paint': 0.5, 'first_device': 3.0}
+
+# Held while a lazy module runs; re-entrant, as one module's import can
+# touch another lazy one
+_loading = threading.RLock()
+_running = set()   # ids of the lazy modules the thread holding _loading is running
+
+
+class _LazyModule(types.ModuleType):
+    # Stands in for the module until an attribute is first asked for, then
+    # runs it and becomes the plain module. The first thread there runs it
+    # and the others wait, rather than seeing it half-run, as they would
+    # with importlib's LazyLoader.
+    def __getattribute__(self, attr):
+        with _loading:
+            if type(self) is _LazyModule and id(self) not in _running:
+                _running.add(id(self))
+                try:
+                    types.ModuleType.__getattribute__(self, '__spec__').loader.exec_module(self)
+                    self.__class__ = types.ModuleType
+                finally:
+                    _running.discard(id(self))
+        return types.ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name):
+    # The module, loaded when it is first used
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    module = importlib.util.module_from_spec(spec)
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    return module
+
+
+class StartupTimer:
+    def __init__(self, app, started=STARTED, targets=STARTUP_TARGETS, log=STARTUP_LOG):
+        self.app = app
+        self.started = started
+        self.targets = targets
+        self.log = log
+        self.marks = {}
+        self.reported = False
+
+    def mark(self, phase, at=None):
+        # The first mark of a phase counts; first_device ends the report.
+        # `at` is a perf_counter() reading taken earlier.
+        if phase not in self.marks:
+            self.marks[phase] = (time.perf_counter() if at is None else at) - self.started
+        if phase == PHASES[-1]:
+            self.finish()
+
+    def finish(self):
+        # Reports once, e.g. when discovery ends without finding a device
+        if self.reported:
+            return None
+        self.reported = True
+        late = [phase for phase, seconds in self.marks.items()
+                if phase in self.targets and seconds > self.targets[phase]]
+        report = {"app": self.app, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "seconds": {phase: round(self.marks[phase], 4) for phase in PHASES if phase in self.marks},
+                  "targets": self.targets, "late": late}
+        print(report_line(report), flush=True)
+        if self.log:
+            try:
+                os.makedirs(os.path.dirname(self.log), exist_ok=True)
+                with open(self.log, 'a') as f:
+                    f.write(json.dumps(report) + "\n")
+            except OSError:
+                pass
+        return report
+
+
+def report_line(report):
+    parts = []
+    for phase in PHASES:
+        seconds = report["seconds"].get(phase)
+        shown = "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+        parts.append(f"{phase.replace('_', ' ')} {shown}")
+    verdict = "late: " + ", ".join(report["late"]) if report["late"] else "within target"
+    return f"{report['app']} startup: " + ", ".join(parts) + f" ({verdict})"
+
+
+if __name__ == "__main__":
+    import subprocess
+
+    # Fresh interpreters, as a relaunch on a tablet would be: module import
+    # of the Tk app with everything loaded up front, then as it is now
+    here = os.path.dirname(os.path.abspath(__file__))
+    eager = ("import time; t = time.perf_counter(); import tkinter, numpy, asyncio, transport, codec, "
+             "dispatcher, planner, discovery, telemetry, signature, job_import, stroke_order, "
+             "pattern_cache, estop, metrics, recorder, canvas_view, io_loop; print(time.perf_counter() - t)")
+    lazy = "import time; t = time.perf_counter(); import app_source_code; print(time.perf_counter() - t)"
+    for label, code in (("everything up front", eager), ("deferred", lazy)):
+        runs = sorted(float(subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True,
+                                           text=True, check=True).stdout) for _ in range(7))
+        print(f"app import, {label:19}: {runs[len(runs) // 2] * 1000:6.1f} ms (median of 7)")
@@ -0,0 +1,402 @@
+# TriAxis Pro Step Tables
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Compiles a whole job on the host into the step pulses each axis makes,
+# timed in ticks of the controller's step timer. The job is planned in one
+# pass: feeds are capped so no axis passes its max speed, and look-ahead
+# over the whole path sets the ramps. The table is uploaded to the
+# controller's flash before it starts, and a timer interrupt plays it from
+# there, so the link no longer sets the pace of the job.
+#
+# Table file (little-endian):
+#   header | X stream | Y stream | Z stream | crc16
+#   header: magic "TXSTP" | version u8 | tick_hz u32 | start 3 x i32 |
+#           length u32 (ticks) | stream bytes 3 x u32
+# crc16 is CRC-16/CCITT-FALSE over everything before it, as in bin1 frames.
+#
+# Each stream holds the time between one step of its axis and the next,
+# delta-encoded and run-length packed, one op per byte plus operands:
+#   0x00-0x3F  RUN       1-64 steps at the current interval
+#   0x40-0x5A  NUDGE     3 steps, each -1/0/+1 tick from the one before
+#                        (base-3 digits, first step most significant)
+#   0x80-0xBF  DELTA     1 step, interval changed by op - 0xA0 ticks
+#   0xC0       INTERVAL  1 step, interval u32 follows
+#   0xC1/0xC2  FORWARD / REVERSE, no step
+#   0xC3       RUN16     u16 steps at the current interval
+#   0xFF       END
+# Cruising axes are runs or NUDGEs, a third of a byte per step, and ramps
+# are a byte per step.
+
+import binascii
+import math
+import struct
+
+import numpy as np
+
+import codec
+import planner
+
+TICK_HZ = 50000          # step timer rate on the controller (20 us)
+MAGIC = b"TXSTP"
+VERSION = 1
+HEADER = struct.Struct('<5sBI3iI3I')
+U16 = struct.Struct('<H')
+U32 = struct.Struct('<I')
+TABLE_CHUNK = 384        # bytes per "table" command; the frame fits the BT RX queue
+RATE_WINDOW = 4          # steps over which the verifier measures rates
+RATE_TOLERANCE = 0.02    # tick rounding may push a measured rate this far over
+
+RUN = 0x00
+NUDGE = 0x40
+DELTA = 0x80
+DELTA_BIAS = 0xA0
+INTERVAL = 0xC0
+FORWARD = 0xC1
+REVERSE = 0xC2
+RUN16 = 0xC3
+END = 0xFF
+MAX_RUN = 64
+
+
+class StepTableError(Exception):
+    pass
+
+
+class StepTable:
+    def __init__(self, start, ticks, directions, length, tick_hz=TICK_HZ):
+        # ticks: per axis, the tick of every step counted from the start of
+        # playback; directions: per axis, +1 or -1 for every step
+        self.start = tuple(int(v) for v in start)
+        self.ticks = ticks
+        self.directions = directions
+        self.length = int(length)
+        self.tick_hz = tick_hz
+
+    @property
+    def duration(self):
+        return self.length / self.tick_hz
+
+    @property
+    def end(self):
+        return tuple(s + int(np.sum(d, dtype=np.int64)) for s, d in zip(self.start, self.directions))
+
+    def steps(self):
+        return sum(len(t) for t in self.ticks)
+
+    def peak_rates(self, window=RATE_WINDOW):
+        # Fastest steps/s of each axis over `window` consecutive intervals
+        rates = []
+        for ticks in self.ticks:
+            if len(ticks) < 2:
+                rates.append(0.0)
+                continue
+            span = min(window, len(ticks) - 1)
+            rates.append(float(span * self.tick_hz / np.min(ticks[span:] - ticks[:-span])))
+        return rates
+
+    def encode(self):
+        streams = [encode_stream(t, d) for t, d in zip(self.ticks, self.directions)]
+        body = (HEADER.pack(MAGIC, VERSION, self.tick_hz, *self.start, self.length,
+                            *(len(s) for s in streams)) + b''.join(streams))
+        return body + codec.CRC.pack(binascii.crc_hqx(body, 0xFFFF))
+
+    def save(self, path):
+        data = self.encode()
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+
+def compile_table(blocks, start=None, max_speed=planner.MAX_SPEED, acceleration=planner.ACCELERATION,
+                  tick_hz=TICK_HZ):
+    # blocks of [x, y, z, feed, ...] rows in absolute steps, as job_import
+    # and Trajectory.segments() give them. `start` is where the machine is
+    # (the first row by default); `max_speed` is one value or one per axis,
+    # as set with setMaxSpeed.
+    rows = [np.asarray(block)[:, :4] for block in blocks if len(block)]
+    if not rows:
+        raise StepTableError("Nothing to compile")
+    rows = np.vstack(rows).astype(np.float64)
+    start = np.rint(rows[0, :3] if start is None else np.asarray(start, dtype=np.float64))
+    points = np.vstack([start[None, :], np.rint(rows[:, :3])])
+    deltas = np.diff(points, axis=0)
+    moves = np.any(deltas != 0, axis=1)
+    points = np.vstack([points[:1], points[1:][moves]])
+    deltas = deltas[moves]
+    feeds = rows[moves, 3]
+    if not len(deltas):
+        return StepTable(start, [np.zeros(0, np.int64)] * 3, [np.zeros(0, np.int8)] * 3, 0, tick_hz)
+
+    # Fastest path speed at which every axis stays within its own limit
+    limits = np.broadcast_to(np.asarray(max_speed, dtype=np.float64), (3,))
+    acceleration = float(np.min(acceleration))
+    lengths = np.linalg.norm(deltas, axis=1)
+    share = np.abs(deltas) / lengths[:, None]
+    with np.errstate(divide='ignore'):
+        axis_limit = np.min(np.where(share > 0, limits / share, np.inf), axis=1)
+    cruise = np.maximum(np.minimum(feeds, axis_limit), planner.MIN_FEED)
+    entry, exit = planner.lookahead_speeds(points, cruise, 0.0, 0.0, acceleration)
+    entry = np.clip(entry, planner.MIN_FEED, cruise)
+    exit = np.clip(exit, planner.MIN_FEED, cruise)
+
+    # Each segment ramps from entry to its top speed, cruises and ramps down
+    # to exit, as segment_speed() runs it; short ones peak where the ramps meet
+    peak = np.sqrt((2 * acceleration * lengths + entry * entry + exit * exit) / 2)
+    top = np.minimum(cruise, np.maximum(peak, np.maximum(entry, exit)))
+    up = (top * top - entry * entry) / (2 * acceleration)
+    down = (top * top - exit * exit) / (2 * acceleration)
+    flat = np.maximum(lengths - up - down, 0.0)
+    ramp_up = (top - entry) / acceleration
+    seconds = ramp_up + flat / top + (top - exit) / acceleration
+    begins = np.concatenate([[0.0], np.cumsum(seconds)[:-1]])
+
+    ticks = []
+    directions = []
+    for axis in range(3):
+        counts = np.abs(deltas[:, axis]).astype(np.int64)
+        total = int(counts.sum())
+        segment = np.repeat(np.arange(len(counts)), counts)
+        index = np.arange(total)
+        # The axis steps as its ideal position passes each half step
+        k = index - (np.cumsum(counts) - counts)[segment]
+        s = lengths[segment] * (k + 0.5) / counts[segment]
+        e, v, x, a = entry[segment], top[segment], exit[segment], acceleration
+        t = np.where(s < up[segment],
+                     (np.sqrt(e * e + 2 * a * s) - e) / a,
+                     ramp_up[segment] + (s - up[segment]) / v)
+        braking = s > lengths[segment] - down[segment]
+        remaining = np.maximum(lengths[segment] - s, 0.0)
+        t = np.where(braking, ramp_up[segment] + flat[segment] / v
+                     + (v - np.sqrt(x * x + 2 * a * remaining)) / a, t)
+        axis_ticks = np.rint((begins[segment] + t) * tick_hz).astype(np.int64)
+        # At least a tick after the step before
+        axis_ticks = np.maximum.accumulate(np.maximum(axis_ticks, 1) - index) + index
+        ticks.append(axis_ticks)
+        directions.append(np.repeat(np.sign(deltas[:, axis]).astype(np.int8), counts))
+    length = max(math.ceil(float(np.sum(seconds)) * tick_hz), *(int(t[-1]) for t in ticks if len(t)))
+    return StepTable(start, ticks, directions, length, tick_hz)
+
+
+def encode_stream(ticks, directions):
+    ops = bytearray()
+    if not len(ticks):
+        ops.append(END)
+        return bytes(ops)
+    intervals = np.diff(np.asarray(ticks, dtype=np.int64), prepend=0)
+    changes = np.flatnonzero((intervals[1:] != intervals[:-1]) | (directions[1:] != directions[:-1])) + 1
+    starts = np.concatenate([[0], changes])
+    counts = np.diff(np.append(starts, len(intervals)))
+    nudges = []
+    interval = 0
+    direction = 0
+
+    def flush():
+        whole = len(nudges) - len(nudges) % 3
+        for i in range(0, whole, 3):
+            a, b, c = nudges[i:i + 3]
+            ops.append(NUDGE + (a + 1) * 9 + (b + 1) * 3 + (c + 1))
+        for change in nudges[whole:]:
+            ops.append(DELTA_BIAS + change)
+        nudges.clear()
+
+    for value, sign, count in zip(intervals[starts].tolist(), directions[starts].tolist(), counts.tolist()):
+        if sign != direction:
+            flush()
+            ops.append(FORWARD if sign > 0 else REVERSE)
+            direction = sign
+        change = value - interval
+        interval = value
+        if -1 <= change <= 1:
+            nudges.append(change)
+        else:
+            flush()
+            if DELTA - DELTA_BIAS <= change < DELTA + 0x40 - DELTA_BIAS:
+                ops.append(DELTA_BIAS + change)
+            else:
+                ops.append(INTERVAL)
+                ops += U32.pack(value)
+        count -= 1
+        if count < 3:
+            nudges.extend([0] * count)
+            continue
+        flush()
+        while count:
+            if count <= MAX_RUN:
+                ops.append(RUN + count - 1)
+                break
+            run = min(count, 0xFFFF)
+            ops.append(RUN16)
+            ops += U16.pack(run)
+            count -= run
+    flush()
+    ops.append(END)
+    return bytes(ops)
+
+
+def decode_stream(data):
+    # (ticks, directions) for one axis, as the controller plays them
+    values = []
+    counts = []
+    signs = []
+    interval = 0
+    direction = 1
+    i = 0
+    while i < len(data):
+        op = data[i]
+        i += 1
+        if op < NUDGE:
+            values.append(interval)
+            counts.append(op - RUN + 1)
+        elif op < NUDGE + 27:
+            code = op - NUDGE
+            for place in (9, 3, 1):
+                interval += code // place % 3 - 1
+                values.append(interval)
+                counts.append(1)
+                signs.append(direction)
+            continue
+        elif DELTA <= op < DELTA + 0x40:
+            interval += op - DELTA_BIAS
+            values.append(interval)
+            counts.append(1)
+        elif op == INTERVAL and i + U32.size <= len(data):
+            (interval,) = U32.unpack_from(data, i)
+            i += U32.size
+            values.append(interval)
+            counts.append(1)
+        elif op == RUN16 and i + U16.size <= len(data):
+            (count,) = U16.unpack_from(data, i)
+            i += U16.size
+            values.append(interval)
+            counts.append(count)
+        elif op in (FORWARD, REVERSE):
+            direction = 1 if op == FORWARD else -1
+            continue
+        elif op == END:
+            break
+        else:
+            raise StepTableError(f"Bad step table op {op:#x} at byte {i - 1}")
+        signs.append(direction)
+    if interval < 0 or any(v <= 0 for v in values):
+        raise StepTableError("Step interval out of range")
+    counts = np.array(counts, dtype=np.int64)
+    ticks = np.cumsum(np.repeat(np.array(values, dtype=np.int64), counts))
+    return ticks, np.repeat(np.array(signs, dtype=np.int8), counts)
+
+
+def decode(data):
+    data = bytes(data)
+    if len(data) < HEADER.size + codec.CRC.size:
+        raise StepTableError("Step table is truncated")
+    magic, version, tick_hz, x, y, z, length, *sizes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise StepTableError("Not a TriAxis step table")
+    (crc,) = codec.CRC.unpack_from(data, len(data) - codec.CRC.size)
+    if crc != binascii.crc_hqx(data[:-codec.CRC.size], 0xFFFF):
+        raise StepTableError("Step table checksum mismatch")
+    if HEADER.size + sum(sizes) + codec.CRC.size != len(data):
+        raise StepTableError("Step table streams don't match the header")
+    ticks = []
+    directions = []
+    offset = HEADER.size
+    for size in sizes:
+        axis_ticks, axis_directions = decode_stream(data[offset:offset + size])
+        ticks.append(axis_ticks)
+        directions.append(axis_directions)
+        offset += size
+    return StepTable((x, y, z), ticks, directions, length, tick_hz)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def upload_commands(table, chunk=TABLE_CHUNK):
+    # The controller writes the chunks to flash in order and only starts
+    # once the whole table is there and its checksum matches
+    data = table.encode() if isinstance(table, StepTable) else bytes(table)
+    yield {"action": "tableLoad", "size": len(data)}
+    for offset in range(0, len(data), chunk):
+        yield {"action": "table", "offset": offset, "data": data[offset:offset + chunk]}
+    yield {"action": "tableRun"}
+
+
+def verify(table, target=None, max_speed=planner.MAX_SPEED, profile=None, encoding=codec.BINARY_CODEC):
+    # Uploads a table to a simulated controller with its axes at the
+    # table's start and plays it. Checks that every axis ends on `target`
+    # (the table's own end by default) and that no axis steps faster than
+    # its max speed. Returns a dict with the figures and "ok".
+    import simulator
+    data = table.encode() if isinstance(table, StepTable) else bytes(table)
+    expected = decode(data)
+    target = expected.end if target is None else tuple(int(v) for v in target)
+    limits = np.broadcast_to(np.asarray(max_speed, dtype=np.float64), (3,)).tolist()
+    controller = simulator.SimulatedController(profile or simulator.IDEAL, codecs=(encoding,))
+    for axis, position, limit in zip(controller.axes.values(), expected.start, limits):
+        axis.position = axis.target = float(position)
+        axis.max_speed = limit
+    controller.execute({"action": "enable", "state": True})
+    job_time = controller.run_commands(upload_commands(data), encoding)
+    played = controller.table_played
+    positions = controller.status()["positions"]
+    error = max(abs(positions[a] - target[i]) for i, a in enumerate(codec.AXES))
+    rates = played["peak_rates"] if played else [0.0] * 3
+    over = [a for a, rate, limit in zip(codec.AXES, rates, limits) if rate > limit * (1 + RATE_TOLERANCE)]
+    return {"ok": played is not None and error == 0 and not over,
+            "error": error, "positions": positions, "target": target,
+            "peak_rates": dict(zip(codec.AXES, rates)), "max_speeds": dict(zip(codec.AXES, limits)),
+            "too_fast": over, "bytes": len(data), "steps": expected.steps(),
+            "upload_s": played["started"] if played else job_time,
+            "play_s": played["seconds"] if played else 0.0,
+            "rejected": controller.table_error}
+
+
+if __name__ == "__main__":
+    import time
+
+    import simulator
+    import transport
+
+    def raster(lines=10, width=6000, pitch=50, spacing=2):
+        # Hatch lines sampled every `spacing` steps, as a bitmap export
+        # writes them: long straight runs of very short segments
+        rows = []
+        for line in range(lines):
+            x = np.arange(0, width + 1, spacing)
+            rows.append(np.column_stack([x if line % 2 == 0 else x[::-1], np.full(len(x), line * pitch),
+                                         np.zeros(len(x)), np.full(len(x), planner.MAX_SPEED)]))
+        return np.vstack(rows).astype(np.int32)
+
+    square = planner.plan_pattern('square', 4000, 2000, profile='lookahead').segments()
+    # The raster at full speed, and a square with Y held to half speed by setMaxSpeed
+    jobs = [("raster", raster(), planner.MAX_SPEED),
+            ("square", square, (planner.MAX_SPEED, planner.MAX_SPEED / 2, planner.MAX_SPEED))]
+    for name, rows, max_speed in jobs:
+        start = time.perf_counter()
+        table = compile_table([rows], max_speed=max_speed)
+        elapsed = time.perf_counter() - start
+        data = table.encode()
+        again = decode(data)
+        same = all(np.array_equal(a, b) for a, b in zip(table.ticks + table.directions,
+                                                          again.ticks + again.directions))
+        print(f"{name}: {len(rows):,} segments, {table.steps():,} steps compiled in {elapsed * 1000:.0f} ms, "
+              f"{table.duration:.2f} s long; {len(data):,} bytes ({len(data) / table.steps():.2f} per step), "
+              f"decodes {'exactly' if same else 'WRONG'}")
+        for profile in (simulator.BLUETOOTH_SPP, simulator.WIFI):
+            check = verify(table, rows[-1, :3], max_speed, profile)
+            rates = ", ".join(f"{a} {check['peak_rates'][a]:.0f}/{check['max_speeds'][a]:.0f}" for a in codec.AXES)
+            print(f"  {profile.name:13} table: {'PASS' if check['ok'] else 'FAIL'}, end error {check['error']} "
+                  f"steps, peak/max steps/s {rates}; upload {check['upload_s']:.2f} s + play "
+                  f"{check['play_s']:.2f} s")
+            if name != "raster":
+                continue
+            # The same job streamed as look-ahead planned segments
+            commands = list(planner.planned_commands(planner.lookahead_blocks([rows])))
+            for encoding in (codec.JSON_CODEC, codec.BINARY_CODEC):
+                streamed = transport.measure_delivery(commands, rows[-1, :3], 'ack window', encoding,
+                                                      profile=profile)
+                print(f"  {profile.name:13} streamed {encoding}: {streamed['job_time']:.2f} s, "
+                      f"end error {streamed['error']} steps")
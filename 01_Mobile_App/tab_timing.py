@@ -0,0 +1,55 @@
+# TriAxis Pro Tab Timing
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Measures how long the Tk app takes to build each tab the first time and
+# to switch back to it afterwards. Runs against a hidden window with the
+# connection faked, so no controller is needed (a display still is).
+
+import time
+import tkinter as tk
+
+from app_source_code import EnhancedTriAxisApp
+
+TABS = ('Connect', 'Manual', 'Patterns', 'Draw', 'About')
+SWITCH_ROUNDS = 20
+
+
+def timed_switch(app, tab_name):
+    start = time.perf_counter()
+    app.switch_tab(tab_name)
+    app.master.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(rounds=SWITCH_ROUNDS):
+    root = tk.Tk()
+    root.withdraw()
+    # The Connect tab is built by the constructor
+    start = time.perf_counter()
+    app = EnhancedTriAxisApp(root)
+    root.update_idletasks()
+    build = {'Connect': (time.perf_counter() - start) * 1000}
+
+    app.connection_manager.is_connected = True
+    app.connection_manager.connection_type = "WiFi"
+    app.invalidate_tabs('Manual', 'Patterns', 'Draw')
+    for tab in TABS[1:]:
+        build[tab] = timed_switch(app, tab)
+    switch = {tab: [] for tab in TABS}
+    for _ in range(rounds):
+        for tab in TABS:
+            switch[tab].append(timed_switch(app, tab))
+
+    app.connection_manager.is_connected = False
+    root.destroy()
+    return build, {tab: sorted(times) for tab, times in switch.items()}
+
+
+if __name__ == "__main__":
+    build, switch = measure()
+    print("tab        build ms  switch ms (median)  switch ms (worst)")
+    for tab in TABS:
+        times = switch[tab]
+        print(f"{tab:9s} {build[tab]:9.2f} {times[len(times) // 2]:19.2f} {times[-1]:18.2f}")
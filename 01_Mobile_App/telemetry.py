@@ -0,0 +1,151 @@
+# TriAxis Pro Telemetry
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Real positions from the device's getStatus replies. The poller asks often
+# while the machine moves and rarely while it is idle; samples land in a
+# preallocated NumPy ring buffer; the UI redraws at a capped frame rate by
+# moving existing canvas items instead of recreating them. Polls are timers
+# on the shared I/O loop, not a thread of their own.
+
+import threading
+import time
+
+import numpy as np
+
+import io_loop
+
+AXES = ('X', 'Y', 'Z')
+HISTORY_SIZE = 4096
+FAST_INTERVAL = 0.05   # seconds between polls while moving
+SLOW_INTERVAL = 1.0    # seconds between polls while idle
+FAST_HOLD = 1.0        # stay fast this long after the last sign of motion
+FRAME_INTERVAL = 66    # ms between UI refreshes (~15 fps)
+TRACE_COLORS = ('#e74c3c', '#27ae60', '#3498db')
+
+
+class PositionHistory:
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.times = np.zeros(size, dtype=np.float64)
+        self.positions = np.zeros((size, 3), dtype=np.int32)
+        self.count = 0
+        self.index = 0
+        self.samples = 0   # total ever written; lets readers spot new data
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, positions):
+        with self._lock:
+            self.times[self.index] = timestamp
+            self.positions[self.index] = positions
+            self.index = (self.index + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+            self.samples += 1
+
+    def latest(self):
+        with self._lock:
+            if not self.count:
+                return None
+            last = (self.index - 1) % self.size
+            return self.times[last], self.positions[last].copy()
+
+    def ordered(self, last=None):
+        # Oldest-first copies of the newest `last` samples
+        with self._lock:
+            count = self.count if last is None else min(last, self.count)
+            start = (self.index - count) % self.size
+            order = (start + np.arange(count)) % self.size
+            return self.times[order], self.positions[order]
+
+
+class TelemetryPoller:
+    def __init__(self, dispatcher, history=None, fast=FAST_INTERVAL, slow=SLOW_INTERVAL):
+        self.dispatcher = dispatcher
+        self.history = history or PositionHistory()
+        self.fast = fast
+        self.slow = slow
+        self.status = None
+        self.moving = False
+        self.interval = slow
+        self._last_activity = 0.0
+        self._queue_capacity = 0
+        self._last_sample = 0.0
+        self._running = False
+        self._timer = None
+        self.io = io_loop.shared()
+        dispatcher.on_status = self.on_status
+
+    def start(self):
+        self._running = True
+        self.io.call(self._tick)
+        return self
+
+    def stop(self):
+        self._running = False
+        self.io.call(self._tick)
+        if self.dispatcher.on_status == self.on_status:
+            self.dispatcher.on_status = None
+
+    def nudge(self):
+        # Something was just sent; switch to the fast rate straight away
+        self.moving = True
+        self._last_activity = time.monotonic()
+        if self._running:
+            self.io.call(self._tick)
+
+    def on_status(self, status):
+        positions = [status.get("positions", {}).get(a, 0) for a in AXES]
+        previous = self.history.latest()
+        self.history.append(time.monotonic(), positions)
+        self._last_sample = time.monotonic()
+        changed = previous is not None and np.any(previous[1] != positions)
+        # Segments still queued on the device mean motion is coming
+        queue_free = status.get("queueFree", 0)
+        self._queue_capacity = max(self._queue_capacity, queue_free)
+        if changed or self.dispatcher.pending() or queue_free < self._queue_capacity:
+            self._last_activity = self._last_sample
+        self.moving = self._last_sample - self._last_activity < FAST_HOLD
+        self.status = status
+
+    def _tick(self):
+        # On the I/O loop; replaces the timer set by the last tick
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._running:
+            return
+        self.interval = self.fast if self.moving else self.slow
+        # Batches already bring statuses back; only ask when they don't
+        if time.monotonic() - self._last_sample >= self.interval:
+            self.dispatcher.request_status()
+        self._timer = self.io.loop.call_later(self.interval, self._tick)
+
+
+class TracePlot:
+    # Live X/Y/Z trace on an existing Tk canvas. The three line items are
+    # created once and only their coordinates change.
+    def __init__(self, canvas, width, height, points=200):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.points = points
+        self.lines = [canvas.create_line(0, 0, 0, 0, fill=color, width=2) for color in TRACE_COLORS]
+        self.drawn = -1
+
+    def refresh(self, history):
+        if history.samples == self.drawn or history.count < 2:
+            return False
+        self.drawn = history.samples
+        times, positions = history.ordered(self.points)
+        span = max(times[-1] - times[0], 1e-6)
+        xs = (times - times[0]) / span * (self.width - 4) + 2
+        low = positions.min()
+        high = max(positions.max(), low + 1)
+        ys = self.height - 2 - (positions - low) / (high - low) * (self.height - 4)
+        for axis, item in enumerate(self.lines):
+            coords = np.empty(2 * len(xs))
+            coords[0::2] = xs
+            coords[1::2] = ys[:, axis]
+            self.canvas.coords(item, *coords.tolist())
+        return True
@@ -0,0 +1,12 @@
+# TriAxis Pro Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# The app's modules sit flat in 01_Mobile_App and import each other by
+# name; the tests run against the simulator over real local sockets.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
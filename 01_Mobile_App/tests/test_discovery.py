@@ -0,0 +1,62 @@
+# TriAxis Pro Discovery Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# A sweep over explicit hosts: a controller, and something else on the
+# port that answers with JSON that isn't an object.
+
+import socket
+import threading
+
+import pytest
+
+import discovery
+import io_loop
+import simulator
+
+
+@pytest.fixture
+def hosts():
+    server = simulator.SimulatorServer(simulator.SimulatedController(simulator.WIFI))
+    controller = server.start_tcp()
+    stranger = socket.create_server(("127.0.0.1", 0))
+
+    def answer():
+        while True:
+            try:
+                conn, _ = stranger.accept()
+            except OSError:
+                return
+            conn.recv(1024)
+            conn.sendall(b'[1, 2, 3]\n')
+            conn.close()
+
+    threading.Thread(target=answer, daemon=True).start()
+    yield [stranger.getsockname(), controller]
+    stranger.close()
+    server.stop()
+
+
+def test_odd_reply_does_not_end_the_sweep(hosts):
+    engine = discovery.DiscoveryEngine(hosts=hosts, timeout=1.0)
+    devices = engine.scan_blocking(discovery.WIFI)
+    assert [(d["ip"], d["port"]) for d in devices] == [hosts[1]]
+
+
+def test_cached_results_come_from_the_io_loop(hosts):
+    engine = discovery.DiscoveryEngine(hosts=hosts, timeout=1.0)
+    engine.scan_blocking(discovery.WIFI)
+    done = threading.Event()
+    threads = []
+
+    def on_device(device):
+        threads.append(io_loop.shared().in_loop())
+
+    def on_done(devices):
+        threads.append(io_loop.shared().in_loop())
+        done.set()
+
+    assert engine.scan(discovery.WIFI, on_device, on_done) is False
+    assert done.wait(2.0)
+    assert threads == [True, True]
@@ -0,0 +1,78 @@
+# TriAxis Pro Emergency Stop Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# The stop-latency budget with the link and the device queue kept full by
+# a long job, on each radio and codec, and with one link stuck mid-write.
+
+import threading
+import time
+
+import pytest
+
+import planner
+import simulator
+from connection import ConnectionManager
+from dispatcher import CommandDispatcher
+from estop import STOP_BUDGET, EmergencyStop
+
+SETTLE = 0.2   # seconds the axes must stay put after the stop
+
+
+@pytest.fixture(scope="module")
+def spiral():
+    return planner.plan_pattern('spiral', 20000, 2000, tolerance=0.05)
+
+
+def connect(profile, encoding=simulator.codec.BINARY_CODEC):
+    controller = simulator.SimulatedController(profile, codecs=(encoding,))
+    controller.execute({"action": "enable", "state": True})
+    server = simulator.SimulatorServer(controller, time_scale=1.0)
+    manager = ConnectionManager()
+    manager.connect_wifi(*server.start_tcp())
+    return controller, server, manager
+
+
+@pytest.mark.parametrize("encoding", [simulator.codec.JSON_CODEC, simulator.codec.BINARY_CODEC])
+@pytest.mark.parametrize("profile", [simulator.WIFI, simulator.BLUETOOTH_SPP], ids=lambda p: p.name)
+def test_stop_within_budget_on_saturated_link(spiral, profile, encoding):
+    controller, server, manager = connect(profile, encoding)
+    dispatcher = CommandDispatcher(manager).start()
+    try:
+        dispatcher.submit_stream(spiral.planned_commands())
+        time.sleep(1.0)
+        assert controller.moving()
+        result = EmergencyStop().trigger({"sim": manager.transport}, [dispatcher])
+        for name, seconds in result["latency"].items():
+            assert seconds is not None, f"no stop confirmation from {name}"
+            assert seconds < STOP_BUDGET, f"{name} stopped in {seconds * 1000:.0f} ms"
+        assert result["worst"] < STOP_BUDGET
+        stopped_at = controller.status()["positions"]
+        time.sleep(SETTLE)
+        assert not controller.moving()
+        assert controller.status()["positions"] == stopped_at
+    finally:
+        dispatcher.stop()
+        manager.disconnect()
+        server.stop()
+
+
+def test_stuck_link_does_not_delay_the_others():
+    # The sender of one link holds its lock for 500 ms; the other link's
+    # stop must go out regardless
+    connections = [connect(simulator.WIFI) for _ in range(2)]
+    try:
+        for controller, _, _ in connections:
+            controller.execute({"action": "move", "axis": "X", "steps": 100000})
+        time.sleep(0.3)
+        free, stuck = (manager.transport for _, _, manager in connections)
+        stuck._send_lock.acquire()
+        threading.Timer(0.5, stuck._send_lock.release).start()
+        result = EmergencyStop().trigger({"stuck": stuck, "free": free})
+        assert result["latency"]["free"] is not None
+        assert result["latency"]["free"] < STOP_BUDGET
+    finally:
+        for _, server, manager in connections:
+            manager.disconnect()
+            server.stop()
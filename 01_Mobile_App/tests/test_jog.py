@@ -0,0 +1,117 @@
+# TriAxis Pro Jog Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Press-and-hold jogging against the simulator in real time, over TCP with
+# each radio's latency and bandwidth. Times are wall-clock from the call on
+# the UI side to the change at the axes.
+
+import time
+
+import pytest
+
+import simulator
+from connection import ConnectionManager
+from jog import JOG_KEEPALIVE, JOG_TIMEOUT, JogController
+
+RESPONSE_SLACK = 0.05   # seconds allowed past the link's one-way latency
+
+
+class TimedJogger(JogController):
+    # Notes when the last frame went out
+    last_sent = None
+
+    def _send(self, command):
+        sent = super()._send(command)
+        if sent:
+            self.last_sent = time.perf_counter()
+        return sent
+
+
+def wait_for(condition, limit=5.0):
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > limit:
+            return None
+        time.sleep(0.0005)
+    return time.perf_counter()
+
+
+@pytest.fixture(params=[simulator.WIFI, simulator.BLUETOOTH], ids=lambda p: p.name)
+def jogging(request):
+    controller = simulator.SimulatedController(request.param)
+    server = simulator.SimulatorServer(controller, time_scale=1.0)
+    manager = ConnectionManager()
+    manager.connect("WiFi", *server.start_tcp()).result()
+    manager.send_command({"action": "enable", "state": True})
+    assert wait_for(lambda: controller.motors_enabled)
+    jogger = TimedJogger(manager.transport)
+    yield controller, jogger, request.param.latency + RESPONSE_SLACK
+    jogger.release()
+    manager.disconnect()
+    server.stop()
+
+
+def test_press_and_release_latency(jogging):
+    controller, jogger, limit = jogging
+    x = controller.axes['X']
+    pressed = time.perf_counter()
+    jogger.press({'X': 1000})
+    moving = wait_for(lambda: x.speed != 0)
+    assert moving is not None and moving - pressed < limit
+    time.sleep(0.5)
+    peak = x.speed
+    released = time.perf_counter()
+    jogger.release()
+    slowing = wait_for(lambda: x.speed < peak)
+    assert slowing is not None and slowing - released < limit
+    assert wait_for(lambda: not x.is_running())
+
+
+def test_keepalives_hold_the_jog(jogging):
+    controller, jogger, _ = jogging
+    x = controller.axes['X']
+    jogger.press({'X': 1000})
+    wait_for(lambda: x.speed >= 999)
+    time.sleep(JOG_TIMEOUT * 4)
+    assert controller.jog_timeouts == 0
+    assert x.speed >= 999
+
+
+def test_deadman_stops_the_axis(jogging):
+    # The app stops sending mid-jog, as if it froze or the link died
+    controller, jogger, limit = jogging
+    x = controller.axes['X']
+    jogger.press({'X': -1000})
+    assert wait_for(lambda: x.speed <= -999)
+    jogger.io.call_wait(lambda: jogger._timer.cancel())
+    slowing = wait_for(lambda: x.speed > -999 and controller.jog_timeouts > 0)
+    assert slowing is not None
+    assert slowing - jogger.last_sent < JOG_TIMEOUT + limit
+    assert wait_for(lambda: not x.is_running())
+
+
+def test_diagonal_and_partial_release(jogging):
+    controller, jogger, _ = jogging
+    x, y = controller.axes['X'], controller.axes['Y']
+    jogger.press({'X': 800, 'Y': 800})
+    time.sleep(0.5)
+    jogger.release(['X'])
+    time.sleep(0.3)
+    assert y.speed > 0
+    jogger.release()
+    assert wait_for(lambda: not x.is_running() and not y.is_running())
+    assert x.position > 0 and y.position > x.position
+    assert (x.max_speed, y.max_speed) == (simulator.MAX_SPEED, simulator.MAX_SPEED)
+
+
+def test_emergency_stop_ends_the_jog(jogging):
+    controller, jogger, _ = jogging
+    y = controller.axes['Y']
+    jogger.press({'Y': 1000})
+    assert wait_for(lambda: y.speed > 500)
+    jogger.link.emergency_stop()
+    time.sleep(JOG_KEEPALIVE * 3)
+    assert not jogger.active
+    assert not y.is_running()
@@ -0,0 +1,50 @@
+# TriAxis Pro Planner Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# Look-ahead planning of streamed blocks, and what the controller does when
+# the stream stalls part way.
+
+import numpy as np
+import pytest
+
+import planner
+import simulator
+
+TICK = 0.001
+
+
+def straight_blocks(rows=300, step=10, block=50, feed=2000):
+    xs = np.arange(1, rows + 1) * step
+    line = np.column_stack([xs, np.zeros(rows), np.zeros(rows), np.full(rows, feed)]).astype(np.float64)
+    return [line[i:i + block] for i in range(0, rows, block)]
+
+
+def test_only_the_last_row_stops():
+    blocks = list(planner.lookahead_blocks(straight_blocks(), start=(0, 0, 0)))
+    assert len(blocks) > 1
+    rows = np.vstack(blocks)
+    assert rows[0, 4] == 0 and rows[-1, 5] == 0
+    assert np.all(rows[:-1, 5] > 0)
+
+
+@pytest.mark.parametrize("arrived", [None, 5, 1])
+def test_stalled_stream_ramps_down_instead_of_halting(arrived):
+    # Only the first prefix, or its first rows, arrive; the last of them
+    # was planned to carry on at speed
+    first = next(planner.lookahead_blocks(straight_blocks(), start=(0, 0, 0)))[:arrived]
+    assert first[-1, 5] > planner.MIN_FEED
+    controller = simulator.SimulatedController(simulator.IDEAL)
+    controller.execute({"action": "enable", "state": True})
+    controller.execute({"action": "path", "seg": first})
+    last_speed = None
+    for _ in range(int(30 / TICK)):
+        if not controller.moving():
+            break
+        if controller.segment_active:
+            last_speed = controller.path_speed
+        controller.advance(TICK)
+    assert not controller.moving()
+    assert controller.status()["positions"]["X"] == first[-1, 0]
+    assert last_speed <= planner.MIN_FEED + planner.ACCELERATION * TICK * 2
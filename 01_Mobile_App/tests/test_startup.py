@@ -0,0 +1,44 @@
+# TriAxis Pro Startup Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# lazy_import() with several threads touching a module for the first time
+# while it is still running.
+
+import sys
+import threading
+
+import startup
+
+SLOW_MODULE = """
+import time
+RUNS = __import__('builtins').__dict__.setdefault('_triaxis_slow_runs', [])
+RUNS.append(1)
+time.sleep(0.2)
+READY = True
+"""
+
+
+def test_first_use_from_many_threads_runs_the_module_once(tmp_path, monkeypatch):
+    (tmp_path / "triaxis_slow_module.py").write_text(SLOW_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "triaxis_slow_module", raising=False)
+    module = startup.lazy_import("triaxis_slow_module")
+    seen = []
+    errors = []
+
+    def use():
+        try:
+            seen.append(module.READY)
+        except AttributeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert seen == [True] * 8
+    assert len(module.RUNS) == 1
@@ -0,0 +1,74 @@
+# TriAxis Pro Transport Tests
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# The ack window against the simulator: several senders sharing one link,
+# and an emergency stop whose confirmation never arrives.
+
+import threading
+
+import pytest
+
+import simulator
+import transport
+from connection import ConnectionManager
+
+MOVE = {"action": "move", "axis": "X", "steps": 10, "speed": 500}
+
+
+@pytest.fixture
+def link():
+    controller = simulator.SimulatedController(simulator.WIFI)
+    controller.execute({"action": "enable", "state": True})
+    server = simulator.SimulatorServer(controller, time_scale=1.0)
+    manager = ConnectionManager()
+    manager.connect_wifi(*server.start_tcp())
+    assert manager.transport.window is not None
+    yield controller, manager.transport
+    manager.disconnect()
+    server.stop()
+
+
+def test_senders_sharing_a_full_window_lose_nothing(link):
+    controller, device = link
+    processed = controller.commands_processed
+    senders = [threading.Thread(target=device.send_many, args=([MOVE] * 150,)) for _ in range(3)]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join(10.0)
+    assert device.window.wait_empty(10.0)
+    assert device.window.retransmits == 0
+    assert controller.commands_processed - processed == 450
+
+
+def test_lost_stop_confirmation_sends_the_stop_again(link, monkeypatch):
+    monkeypatch.setattr(transport, "RESYNC_TIMEOUT", 0.2)
+    controller, device = link
+    deliver = device._deliver
+    dropped = []
+
+    def lose_first_stopped(message):
+        if "stopped" in message and not dropped:
+            dropped.append(message)
+            return
+        deliver(message)
+
+    device._deliver = lose_first_stopped
+    device.emergency_stop()
+    assert device.stopped.wait(2.0)
+    assert dropped and device.window.resyncs == 1
+    assert controller.estops == 2
+    assert device.request({"action": "getStatus"}, timeout=2.0)["emergencyStop"] is False
+
+
+def test_unconfirmed_stop_gives_the_link_up(link, monkeypatch):
+    monkeypatch.setattr(transport, "RESYNC_TIMEOUT", 0.1)
+    _, device = link
+    deliver = device._deliver
+    device._deliver = lambda message: "stopped" in message or deliver(message)
+    device.emergency_stop()
+    with pytest.raises(transport.TransportError):
+        device.send(MOVE)
+    assert device.window.resyncs == transport.RESYNC_ATTEMPTS - 1
@@ -0,0 +1,807 @@
+# TriAxis Pro Device Transport
+# Developer: Amol M.
+# Company: APEX PRECISION MECHATRONIX PVT. LTD.
+# Version: 1.0
+
+# One long-lived stream per controller (TCP for WiFi, RFCOMM or a serial
+# device for Bluetooth). Commands are newline-delimited JSON, or binary
+# frames once the device has offered them, and are written back-to-back
+# without waiting for replies, so many commands can be in flight on the
+# same link.
+#
+# When the device acknowledges commands, every command carries a sequence
+# number and a sliding window keeps no more in flight than the device can
+# buffer. The device runs only the next expected sequence number and acks
+# the newest one it accepted; anything unacked is sent again (go-back-N)
+# when the same ack keeps coming back, or when the retransmit timer fires.
+#
+# Links are opened and read on the shared I/O loop (io_loop): nothing
+# holds a thread per link. Writes still happen on the caller's thread, as
+# the sender blocks on the ack window by design; the resends the loop
+# decides on are written from its executor, so a link that has stopped
+# reading never stops the loop reading the acks. When the device goes away
+# the link closes itself and calls on_lost(link) from the loop.
+#
+# emergency_stop() skips all of that: it drops whatever the host still has
+# queued or unacknowledged and writes the fixed stop bytes straight away.
+# Bumping `epoch` turns away batches that were taken before the stop. The
+# window then holds new commands until the device confirms the stop, and
+# sends the stop again if no confirmation comes.
+#
+# `metrics` is an optional metrics.LinkMetrics; with it enabled, encodes,
+# writes and acks are timed.
+
+import asyncio
+import collections
+import json
+import os
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+
+import codec
+import io_loop
+
+CONTROLLER_PORT = 8080
+RFCOMM_CHANNEL = 1
+FRAME_DELIMITER = b'\n'
+READ_CHUNK = 4096
+READ_FLAGS = getattr(socket, 'MSG_DONTWAIT', 0)
+
+INITIAL_RTO = 1.0     # seconds before the first retransmit, until RTT is known
+MIN_RTO = 1.0         # RFC 6298; a full segment queue stalls reading for a while
+MAX_RTO = 8.0
+MAX_RETRIES = 8
+DUPLICATE_ACKS = 2    # repeats of the same ack that mean a command was lost
+RESYNC_TIMEOUT = 2.0  # seconds to wait for "stopped" before sending the stop again
+RESYNC_ATTEMPTS = 3   # stops sent without a confirmation before the link is given up
+
+
+class TransportError(Exception):
+    pass
+
+
+class Transport:
+    def __init__(self):
+        self.is_open = False
+        self.codec = codec.JSON_CODEC
+        self.seq = 0
+        self.replies = queue.Queue()
+        self.on_message = None
+        self.on_lost = None
+        self.io = None
+        self.window = None
+        self.epoch = 0
+        self.stopped = threading.Event()
+        self.stopped_at = None
+        self.commands_sent = 0
+        self.bytes_sent = 0
+        self.metrics = None
+        self._send_lock = threading.Lock()
+        self._reply_waiter = None
+        self._rx_buffer = bytearray()
+
+    def open(self):
+        # Blocking form of open_async(), for any thread but the I/O loop's
+        io_loop.shared().submit(self.open_async()).result()
+        return self
+
+    async def open_async(self):
+        # On the I/O loop; cancelling it closes whatever was opened
+        self.io = io_loop.shared()
+        await self._open_stream()
+        self.is_open = True
+        self.io.loop.add_reader(self._fileno(), self._on_readable)
+        return self
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        if self.window:
+            self.window.close()
+        self.io.call_wait(self._detach)
+
+    def _detach(self):
+        self.io.loop.remove_reader(self._fileno())
+        self._close_stream()
+
+    def connection_lost(self):
+        # On the I/O loop, when the stream ends or fails; not after close()
+        if not self.is_open:
+            return
+        self.close()
+        if self.on_lost:
+            self.on_lost(self)
+
+    def enable_acks(self, size, buffer=None):
+        # The device acknowledged "acks" in its connect reply
+        self.window = SlidingWindow(self, size, buffer)
+        return self.window
+
+    def encode(self, command, seq=None):
+        # `seq` is given for commands sent through the ack window. Other
+        # binary frames carry 0 on a windowed link (outside the sequence)
+        # or a free-running counter on a plain one.
+        metrics = self.metrics
+        if metrics is not None and metrics.enabled:
+            started = time.perf_counter()
+            data = self._encode(command, seq)
+            metrics.since('encode', started)
+            return data
+        return self._encode(command, seq)
+
+    def _encode(self, command, seq):
+        frame_seq = seq
+        if seq is None:
+            self.seq = self.seq % 0xFFFF + 1
+            frame_seq = 0 if self.window else self.seq
+        if self.codec == codec.BINARY_CODEC:
+            data = codec.encode_binary(command, frame_seq)
+            if data is not None:
+                return data
+        if seq is not None:
+            command = dict(command, seq=seq)
+        return codec.encode_json(command)
+
+    def send(self, command, epoch=None):
+        self.send_many([command], epoch)
+
+    def send_many(self, commands, epoch=None):
+        # `epoch` is the value the caller saw when it took the commands; if
+        # an emergency stop has happened since, they are dropped
+        if self.window:
+            self.window.send(commands, epoch)
+            return
+        # One write for the whole batch keeps small commands in the same packet
+        self.send_raw(b''.join(self.encode(c) for c in commands), len(commands), epoch)
+
+    def emergency_stop(self):
+        self.stopped.clear()
+        self.epoch += 1
+        if self.window:
+            self.window.flush()
+        self.send_raw(codec.encode_estop(self.codec))
+
+    def send_raw(self, data, count=1, epoch=None):
+        if not self.is_open:
+            raise TransportError("Transport is not open")
+        metrics = self.metrics
+        with self._send_lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            if metrics is not None and metrics.enabled:
+                started = time.perf_counter()
+                self._write(data)
+                metrics.wrote(started, count, len(data))
+            else:
+                self._write(data)
+            self.commands_sent += count
+            self.bytes_sent += len(data)
+
+    def request(self, command, timeout=2.0):
+        # Send and wait for the next reply; only meaningful while nothing else is
+        # consuming the reply queue. Not on the I/O loop, which delivers it.
+        self.send(command)
+        return self.wait_reply(timeout)
+
+    async def request_async(self, command, timeout=2.0):
+        # request() for coroutines on the I/O loop
+        waiter = self.io.loop.create_future()
+        self._reply_waiter = waiter
+        try:
+            self.send(command)
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise TransportError("No reply from device")
+        finally:
+            self._reply_waiter = None
+
+    def wait_reply(self, timeout=2.0):
+        try:
+            return self.replies.get(timeout=timeout)
+        except queue.Empty:
+            raise TransportError("No reply from device")
+
+    def _on_readable(self):
+        # On the I/O loop, whenever the stream has data
+        try:
+            data = self._read(READ_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.connection_lost()
+            return
+        self._feed(data)
+
+    def _feed(self, data):
+        self._rx_buffer += data
+        while self._rx_buffer:
+            if self._rx_buffer[0] == codec.FRAME_SYNC:
+                try:
+                    parts = codec.split_frame(self._rx_buffer)
+                except codec.CodecError:
+                    del self._rx_buffer[:1]
+                    continue
+                if parts is None:
+                    return
+                frame_type, _, payload, consumed = parts
+                del self._rx_buffer[:consumed]
+                try:
+                    message = codec.decode_payload(frame_type, payload)
+                except (codec.CodecError, struct.error):
+                    # Intact but unknown type or wrong length, e.g. newer
+                    # firmware; drop it and read on
+                    continue
+                self._deliver(message)
+                continue
+            end = self._rx_buffer.find(FRAME_DELIMITER)
+            sync = self._rx_buffer.find(codec.FRAME_SYNC)
+            if sync > 0 and (end < 0 or sync < end):
+                # Tail of a torn frame; JSON never holds the sync byte
+                del self._rx_buffer[:sync]
+                continue
+            if end < 0:
+                return
+            line = bytes(self._rx_buffer[:end]).strip()
+            del self._rx_buffer[:end + 1]
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                # Firmware debug text on a shared serial port
+                continue
+            self._deliver(message)
+
+    def _deliver(self, message):
+        if "ack" in message and self.window:
+            self.window.on_ack(message["ack"])
+            return
+        if "stopped" in message:
+            self.stopped_at = time.perf_counter()
+            if self.window:
+                self.window.resume()
+            self.stopped.set()
+            return
+        if self._reply_waiter is not None and not self._reply_waiter.done():
+            self._reply_waiter.set_result(message)
+        elif self.on_message:
+            self.on_message(message)
+        else:
+            self.replies.put(message)
+
+    async def _open_stream(self):
+        raise NotImplementedError
+
+    def _fileno(self):
+        raise NotImplementedError
+
+    def _close_stream(self):
+        raise NotImplementedError
+
+    def _write(self, data):
+        raise NotImplementedError
+
+    def _read(self, size):
+        raise NotImplementedError
+
+
+class SlidingWindow:
+    # Sequenced sending with at most `size` commands (and `buffer` bytes, when
+    # the device reports its receive buffer) unacknowledged at once
+    def __init__(self, transport, size, buffer=None):
+        self.transport = transport
+        self.size = size
+        self.buffer = buffer
+        self.in_flight = collections.OrderedDict()   # seq -> [data, first sent, last sent]
+        self.seq = 0                                 # runs 1..65535, skipping 0
+        self.bytes_in_flight = 0
+        self.rto = INITIAL_RTO
+        self.srtt = None
+        self.rttvar = None
+        self.acked = 0
+        self.last_ack = 0
+        self.duplicates = 0
+        self.retransmits = 0
+        self.failures = 0
+        self.resyncing = False                       # between a flush and the device's "stopped"
+        self.resyncs = 0                             # stops sent again for want of a "stopped"
+        self._resync = 0                             # flush count, so a stale deadline is ignored
+        self._closed = False
+        self._timing = False                         # retransmit timer running on the I/O loop
+        self._cond = threading.Condition()
+        # Taken around numbering and writing a batch, so sequence numbers
+        # go out in order; never held while waiting on _cond
+        self._sending = threading.Lock()
+
+    def send(self, commands, epoch=None):
+        # Blocks while the window is full; writes as many commands as fit
+        # in one go to keep small commands in the same packet. A command
+        # only takes its sequence number once it fits, so a sender waiting
+        # for room never holds a number another sender's commands follow.
+        pending = collections.deque(commands)
+        while pending:
+            with self._sending:
+                with self._cond:
+                    if epoch is not None and epoch != self.transport.epoch:
+                        return
+                    batch = []
+                    size = 0
+                    while pending:
+                        seq = self.seq % 0xFFFF + 1
+                        data = self.transport.encode(pending[0], seq)
+                        if not self._has_room(len(batch), size + len(data)):
+                            break
+                        pending.popleft()
+                        self.seq = seq
+                        batch.append((seq, data))
+                        size += len(data)
+                    now = time.monotonic()
+                    for seq, data in batch:
+                        self.in_flight[seq] = [data, now, now]
+                        self.bytes_in_flight += len(data)
+                    if batch:
+                        self._start_timer()
+                if batch:
+                    self.transport.send_raw(b''.join(data for _, data in batch), len(batch))
+                    continue
+            with self._cond:
+                if not self._has_room(0, len(data)):
+                    self._wait()
+
+    def on_ack(self, seq):
+        # Cumulative: everything up to and including `seq` has been accepted
+        with self._cond:
+            if self.resyncing:
+                return
+            if seq not in self.in_flight:
+                # The device is turning away what came after a gap
+                if self.in_flight and seq == self.last_ack:
+                    self.duplicates += 1
+                    if self.duplicates == DUPLICATE_ACKS:
+                        self._retransmit(backoff=False)
+                return
+            self.last_ack = seq
+            self.duplicates = 0
+            now = time.monotonic()
+            metrics = self.transport.metrics
+            timed = metrics is not None and metrics.enabled
+            while self.in_flight:
+                acked, (data, first, last) = self.in_flight.popitem(last=False)
+                self.bytes_in_flight -= len(data)
+                self.acked += 1
+                if timed:
+                    metrics.record('ack', now - first)
+                if acked == seq:
+                    break
+            if first == last:
+                # Only never-resent commands give a clean RTT sample
+                self._sample_rtt(now - first)
+            self.failures = 0
+            self._cond.notify_all()
+
+    def wait_empty(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self.in_flight
+
+    def flush(self):
+        # Emergency stop: forget everything unacked. The device restarts its
+        # sequence at 1; acks still on their way refer to the old one.
+        with self._cond:
+            self.in_flight.clear()
+            self.bytes_in_flight = 0
+            self.seq = 0
+            self.last_ack = 0
+            self.duplicates = 0
+            self.failures = 0
+            self.resyncing = True
+            self._resync += 1
+            self._cond.notify_all()
+            io = self.transport.io
+            io.call(io.loop.call_later, RESYNC_TIMEOUT, self._check_resync, self._resync, 1)
+
+    def resume(self):
+        with self._cond:
+            self.resyncing = False
+            self.failures = 0
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _has_room(self, queued, size):
+        # Nothing goes out until the device has confirmed a stop
+        if self.resyncing:
+            return False
+        if len(self.in_flight) + queued >= self.size:
+            return False
+        # A single command always fits an empty window
+        if self.buffer is None or (not self.in_flight and not queued):
+            return True
+        return self.bytes_in_flight + size <= self.buffer
+
+    def _wait(self):
+        if self._closed or not self.transport.is_open:
+            raise TransportError("Transport is not open")
+        if self.failures > MAX_RETRIES:
+            raise TransportError("Device stopped acknowledging commands")
+        self._cond.wait(self.rto)
+
+    def _sample_rtt(self, rtt):
+        # RFC 6298 smoothing
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(MAX_RTO, max(MIN_RTO, self.srtt + 4 * self.rttvar))
+
+    def _start_timer(self):
+        # Under the lock; the timer runs while anything is in flight
+        if not self._timing:
+            self._timing = True
+            self.transport.io.call(self._check_timer)
+
+    def _check_timer(self):
+        # On the I/O loop: resend once the oldest command is overdue, then
+        # come back when the next one will be
+        with self._cond:
+            if self._closed or not self.in_flight:
+                self._timing = False
+                return
+            oldest = next(iter(self.in_flight.values()))
+            remaining = oldest[2] + self.rto - time.monotonic()
+            if remaining <= 0:
+                self._retransmit()
+                remaining = self.rto
+        self.transport.io.loop.call_later(remaining, self._check_timer)
+
+    def _check_resync(self, generation, attempt):
+        # On the I/O loop, RESYNC_TIMEOUT after the `attempt`th stop went
+        # out with no "stopped" back. The stop is sent again, which also
+        # resets the device's sequence; stopping twice is harmless, and
+        # nothing else has been sent since. Past RESYNC_ATTEMPTS senders get
+        # the same error as for a device that stopped acking.
+        with self._cond:
+            if generation != self._resync or not self.resyncing or self._closed:
+                return
+            if attempt >= RESYNC_ATTEMPTS:
+                self.failures = MAX_RETRIES + 1
+                self._cond.notify_all()
+                return
+            self.resyncs += 1
+            self._write_later(codec.encode_estop(self.transport.codec))
+        self.transport.io.loop.call_later(RESYNC_TIMEOUT, self._check_resync, generation, attempt + 1)
+
+    def _retransmit(self, backoff=True):
+        # Go-back-N: the device dropped everything after the gap
+        now = time.monotonic()
+        for entry in self.in_flight.values():
+            entry[2] = now
+        self.retransmits += len(self.in_flight)
+        # `duplicates` runs on until a new ack: the resend itself brings
+        # back a duplicate per command the device turns away, which must
+        # not set off another one
+        if backoff:
+            self.failures += 1
+            self.rto = min(MAX_RTO, self.rto * 2)
+        self._write_later(b''.join(e[0] for e in self.in_flight.values()))
+        self._cond.notify_all()
+
+    def _write_later(self, data):
+        # On the I/O loop: the write goes to the loop's executor, as it can
+        # block for as long as the device isn't reading
+        self.transport.io.loop.run_in_executor(None, self._write, data)
+
+    def _write(self, data):
+        try:
+            with self._sending:
+                self.transport.send_raw(data, 0)
+        except (TransportError, OSError):
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+
+
+class TcpTransport(Transport):
+    def __init__(self, host, port=CONTROLLER_PORT, timeout=3.0):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    async def _open_stream(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        await self._connect(socket.socket(family, socket.SOCK_STREAM), (self.host, self.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    async def _connect(self, sock, address):
+        # Non-blocking for the connect; blocking afterwards, for the sender
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(self.io.loop.sock_connect(sock, address), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            sock.close()
+            raise TransportError(f"Cannot reach {self.host}:{self.port} ({e or 'timed out'})")
+        except BaseException:
+            sock.close()
+            raise
+        sock.setblocking(True)
+        self.sock = sock
+
+    def _fileno(self):
+        return self.sock.fileno()
+
+    def _close_stream(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _write(self, data):
+        self.sock.sendall(data)
+
+    def _read(self, size):
+        return self.sock.recv(size, READ_FLAGS)
+
+
+class BluetoothTransport(TcpTransport):
+    # RFCOMM socket; needs a Python built with Bluetooth support (Linux/Android)
+    def __init__(self, address, channel=RFCOMM_CHANNEL, timeout=5.0):
+        super().__init__(address, channel, timeout)
+
+    async def _open_stream(self):
+        if not hasattr(socket, 'AF_BLUETOOTH'):
+            raise TransportError("Bluetooth sockets are not available on this platform")
+        sock = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+        await self._connect(sock, (self.host, self.port))
+
+
+class SerialTransport(Transport):
+    # Serial device such as /dev/rfcomm0, a USB cable or a pty
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.fd = None
+
+    async def _open_stream(self):
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY)
+        except OSError as e:
+            raise TransportError(f"Cannot open {self.path} ({e})")
+        if os.isatty(self.fd):
+            import tty
+            tty.setraw(self.fd)
+
+    def _fileno(self):
+        return self.fd
+
+    def _close_stream(self):
+        os.close(self.fd)
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+    def _read(self, size):
+        return os.read(self.fd, size)
+
+
+# --- Local stand-in device ---------------------------------------------------
+
+class LoopbackController:
+    # Minimal stand-in that speaks the firmware framing over TCP or a pty.
+    # Like the firmware it only answers connect and getStatus.
+    def __init__(self):
+        self.commands_received = 0
+        self.running = False
+        self.address = None
+        self._server = None
+        self._threads = []
+
+    def start_tcp(self, host='127.0.0.1', port=0):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(4)
+        self.address = self._server.getsockname()
+        self.running = True
+        self._spawn(self._accept_loop)
+        return self.address
+
+    def start_pty(self):
+        master, slave = os.openpty()
+        import tty
+        tty.setraw(slave)
+        self.address = os.ttyname(slave)
+        self.running = True
+        self._spawn(self._serve_fd, master, slave)
+        return self.address
+
+    def stop(self):
+        self.running = False
+        if self._server:
+            self._server.close()
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._spawn(self._serve, conn.recv, conn.sendall, conn.close)
+
+    def _serve_fd(self, master, slave):
+        def read(size):
+            ready, _, _ = select.select([master], [], [], 0.2)
+            return os.read(master, size) if ready else None
+
+        def write(data):
+            os.write(master, data)
+
+        def close():
+            os.close(master)
+            os.close(slave)
+
+        self._serve(read, write, close)
+
+    def _serve(self, read, write, close):
+        buffer = bytearray()
+        try:
+            while self.running:
+                data = read(READ_CHUNK)
+                if data is None:
+                    continue
+                if not data:
+                    break
+                buffer += data
+                replies = []
+                while True:
+                    end = buffer.find(FRAME_DELIMITER)
+                    if end < 0:
+                        break
+                    line = bytes(buffer[:end])
+                    del buffer[:end + 1]
+                    reply = self.handle_line(line)
+                    if reply is not None:
+                        replies.append(codec.encode_json(reply))
+                if replies:
+                    write(b''.join(replies))
+        except OSError:
+            pass
+        finally:
+            close()
+
+    def handle_line(self, line):
+        try:
+            command = json.loads(line)
+        except ValueError:
+            return None
+        self.commands_received += 1
+        action = command.get('action')
+        if action == 'connect':
+            return {"status": "connected", "device": "TriAxis_Motor_Hub", "version": "1.0"}
+        if action == 'getStatus':
+            return {"motorsEnabled": True, "emergencyStop": False,
+                    "received": self.commands_received}
+        return None
+
+
+def measure_throughput(transport, count=2000, pipelined=True):
+    # Commands per second for `count` moves, closed by a getStatus round trip
+    # so the figure includes the device actually reading everything
+    move = {"action": "move", "axis": "X", "steps": 10, "speed": 500}
+    start = time.perf_counter()
+    if pipelined:
+        transport.send_many([move] * count)
+    else:
+        # Wait for the device after every command, like a request/response link
+        for _ in range(count - 1):
+            transport.send(move)
+            transport.request({"action": "getStatus"})
+        transport.send(move)
+    transport.request({"action": "getStatus"})
+    elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+DELIVERY_MODES = ('fire-and-forget', 'stop-and-wait', 'ack window')
+
+
+def measure_delivery(commands, target, mode, encoding=codec.JSON_CODEC, time_scale=20.0, profile=None):
+    # Runs a path job on a simulated controller, by default over Bluetooth
+    # with a receive buffer that drops overflow: written all at once, one
+    # command per getStatus round trip, or through the ack window. Returns
+    # the virtual job time, the final position error and the link counters.
+    import simulator
+    controller = simulator.SimulatedController(profile or simulator.BLUETOOTH_SPP, codecs=(encoding,))
+    controller.execute({"action": "enable", "state": True})
+    server = simulator.SimulatorServer(controller, time_scale=time_scale)
+    host, port = server.start_tcp()
+    link = TcpTransport(host, port).open()
+    try:
+        reply = link.request({"action": "connect", "acks": mode == 'ack window',
+                              "codecs": [encoding]})
+        link.codec = encoding
+        if "window" in reply:
+            link.enable_acks(reply["window"], reply.get("buffer"))
+        start = controller.now
+        if mode == 'stop-and-wait':
+            for command in commands:
+                link.send(command)
+                link.request({"action": "getStatus"}, timeout=60.0)
+        else:
+            link.send_many(commands)
+        if link.window:
+            link.window.wait_empty()
+        # Lost bytes can leave a torn line in the device buffer, so wait for
+        # the motion to settle rather than for the buffer to empty
+        quiet = 0
+        while quiet < 5:
+            time.sleep(0.02)
+            settled = not controller.moving() and not any(l.arrivals for l in controller.links)
+            quiet = quiet + 1 if settled else 0
+        positions = controller.status()["positions"]
+        error = max(abs(positions[a] - target[i]) for i, a in enumerate(('X', 'Y', 'Z')))
+        return {"job_time": controller.now - start, "error": error,
+                "dropped": sum(l.bytes_dropped for l in controller.links),
+                "retransmits": link.window.retransmits if link.window else 0}
+    finally:
+        link.close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    for name in ('tcp', 'pty'):
+        device = LoopbackController()
+        if name == 'tcp':
+            host, port = device.start_tcp()
+            link = TcpTransport(host, port).open()
+        else:
+            link = SerialTransport(device.start_pty()).open()
+        link.request({"action": "connect"})
+        one_shot = measure_throughput(link, 500, pipelined=False)
+        pipelined = measure_throughput(link, 20000, pipelined=True)
+        print(f"{name}: one-at-a-time {one_shot:,.0f} cmd/s | pipelined {pipelined:,.0f} cmd/s")
+        link.close()
+        device.stop()
+
+    import planner
+    trajectory = planner.plan_pattern('spiral', 5000, 2000)
+    jobs = [("spiral job", list(trajectory.path_commands()),
+             [int(v) for v in trajectory.segments()[-1][:3]]),
+            ("500 jog steps", [{"action": "move", "axis": "X", "steps": 1, "speed": 2000}] * 500,
+             [500, 0, 0])]
+    print("Bluetooth SPP link with a 512 byte receive buffer:")
+    for name, commands, target in jobs:
+        for encoding in (codec.JSON_CODEC, codec.BINARY_CODEC):
+            for mode in DELIVERY_MODES:
+                result = measure_delivery(commands, target, mode, encoding)
+                print(f"  {name} {encoding:4} {mode:15}: {result['job_time']:6.2f} s virtual, "
+                      f"end error {result['error']:5d} steps, {result['dropped']:5d} bytes dropped, "
+                      f"{result['retransmits']} retransmits")
@@ -2,6 +2,8 @@
 #include <BluetoothSerial.h>
 #include <AccelStepper.h>
 #include <ArduinoJson.h>
+#include <LittleFS.h>
+#include "mbedtls/base64.h"
 
 // Motor pin definitions
 #define X_STEP_PIN 2
@@ -21,6 +23,75 @@
 // Status LED
 #define STATUS_LED_PIN 13
 
+// Command link: one persistent TCP client, newline-delimited JSON
+#define CONTROLLER_PORT 8080
+#define MAX_LINE_LENGTH 2048
+
+// Binary frames (codec "bin1"):
+// sync | version | type | seq u16 | length u16 | payload | crc16, little-endian
+#define FRAME_SYNC 0xA5
+#define FRAME_VERSION 1
+#define FRAME_HEADER_SIZE 7
+#define MAX_FRAME_PAYLOAD 1024
+#define FRAME_MOVE 0x01
+#define FRAME_MOVE_TO 0x02
+#define FRAME_SIGNATURE 0x03
+#define FRAME_STOP 0x04
+#define FRAME_STATUS 0x05
+#define FRAME_PLANNED_PATH 0x06
+#define FRAME_ESTOP 0x07
+#define FRAME_TABLE_DATA 0x08
+#define FRAME_JOG 0x09
+#define FRAME_JOG_KEEP 0x0A
+#define FRAME_STATUS_REPLY 0x85
+#define FRAME_ACK 0x86
+#define FRAME_STOPPED 0x87
+
+// Sequenced links (host sent "acks" in connect): only the next sequence
+// number runs, and every sequenced command is answered with an ack for the
+// newest one accepted, so the host can keep a window of them in flight and
+// resend after a loss. The BluetoothSerial RX queue drops what doesn't fit.
+#define RX_WINDOW 64
+#define BT_RX_BUFFER 512
+
+// Emergency stop: the app sends fixed bytes ({"action":"estop"} or an
+// ESTOP frame with seq 0). Incoming bytes are pulled into a per-link
+// backlog as soon as they arrive, even while a command is blocking, and
+// scanned for those bytes; a match halts at once and drops the backlog.
+// WiFi reports the backlog as its byte budget so a windowed host can't
+// fill it and leave the stop unread in the TCP stream.
+#define LINK_BACKLOG 4096
+#define ESTOP_FRAME_SIZE (FRAME_HEADER_SIZE + 2)
+const char ESTOP_JSON[] = "{\"action\":\"estop\"}\n";
+uint8_t estopFrame[ESTOP_FRAME_SIZE];
+
+// Host-planned path segments, run back-to-back. Look-ahead planned ones
+// ramp from their entry speed to feed and down to their exit speed.
+#define SEGMENT_QUEUE_SIZE 64
+#define PATH_ACCELERATION 1000.0
+#define MIN_FEED 20.0
+
+// Step tables (step_tables.py): a whole job compiled on the host into
+// the time between steps of each axis, in ticks of a hardware timer. The
+// upload goes to flash; once it is complete and its checksum matches,
+// loop() decodes each axis's stream into a ring of step intervals and the
+// timer interrupt only counts ticks and pulses the pins. Motion commands
+// are ignored while a table plays; stop and estop end it on the spot.
+#define TABLE_FILE "/job.stp"
+#define TABLE_TICK_HZ 50000
+#define TABLE_HEADER_SIZE 38
+#define TABLE_RING 256
+#define TABLE_REVERSE 0x80000000UL
+
+// Jogging (held buttons in the app): "jog" gives each axis a signed speed
+// and the axis heads for a far target at it with the usual ramps; 0 ramps
+// it down. While any axis is driven the app sends "jogKeep" every 100 ms;
+// a gap longer than JOG_TIMEOUT_MS ramps everything down, so a lost link
+// can't leave an axis running.
+#define JOG_TIMEOUT_MS 180
+#define JOG_REACH 1000000000L
+#define MAX_JOG_SPEED 2000
+
 // WiFi credentials
 const char* ssid = "TriAxis_Controller";
 const char* password = "APEX2024";
@@ -32,7 +103,26 @@ AccelStepper stepperZ(AccelStepper::DRIVER, Z_STEP_PIN, Z_DIR_PIN);
 
 // Bluetooth and WiFi objects
 BluetoothSerial SerialBT;
-WiFiServer server(80);
+WiFiServer server(CONTROLLER_PORT);
+WiFiClient wifiClient;
+
+// Receive state for one link: a JSON line or a binary frame in progress
+struct LinkBuffer {
+  String line;
+  uint8_t frame[FRAME_HEADER_SIZE + MAX_FRAME_PAYLOAD + 2];
+  int frameLength;
+  bool sequenced;
+  uint16_t lastAccepted;
+  uint8_t backlog[LINK_BACKLOG];
+  int backlogHead;
+  int backlogCount;
+  int jsonMatch;  // bytes of each stop pattern matched so far
+  int frameMatch;
+};
+LinkBuffer btLink;
+LinkBuffer wifiLink;
+void readCommandByte(int c, LinkBuffer& link, String source);
+bool stopRequested = false;  // set by a stop on any link; blocking loops bail out
 
 // System variables
 bool emergencyStop = false;
@@ -41,6 +131,62 @@ long motorPositions[3] = {0, 0, 0}; // X, Y, Z positions
 int motorSpeeds[3] = {1000, 1000, 1000}; // Default speeds
 bool motorsEnabled = false;
 
+struct Segment {
+  long x, y, z;
+  float feed; // steps/s along the path
+  float entrySpeed, exitSpeed;
+  float length; // from the end of the segment queued before it
+};
+struct TableAxis {
+  File stream;
+  uint32_t remaining;  // stream bytes not read yet
+  uint8_t buf[64];
+  int bufPos, bufLen;
+  uint32_t interval;   // ticks from the previous step
+  int direction;
+  uint32_t runLeft;    // steps still due at the current interval
+  int nudgeCode, nudgeLeft;
+  bool ended;          // END read; the ring holds the last steps
+  // Filled by loop(), emptied by the timer
+  volatile uint32_t ring[TABLE_RING];  // interval, TABLE_REVERSE set for reverse
+  volatile uint16_t ringHead, ringTail;
+  volatile uint32_t countdown;         // ticks to this axis's next step, 0 when done
+  volatile long position;
+  volatile bool starved;               // a step fell due before loop() decoded it
+};
+TableAxis tableAxes[3];
+int tableByte(TableAxis& axis);
+bool decodeTableStep(TableAxis& axis);
+const int stepPins[3] = {X_STEP_PIN, Y_STEP_PIN, Z_STEP_PIN};
+const int dirPins[3] = {X_DIR_PIN, Y_DIR_PIN, Z_DIR_PIN};
+const int limitPins[3] = {X_LIMIT_PIN, Y_LIMIT_PIN, Z_LIMIT_PIN};
+File tableFile;
+uint32_t tableSize = 0;
+uint32_t tableWritten = 0;
+bool tableLoading = false;
+volatile bool tablePlaying = false;
+volatile uint32_t stepPinsHigh = 0;
+hw_timer_t* tableTimer = NULL;
+
+Segment segmentQueue[SEGMENT_QUEUE_SIZE];
+int segmentHead = 0;
+int segmentCount = 0;
+bool segmentActive = false;
+Segment currentSegment;
+long segmentStart[3];
+long segmentDelta[3];
+float segmentLength = 0;
+int segmentMainAxis = 0;
+long segmentProgress = -1;
+float segmentSpeed = 0;       // path speed set by the last update
+float segmentTravelled = 0;   // distance along the segment at that update
+float queueEntryLimit = 0;    // fastest the queue can be entered and still stop at its end
+
+uint8_t jogDriving = 0;     // axes with a nonzero jog speed, one bit each
+uint8_t jogAxes = 0;        // axes jogging or ramping down from a jog
+float jogRestSpeed[3];      // max speed to go back to once a jogged axis stops
+unsigned long jogKeptAt = 0;
+
 void setup() {
   Serial.begin(115200);
   
@@ -64,6 +210,11 @@ void setup() {
   stepperZ.setMaxSpeed(2000);
   stepperZ.setAcceleration(1000);
   
+  // Flash file system for uploaded step tables
+  if (!LittleFS.begin(true)) {
+    Serial.println("LittleFS mount failed; step tables unavailable");
+  }
+  
   // Initialize Bluetooth
   SerialBT.begin("TriAxis_Motor_Hub");
   Serial.println("Bluetooth initialized: TriAxis_Motor_Hub");
@@ -71,9 +222,18 @@ void setup() {
   // Initialize WiFi Access Point
   WiFi.softAP(ssid, password);
   server.begin();
+  server.setNoDelay(true);
   Serial.println("WiFi AP started: " + String(ssid));
   Serial.println("IP Address: " + WiFi.softAPIP().toString());
   
+  // The binary stop is a header-only frame; its CRC never changes
+  estopFrame[0] = FRAME_SYNC;
+  estopFrame[1] = FRAME_VERSION;
+  estopFrame[2] = FRAME_ESTOP;
+  writeU16(estopFrame + 3, 0);
+  writeU16(estopFrame + 5, 0);
+  writeU16(estopFrame + FRAME_HEADER_SIZE, crc16(estopFrame, FRAME_HEADER_SIZE));
+  
   // Startup sequence
   blinkStatusLED(3);
   Serial.println("TriAxis Controller Ready - APEX PRECISION MECHATRONIX");
@@ -87,31 +247,36 @@ void loop() {
     Serial.println("EMERGENCY STOP ACTIVATED!");
   }
   
-  // Handle Bluetooth communication
-  if (SerialBT.available()) {
-    String command = SerialBT.readString();
-    processCommand(command, "BT");
-  }
-  
-  // Handle WiFi communication
-  WiFiClient client = server.available();
-  if (client) {
-    String request = "";
-    while (client.connected() && client.available()) {
-      request += client.readString();
+  // Handle WiFi communication: keep the client open between commands
+  if (!wifiClient || !wifiClient.connected()) {
+    WiFiClient incoming = server.available();
+    if (incoming) {
+      wifiClient = incoming;
+      wifiClient.setNoDelay(true);
+      resetLink(wifiLink);
+      wifiLink.sequenced = false;
+      wifiLink.lastAccepted = 0;
     }
-    if (request.length() > 0) {
-      processCommand(request, "WiFi");
-      sendWiFiResponse(client);
-    }
-    client.stop();
   }
   
+  // Handle Bluetooth and WiFi communication
+  pollLinks();
+  drainBacklog(btLink, "BT");
+  drainBacklog(wifiLink, "WiFi");
+  
+  checkJog();
+  
   // Run motors if enabled and not in emergency stop
   if (motorsEnabled && !emergencyStop) {
-    stepperX.run();
-    stepperY.run();
-    stepperZ.run();
+    if (tablePlaying) {
+      refillTable();
+    } else if (segmentActive || segmentCount > 0) {
+      runSegments();
+    } else {
+      stepperX.run();
+      stepperY.run();
+      stepperZ.run();
+    }
     digitalWrite(STATUS_LED_PIN, HIGH);
   } else {
     digitalWrite(STATUS_LED_PIN, LOW);
@@ -120,7 +285,268 @@ void loop() {
   // Check limit switches
   checkLimitSwitches();
   
-  delay(1);
+  // Axes only step from the run() calls above, at most one step per call,
+  // so a pass that sleeps caps every axis at 1000 steps/s; only rest idle
+  if (!motionActive()) {
+    delay(1);
+  }
+}
+
+void pollLinks() {
+  // Called from loop() and from every blocking wait, so a stop is seen
+  // however long the current command takes
+  while (SerialBT.available()) {
+    pullByte(SerialBT.read(), btLink, "BT");
+  }
+  while (wifiClient && wifiClient.available() && wifiLink.backlogCount < LINK_BACKLOG) {
+    pullByte(wifiClient.read(), wifiLink, "WiFi");
+  }
+}
+
+void pullByte(int c, LinkBuffer& link, String source) {
+  link.jsonMatch = c == ESTOP_JSON[link.jsonMatch] ? link.jsonMatch + 1 : (c == ESTOP_JSON[0] ? 1 : 0);
+  link.frameMatch = c == estopFrame[link.frameMatch] ? link.frameMatch + 1 : (c == estopFrame[0] ? 1 : 0);
+  if (link.jsonMatch == (int)strlen(ESTOP_JSON)) {
+    emergencyHalt(link, source, false);
+    return;
+  }
+  if (link.frameMatch == ESTOP_FRAME_SIZE) {
+    emergencyHalt(link, source, true);
+    return;
+  }
+  // A full Bluetooth backlog loses the byte, as the RX queue would; a
+  // sequenced host resends it
+  if (link.backlogCount < LINK_BACKLOG) {
+    link.backlog[(link.backlogHead + link.backlogCount) % LINK_BACKLOG] = c;
+    link.backlogCount++;
+  }
+}
+
+void drainBacklog(LinkBuffer& link, String source) {
+  // A halt in the middle empties the backlog, which ends this loop
+  while (link.backlogCount > 0) {
+    int c = link.backlog[link.backlogHead];
+    link.backlogHead = (link.backlogHead + 1) % LINK_BACKLOG;
+    link.backlogCount--;
+    readCommandByte(c, link, source);
+  }
+}
+
+void resetLink(LinkBuffer& link) {
+  link.line = "";
+  link.frameLength = 0;
+  link.backlogHead = 0;
+  link.backlogCount = 0;
+  link.jsonMatch = 0;
+  link.frameMatch = 0;
+}
+
+void emergencyHalt(LinkBuffer& link, String source, bool binary) {
+  // Stop dead where we are, forget queued motion and whatever arrived
+  // ahead of the stop, and confirm. Unlike the button nothing latches.
+  stopTable();
+  clearSegments();
+  jogDriving = 0;
+  stepperX.setCurrentPosition(stepperX.currentPosition());
+  stepperY.setCurrentPosition(stepperY.currentPosition());
+  stepperZ.setCurrentPosition(stepperZ.currentPosition());
+  resetLink(link);
+  link.lastAccepted = 0;
+  stopRequested = true;
+  if (binary) {
+    sendFrame(source, FRAME_STOPPED, 0, NULL, 0);
+  } else {
+    sendReply(source, "{\"stopped\":true}");
+  }
+  Serial.println("Emergency stop via " + source);
+}
+
+bool haltRequested() {
+  // Check for blocking loops: hardware button or a stop from the app
+  pollLinks();
+  return stopRequested || digitalRead(EMERGENCY_STOP_PIN) == LOW;
+}
+
+void readCommandByte(int c, LinkBuffer& link, String source) {
+  // A sync byte opens a binary frame. JSON is plain ASCII, so one in the
+  // middle of a line means the line was torn by lost bytes.
+  if (link.frameLength > 0 || c == FRAME_SYNC) {
+    if (link.frameLength == 0) {
+      link.line = "";
+    }
+    link.frame[link.frameLength++] = c;
+    if (link.frameLength >= FRAME_HEADER_SIZE) {
+      int payloadLength = link.frame[5] | (link.frame[6] << 8);
+      if (payloadLength > MAX_FRAME_PAYLOAD) {
+        link.frameLength = 0;
+      } else if (link.frameLength == FRAME_HEADER_SIZE + payloadLength + 2) {
+        processFrame(link.frame, link.frameLength, source);
+        link.frameLength = 0;
+      }
+    }
+    return;
+  }
+  
+  if (c == '\n') {
+    if (link.line.length() > 0) {
+      processCommand(link.line, source);
+    }
+    link.line = "";
+  } else if (c != '\r' && link.line.length() < MAX_LINE_LENGTH) {
+    link.line += (char)c;
+  }
+}
+
+uint16_t crc16(const uint8_t* data, int length) {
+  // CRC-16/CCITT-FALSE
+  return crc16Update(0xFFFF, data, length);
+}
+
+uint16_t crc16Update(uint16_t crc, const uint8_t* data, int length) {
+  for (int i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+uint16_t readU16(const uint8_t* p) {
+  return p[0] | (p[1] << 8);
+}
+
+int32_t readI32(const uint8_t* p) {
+  return (int32_t)((uint32_t)p[0] | ((uint32_t)p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24));
+}
+
+void writeU16(uint8_t* p, uint16_t value) {
+  p[0] = value & 0xFF;
+  p[1] = value >> 8;
+}
+
+void writeI32(uint8_t* p, int32_t value) {
+  for (int i = 0; i < 4; i++) {
+    p[i] = ((uint32_t)value >> (8 * i)) & 0xFF;
+  }
+}
+
+void processFrame(const uint8_t* frame, int length, String source) {
+  int payloadLength = readU16(frame + 5);
+  if (frame[1] != FRAME_VERSION || readU16(frame + length - 2) != crc16(frame, length - 2)) {
+    Serial.println("Binary frame rejected");
+    return;
+  }
+  
+  uint8_t type = frame[2];
+  uint16_t seq = readU16(frame + 3);
+  const uint8_t* payload = frame + FRAME_HEADER_SIZE;
+  if (!acceptSequence(source, seq, true)) return;
+  stopRequested = false;
+  
+  if (type == FRAME_MOVE && payloadLength == 7) {
+    const char* axes[] = {"X", "Y", "Z"};
+    if (payload[0] < 3) {
+      moveAxis(axes[payload[0]], readI32(payload + 1), readU16(payload + 5));
+    }
+  }
+  else if (type == FRAME_MOVE_TO) {
+    int count = readU16(payload);
+    if (motionLocked() || payloadLength != 2 + count * 14) return;
+    for (int i = 0; i < count; i++) {
+      const uint8_t* entry = payload + 2 + i * 14;
+      float feed = readU16(entry + 12);
+      if (!queueSegment(readI32(entry), readI32(entry + 4), readI32(entry + 8), feed, feed, feed)) return;
+    }
+  }
+  else if (type == FRAME_PLANNED_PATH) {
+    int count = readU16(payload);
+    if (motionLocked() || payloadLength != 2 + count * 18) return;
+    for (int i = 0; i < count; i++) {
+      const uint8_t* entry = payload + 2 + i * 18;
+      if (!queueSegment(readI32(entry), readI32(entry + 4), readI32(entry + 8), readU16(entry + 12),
+                        readU16(entry + 14), readU16(entry + 16))) return;
+    }
+  }
+  else if (type == FRAME_SIGNATURE) {
+    const char* styles[] = {"normal", "embossed", "calligraphy"};
+    int count = readU16(payload + 1);
+    if (motionLocked() || payload[0] > 2 || payloadLength != 3 + count * 12) return;
+    for (int i = 0; i < count; i++) {
+      const uint8_t* entry = payload + 3 + i * 12;
+      if (!runSignaturePoint(readI32(entry), readI32(entry + 4), readI32(entry + 8), styles[payload[0]])) return;
+    }
+  }
+  else if (type == FRAME_TABLE_DATA && payloadLength >= 4) {
+    writeTableChunk((uint32_t)readI32(payload), payload + 4, payloadLength - 4);
+  }
+  else if (type == FRAME_STOP) {
+    handleStop();
+  }
+  else if (type == FRAME_JOG && payloadLength == 6) {
+    long velocity[3];
+    for (int i = 0; i < 3; i++) {
+      velocity[i] = (int16_t)readU16(payload + 2 * i);
+    }
+    jog(velocity);
+  }
+  else if (type == FRAME_JOG_KEEP) {
+    handleJogKeep();
+  }
+  else if (type == FRAME_STATUS) {
+    sendStatusFrame(source, seq);
+  }
+}
+
+void sendFrame(String source, uint8_t type, uint16_t seq, const uint8_t* payload, int payloadLength) {
+  uint8_t frame[FRAME_HEADER_SIZE + 64 + 2];
+  frame[0] = FRAME_SYNC;
+  frame[1] = FRAME_VERSION;
+  frame[2] = type;
+  writeU16(frame + 3, seq);
+  writeU16(frame + 5, payloadLength);
+  memcpy(frame + FRAME_HEADER_SIZE, payload, payloadLength);
+  int length = FRAME_HEADER_SIZE + payloadLength;
+  writeU16(frame + length, crc16(frame, length));
+  length += 2;
+  
+  if (source == "BT") {
+    SerialBT.write(frame, length);
+  } else if (wifiClient && wifiClient.connected()) {
+    wifiClient.write(frame, length);
+  }
+}
+
+LinkBuffer& linkFor(String source) {
+  return source == "BT" ? btLink : wifiLink;
+}
+
+bool acceptSequence(String source, uint16_t seq, bool binary) {
+  // Sequence number 0 (or none) is outside the window and always runs
+  LinkBuffer& link = linkFor(source);
+  if (!link.sequenced || seq == 0) return true;
+  uint16_t expected = link.lastAccepted == 0xFFFF ? 1 : link.lastAccepted + 1;
+  bool accepted = seq == expected;
+  if (accepted) {
+    link.lastAccepted = seq;
+  }
+  // Acked before running, so the host refills the window while we work
+  if (binary) {
+    uint8_t payload[2];
+    writeU16(payload, link.lastAccepted);
+    sendFrame(source, FRAME_ACK, link.lastAccepted, payload, 2);
+  } else {
+    sendReply(source, "{\"ack\":" + String(link.lastAccepted) + "}");
+  }
+  return accepted;
+}
+
+void sendReply(String source, String output) {
+  if (source == "BT") {
+    SerialBT.println(output);
+  } else if (wifiClient && wifiClient.connected()) {
+    wifiClient.println(output);
+  }
 }
 
 void processCommand(String command, String source) {
@@ -132,10 +558,13 @@ void processCommand(String command, String source) {
     return;
   }
   
+  if (!acceptSequence(source, doc["seq"] | 0, false)) return;
+  stopRequested = false;
+  
   String action = doc["action"];
   
   if (action == "connect") {
-    handleConnect(source);
+    handleConnect(doc, source);
   }
   else if (action == "move") {
     handleMove(doc);
@@ -149,6 +578,12 @@ void processCommand(String command, String source) {
   else if (action == "stop") {
     handleStop();
   }
+  else if (action == "jog") {
+    handleJog(doc);
+  }
+  else if (action == "jogKeep") {
+    handleJogKeep();
+  }
   else if (action == "enable") {
     handleEnable(doc["state"]);
   }
@@ -161,31 +596,57 @@ void processCommand(String command, String source) {
   else if (action == "signature") {
     handleSignature(doc);
   }
+  else if (action == "path") {
+    handlePath(doc);
+  }
+  else if (action == "tableLoad") {
+    handleTableLoad(doc);
+  }
+  else if (action == "table") {
+    handleTableChunk(doc);
+  }
+  else if (action == "tableRun") {
+    handleTableRun();
+  }
 }
 
-void handleConnect(String source) {
+void handleConnect(DynamicJsonDocument& doc, String source) {
   DynamicJsonDocument response(512);
   response["status"] = "connected";
   response["device"] = "TriAxis_Motor_Hub";
   response["company"] = "APEX PRECISION MECHATRONIX PVT. LTD.";
   response["version"] = "1.0";
   response["connection"] = source;
+  JsonArray codecs = response.createNestedArray("codecs");
+  codecs.add("json");
+  codecs.add("bin1");
+  
+  LinkBuffer& link = linkFor(source);
+  link.sequenced = doc["acks"] | false;
+  link.lastAccepted = 0;
+  if (link.sequenced) {
+    response["window"] = RX_WINDOW;
+    // Bluetooth drops what its RX queue can't hold; WiFi must leave room
+    // in the backlog for a stop
+    response["buffer"] = source == "BT" ? BT_RX_BUFFER : LINK_BACKLOG;
+  }
   
   String output;
   serializeJson(response, output);
   
-  if (source == "BT") {
-    SerialBT.println(output);
-  }
+  sendReply(source, output);
   Serial.println("Connected via " + source);
 }
 
 void handleMove(DynamicJsonDocument& doc) {
-  if (emergencyStop) return;
-  
   String axis = doc["axis"];
   long steps = doc["steps"];
   int speed = doc["speed"] | 1000;
+  moveAxis(axis, steps, speed);
+}
+
+void moveAxis(String axis, long steps, int speed) {
+  if (motionLocked()) return;
   
   AccelStepper* motor = getMotor(axis);
   if (motor) {
@@ -208,9 +669,12 @@ void handleSetSpeed(DynamicJsonDocument& doc) {
   
   AccelStepper* motor = getMotor(axis);
   if (motor) {
-    motor->setMaxSpeed(speed);
-    
     int axisIndex = getAxisIndex(axis);
+    if (axisIndex >= 0 && (jogAxes & (1 << axisIndex))) {
+      jogRestSpeed[axisIndex] = speed;  // once the jog is over
+    } else {
+      motor->setMaxSpeed(speed);
+    }
     if (axisIndex >= 0) {
       motorSpeeds[axisIndex] = speed;
     }
@@ -219,8 +683,63 @@ void handleSetSpeed(DynamicJsonDocument& doc) {
   }
 }
 
+void handleJog(DynamicJsonDocument& doc) {
+  JsonArray v = doc["v"];
+  long velocity[3] = {v[0] | 0L, v[1] | 0L, v[2] | 0L};
+  jog(velocity);
+}
+
+void jog(const long velocity[3]) {
+  if (motionLocked() || segmentActive || segmentCount > 0) return;
+  
+  AccelStepper* motors[] = {&stepperX, &stepperY, &stepperZ};
+  for (int i = 0; i < 3; i++) {
+    uint8_t bit = 1 << i;
+    long speed = constrain(velocity[i], -MAX_JOG_SPEED, MAX_JOG_SPEED);
+    if (speed != 0) {
+      if (!(jogAxes & bit)) {
+        jogRestSpeed[i] = motors[i]->maxSpeed();
+        jogAxes |= bit;
+      }
+      motors[i]->setMaxSpeed(abs(speed));
+      motors[i]->moveTo(motors[i]->currentPosition() + (speed > 0 ? JOG_REACH : -JOG_REACH));
+      jogDriving |= bit;
+    } else if (jogDriving & bit) {
+      motors[i]->stop();
+      jogDriving &= ~bit;
+    }
+  }
+  jogKeptAt = millis();
+}
+
+void handleJogKeep() {
+  if (jogDriving) {
+    jogKeptAt = millis();
+  }
+}
+
+void checkJog() {
+  AccelStepper* motors[] = {&stepperX, &stepperY, &stepperZ};
+  // Deadman: a held jog with no frame for JOG_TIMEOUT_MS ramps down
+  if (jogDriving && millis() - jogKeptAt > JOG_TIMEOUT_MS) {
+    for (int i = 0; i < 3; i++) {
+      if (jogDriving & (1 << i)) motors[i]->stop();
+    }
+    jogDriving = 0;
+    Serial.println("Jog keepalive missed, stopping");
+  }
+  // Back to the set speed once a jogged axis is at rest
+  for (int i = 0; i < 3; i++) {
+    uint8_t bit = 1 << i;
+    if ((jogAxes & bit) && !(jogDriving & bit) && !motors[i]->isRunning()) {
+      motors[i]->setMaxSpeed(jogRestSpeed[i]);
+      jogAxes &= ~bit;
+    }
+  }
+}
+
 void handleHome() {
-  if (emergencyStop) return;
+  if (motionLocked()) return;
   
   Serial.println("Homing all axes...");
   
@@ -237,8 +756,9 @@ void handleHome() {
     if (digitalRead(Y_LIMIT_PIN) == HIGH) stepperY.runSpeed();
     if (digitalRead(Z_LIMIT_PIN) == HIGH) stepperZ.runSpeed();
     
-    if (digitalRead(EMERGENCY_STOP_PIN) == LOW) break;
+    if (haltRequested()) break;
   }
+  if (stopRequested) return;  // not at the switches, so not home
   
   // Set current position as zero
   stepperX.setCurrentPosition(0);
@@ -251,6 +771,10 @@ void handleHome() {
 }
 
 void handleStop() {
+  // A table has no ramp down to follow, so it stops on the spot
+  stopTable();
+  clearSegments();
+  jogDriving = 0;
   stepperX.stop();
   stepperY.stop();
   stepperZ.stop();
@@ -269,7 +793,7 @@ void handleEnable(bool state) {
 }
 
 void handlePattern(DynamicJsonDocument& doc) {
-  if (emergencyStop) return;
+  if (motionLocked()) return;
   
   String patternType = doc["type"];
   int radius = doc["radius"] | 100;
@@ -289,7 +813,7 @@ void handlePattern(DynamicJsonDocument& doc) {
 }
 
 void handleSignature(DynamicJsonDocument& doc) {
-  if (emergencyStop) return;
+  if (motionLocked()) return;
   
   JsonArray points = doc["points"];
   String style = doc["style"] | "normal";
@@ -300,25 +824,166 @@ void handleSignature(DynamicJsonDocument& doc) {
     float x = point["x"];
     float y = point["y"];
     float z = point["z"] | 0;
-    
-    // Apply style modifications
-    if (style == "embossed") {
-      z = (sin(x * 0.1) * 20);
-    } else if (style == "calligraphy") {
-      z = abs(x - stepperX.currentPosition()) * 0.1;
-    }
-    
-    stepperX.moveTo(x);
-    stepperY.moveTo(y);
-    stepperZ.moveTo(z);
-    
-    while (stepperX.isRunning() || stepperY.isRunning() || stepperZ.isRunning()) {
-      stepperX.run();
-      stepperY.run();
-      stepperZ.run();
-      if (digitalRead(EMERGENCY_STOP_PIN) == LOW) break;
+    if (!runSignaturePoint(x, y, z, style)) return;
+  }
+}
+
+bool runSignaturePoint(float x, float y, float z, String style) {
+  // Apply style modifications
+  if (style == "embossed") {
+    z = (sin(x * 0.1) * 20);
+  } else if (style == "calligraphy") {
+    z = abs(x - stepperX.currentPosition()) * 0.1;
+  }
+  
+  stepperX.moveTo(x);
+  stepperY.moveTo(y);
+  stepperZ.moveTo(z);
+  
+  while (stepperX.isRunning() || stepperY.isRunning() || stepperZ.isRunning()) {
+    stepperX.run();
+    stepperY.run();
+    stepperZ.run();
+    if (haltRequested()) return false;
+  }
+  return true;
+}
+
+void handlePath(DynamicJsonDocument& doc) {
+  if (motionLocked()) return;
+  
+  // Each entry is [x, y, z, feed] or, when planned, [x, y, z, feed, entry, exit]
+  JsonArray segments = doc["seg"];
+  for (JsonVariant entry : segments) {
+    JsonArray s = entry.as<JsonArray>();
+    if (s.size() < 3) continue;
+    float feed = s[3] | 500.0f;
+    if (!queueSegment(s[0], s[1], s[2], feed, s[4] | feed, s[5] | feed)) return;
+  }
+}
+
+bool queueSegment(long x, long y, long z, float feed, float entrySpeed, float exitSpeed) {
+  while (segmentCount >= SEGMENT_QUEUE_SIZE) {
+    // Queue full: keep the motors going until a slot frees up
+    runSegments();
+    if (haltRequested() || !motorsEnabled) return false;
+  }
+  // Where the machine will be when this segment starts
+  long from[3] = {stepperX.targetPosition(), stepperY.targetPosition(), stepperZ.targetPosition()};
+  if (segmentCount > 0) {
+    Segment& last = segmentQueue[(segmentHead + segmentCount - 1) % SEGMENT_QUEUE_SIZE];
+    from[0] = last.x;
+    from[1] = last.y;
+    from[2] = last.z;
+  }
+  int slot = (segmentHead + segmentCount) % SEGMENT_QUEUE_SIZE;
+  segmentQueue[slot].length = sqrt((float)(x - from[0]) * (x - from[0]) + (float)(y - from[1]) * (y - from[1]) +
+                                   (float)(z - from[2]) * (z - from[2]));
+  segmentQueue[slot].x = x;
+  segmentQueue[slot].y = y;
+  segmentQueue[slot].z = z;
+  segmentQueue[slot].feed = feed;
+  segmentQueue[slot].entrySpeed = entrySpeed;
+  segmentQueue[slot].exitSpeed = exitSpeed;
+  segmentCount++;
+  replanQueue();
+  return true;
+}
+
+void replanQueue() {
+  // The host plans exit speeds into rows it hasn't sent yet, and the
+  // stream can stall after any row. Backwards from the end of the queue,
+  // the fastest each segment may be left so the machine can still stop by
+  // the last one's end; the running segment ramps down to this in time
+  float entry2 = 0;
+  for (int k = segmentCount - 1; k >= 0; k--) {
+    Segment& s = segmentQueue[(segmentHead + k) % SEGMENT_QUEUE_SIZE];
+    float exit = min(s.exitSpeed, (float)sqrt(entry2));
+    entry2 = exit * exit + 2 * PATH_ACCELERATION * s.length;
+  }
+  queueEntryLimit = sqrt(entry2);
+}
+
+void startNextSegment() {
+  currentSegment = segmentQueue[segmentHead];
+  segmentHead = (segmentHead + 1) % SEGMENT_QUEUE_SIZE;
+  segmentCount--;
+  replanQueue();
+  
+  segmentStart[0] = stepperX.currentPosition();
+  segmentStart[1] = stepperY.currentPosition();
+  segmentStart[2] = stepperZ.currentPosition();
+  segmentDelta[0] = currentSegment.x - segmentStart[0];
+  segmentDelta[1] = currentSegment.y - segmentStart[1];
+  segmentDelta[2] = currentSegment.z - segmentStart[2];
+  segmentLength = sqrt((float)segmentDelta[0] * segmentDelta[0] + (float)segmentDelta[1] * segmentDelta[1] +
+                       (float)segmentDelta[2] * segmentDelta[2]);
+  if (segmentLength == 0 || currentSegment.feed <= 0) return;
+  
+  // Progress along the segment is read off the axis with the most steps
+  segmentMainAxis = 0;
+  for (int i = 1; i < 3; i++) {
+    if (abs(segmentDelta[i]) > abs(segmentDelta[segmentMainAxis])) segmentMainAxis = i;
+  }
+  segmentProgress = -1;
+  segmentTravelled = 0;
+  stepperX.moveTo(currentSegment.x);
+  stepperY.moveTo(currentSegment.y);
+  stepperZ.moveTo(currentSegment.z);
+  segmentActive = true;
+  updateSegmentSpeed();
+}
+
+void updateSegmentSpeed() {
+  // Recompute the path speed only after the leading axis has stepped
+  AccelStepper* steppers[] = {&stepperX, &stepperY, &stepperZ};
+  long progress = abs(steppers[segmentMainAxis]->currentPosition() - segmentStart[segmentMainAxis]);
+  if (progress == segmentProgress) return;
+  segmentProgress = progress;
+  
+  float travelled = segmentLength * progress / abs(segmentDelta[segmentMainAxis]);
+  // No faster than the queue behind it allows: a stalled stream ramps
+  // down to stop at the end of what arrived rather than halt dead there
+  float exitSpeed = min(currentSegment.exitSpeed, queueEntryLimit);
+  float speed = currentSegment.feed;
+  speed = min(speed, sqrt(currentSegment.entrySpeed * currentSegment.entrySpeed + 2 * PATH_ACCELERATION * travelled));
+  // Speed up only from the speed actually reached, which such a ramp may
+  // have left below the plan
+  speed = min(speed, sqrt(segmentSpeed * segmentSpeed +
+                          2 * PATH_ACCELERATION * max(travelled - segmentTravelled, 0.0f)));
+  speed = min(speed, sqrt(exitSpeed * exitSpeed + 2 * PATH_ACCELERATION * max(segmentLength - travelled, 0.0f)));
+  speed = max(speed, (float)MIN_FEED);
+  segmentSpeed = speed;
+  segmentTravelled = travelled;
+  
+  // Scale each axis so all three arrive together
+  for (int i = 0; i < 3; i++) {
+    steppers[i]->setSpeed(segmentDelta[i] * speed / segmentLength);
+  }
+}
+
+void runSegments() {
+  if (segmentActive) {
+    updateSegmentSpeed();
+    stepperX.runSpeedToPosition();
+    stepperY.runSpeedToPosition();
+    stepperZ.runSpeedToPosition();
+    if (stepperX.distanceToGo() == 0 && stepperY.distanceToGo() == 0 && stepperZ.distanceToGo() == 0) {
+      segmentActive = false;
+      if (segmentCount == 0) segmentSpeed = 0;
     }
   }
+  if (!segmentActive && segmentCount > 0) {
+    startNextSegment();
+  }
+}
+
+void clearSegments() {
+  segmentHead = 0;
+  segmentCount = 0;
+  segmentActive = false;
+  segmentSpeed = 0;
+  queueEntryLimit = 0;
 }
 
 void executeCirclePattern(int radius, int speed) {
@@ -332,7 +997,7 @@ void executeCirclePattern(int radius, int speed) {
     while (stepperX.isRunning() || stepperY.isRunning()) {
       stepperX.run();
       stepperY.run();
-      if (digitalRead(EMERGENCY_STOP_PIN) == LOW) return;
+      if (haltRequested()) return;
     }
   }
 }
@@ -347,7 +1012,7 @@ void executeSquarePattern(int size, int speed) {
     while (stepperX.isRunning() || stepperY.isRunning()) {
       stepperX.run();
       stepperY.run();
-      if (digitalRead(EMERGENCY_STOP_PIN) == LOW) return;
+      if (haltRequested()) return;
     }
   }
 }
@@ -364,7 +1029,7 @@ void executeSpiralPattern(int maxRadius, int speed) {
     while (stepperX.isRunning() || stepperY.isRunning()) {
       stepperX.run();
       stepperY.run();
-      if (digitalRead(EMERGENCY_STOP_PIN) == LOW) return;
+      if (haltRequested()) return;
     }
   }
 }
@@ -373,37 +1038,300 @@ void sendStatus(String source) {
   DynamicJsonDocument status(1024);
   status["motorsEnabled"] = motorsEnabled;
   status["emergencyStop"] = emergencyStop;
-  status["positions"]["X"] = stepperX.currentPosition();
-  status["positions"]["Y"] = stepperY.currentPosition();
-  status["positions"]["Z"] = stepperZ.currentPosition();
+  status["positions"]["X"] = axisPosition(0);
+  status["positions"]["Y"] = axisPosition(1);
+  status["positions"]["Z"] = axisPosition(2);
   status["speeds"]["X"] = motorSpeeds[0];
   status["speeds"]["Y"] = motorSpeeds[1];
   status["speeds"]["Z"] = motorSpeeds[2];
   status["limits"]["X"] = digitalRead(X_LIMIT_PIN);
   status["limits"]["Y"] = digitalRead(Y_LIMIT_PIN);
   status["limits"]["Z"] = digitalRead(Z_LIMIT_PIN);
+  status["queueFree"] = SEGMENT_QUEUE_SIZE - segmentCount;
   
   String output;
   serializeJson(status, output);
   
-  if (source == "BT") {
-    SerialBT.println(output);
+  sendReply(source, output);
+}
+
+void sendStatusFrame(String source, uint16_t seq) {
+  // Same fields as sendStatus, packed: flags, positions, speeds, limits, queue
+  uint8_t payload[21];
+  payload[0] = (motorsEnabled ? 1 : 0) | (emergencyStop ? 2 : 0);
+  writeI32(payload + 1, axisPosition(0));
+  writeI32(payload + 5, axisPosition(1));
+  writeI32(payload + 9, axisPosition(2));
+  writeU16(payload + 13, motorSpeeds[0]);
+  writeU16(payload + 15, motorSpeeds[1]);
+  writeU16(payload + 17, motorSpeeds[2]);
+  payload[19] = digitalRead(X_LIMIT_PIN) | (digitalRead(Y_LIMIT_PIN) << 1) | (digitalRead(Z_LIMIT_PIN) << 2);
+  payload[20] = SEGMENT_QUEUE_SIZE - segmentCount;
+  sendFrame(source, FRAME_STATUS_REPLY, seq, payload, sizeof(payload));
+}
+
+bool motionLocked() {
+  return emergencyStop || tablePlaying;
+}
+
+bool motionActive() {
+  // Anything loop() has to keep stepping or feeding; a held jog counts
+  // even between keepalives, so its steps never wait on the idle delay
+  return tablePlaying || segmentActive || segmentCount > 0 || jogDriving ||
+         stepperX.isRunning() || stepperY.isRunning() || stepperZ.isRunning();
+}
+
+long axisPosition(int axis) {
+  // The timer keeps the count while a table plays
+  if (tablePlaying) return tableAxes[axis].position;
+  AccelStepper* steppers[] = {&stepperX, &stepperY, &stepperZ};
+  return steppers[axis]->currentPosition();
+}
+
+void handleTableLoad(DynamicJsonDocument& doc) {
+  if (tablePlaying) return;
+  if (tableFile) tableFile.close();
+  tableFile = LittleFS.open(TABLE_FILE, "w");
+  tableSize = doc["size"] | 0;
+  tableWritten = 0;
+  tableLoading = (bool)tableFile;
+  if (!tableLoading) Serial.println("Cannot open " TABLE_FILE);
+}
+
+void handleTableChunk(DynamicJsonDocument& doc) {
+  const char* text = doc["data"] | "";
+  uint8_t data[MAX_FRAME_PAYLOAD];
+  size_t length = 0;
+  if (mbedtls_base64_decode(data, sizeof(data), &length, (const unsigned char*)text, strlen(text)) != 0) {
+    tableLoading = false;
+    return;
+  }
+  writeTableChunk(doc["offset"] | 0, data, length);
+}
+
+void writeTableChunk(uint32_t offset, const uint8_t* data, int length) {
+  // Chunks arrive in order on a sequenced link; a gap spoils the upload
+  if (!tableLoading) return;
+  if (offset != tableWritten || tableWritten + length > tableSize ||
+      tableFile.write(data, length) != (size_t)length) {
+    tableLoading = false;
+    tableFile.close();
+    Serial.println("Step table upload failed at byte " + String(offset));
+    return;
   }
+  tableWritten += length;
 }
 
-void sendWiFiResponse(WiFiClient& client) {
-  client.println("HTTP/1.1 200 OK");
-  client.println("Content-Type: application/json");
-  client.println("Access-Control-Allow-Origin: *");
-  client.println();
+void handleTableRun() {
+  if (motionLocked() || !motorsEnabled) return;
+  if (tableFile) tableFile.close();
+  if (!tableLoading || tableWritten != tableSize || tableSize < TABLE_HEADER_SIZE + 2) {
+    Serial.println("Step table incomplete");
+    return;
+  }
+  tableLoading = false;
   
-  DynamicJsonDocument response(512);
-  response["status"] = "ok";
-  response["device"] = "TriAxis Controller";
+  // Header and checksum, read back from flash
+  File file = LittleFS.open(TABLE_FILE, "r");
+  uint8_t header[TABLE_HEADER_SIZE];
+  if (!file || file.read(header, TABLE_HEADER_SIZE) != TABLE_HEADER_SIZE ||
+      memcmp(header, "TXSTP", 5) != 0 || header[5] != 1 || (uint32_t)readI32(header + 6) != TABLE_TICK_HZ) {
+    Serial.println("Not a step table for this controller");
+    return;
+  }
+  uint16_t crc = crc16Update(0xFFFF, header, TABLE_HEADER_SIZE);
+  uint8_t chunk[256];
+  uint32_t left = tableSize - TABLE_HEADER_SIZE - 2;
+  while (left > 0) {
+    int n = file.read(chunk, min((uint32_t)sizeof(chunk), left));
+    if (n <= 0) break;
+    crc = crc16Update(crc, chunk, n);
+    left -= n;
+  }
+  uint8_t trailer[2];
+  file.read(trailer, 2);
+  file.close();
+  if (left > 0 || readU16(trailer) != crc) {
+    Serial.println("Step table checksum mismatch");
+    return;
+  }
   
-  String output;
-  serializeJson(response, output);
-  client.println(output);
+  // The table starts where it was compiled for
+  AccelStepper* steppers[] = {&stepperX, &stepperY, &stepperZ};
+  for (int i = 0; i < 3; i++) {
+    if (steppers[i]->currentPosition() != readI32(header + 10 + 4 * i)) {
+      Serial.println("Step table starts elsewhere; move to its start first");
+      return;
+    }
+  }
+  
+  uint32_t offset = TABLE_HEADER_SIZE;
+  for (int i = 0; i < 3; i++) {
+    TableAxis& axis = tableAxes[i];
+    uint32_t size = readI32(header + 26 + 4 * i);
+    axis.stream = LittleFS.open(TABLE_FILE, "r");
+    axis.stream.seek(offset);
+    offset += size;
+    axis.remaining = size;
+    axis.bufPos = axis.bufLen = 0;
+    axis.interval = 0;
+    axis.direction = 1;
+    axis.runLeft = 0;
+    axis.nudgeLeft = 0;
+    axis.ended = false;
+    axis.ringHead = axis.ringTail = 0;
+    axis.position = steppers[i]->currentPosition();
+    axis.starved = false;
+    axis.countdown = 0;
+  }
+  refillTable();
+  for (int i = 0; i < 3; i++) {
+    loadNextStep(i);
+  }
+  
+  stepPinsHigh = 0;
+  if (!tableTimer) {
+    tableTimer = timerBegin(0, 80, true);  // 1 MHz
+    timerAttachInterrupt(tableTimer, &tableTick, true);
+  }
+  timerAlarmWrite(tableTimer, 1000000 / TABLE_TICK_HZ, true);
+  tablePlaying = true;
+  timerAlarmEnable(tableTimer);
+  Serial.println("Playing step table");
+}
+
+int tableByte(TableAxis& axis) {
+  if (axis.bufPos == axis.bufLen) {
+    if (axis.remaining == 0) return -1;
+    axis.bufLen = axis.stream.read(axis.buf, min((uint32_t)sizeof(axis.buf), axis.remaining));
+    if (axis.bufLen <= 0) return -1;
+    axis.remaining -= axis.bufLen;
+    axis.bufPos = 0;
+  }
+  return axis.buf[axis.bufPos++];
+}
+
+bool decodeTableStep(TableAxis& axis) {
+  // Leaves the next step's interval in axis.interval; false at the end
+  while (true) {
+    if (axis.runLeft > 0) {
+      axis.runLeft--;
+      return true;
+    }
+    if (axis.nudgeLeft > 0) {
+      int place = axis.nudgeLeft == 3 ? 9 : (axis.nudgeLeft == 2 ? 3 : 1);
+      axis.interval += axis.nudgeCode / place % 3 - 1;
+      axis.nudgeLeft--;
+      return true;
+    }
+    int op = tableByte(axis);
+    if (op < 0 || op == 0xFF) {
+      return false;
+    } else if (op < 0x40) {
+      axis.runLeft = op + 1;
+    } else if (op < 0x5B) {
+      axis.nudgeCode = op - 0x40;
+      axis.nudgeLeft = 3;
+    } else if (op >= 0x80 && op < 0xC0) {
+      axis.interval += op - 0xA0;
+      return true;
+    } else if (op == 0xC0) {
+      uint32_t value = 0;
+      for (int i = 0; i < 4; i++) {
+        value |= (uint32_t)tableByte(axis) << (8 * i);
+      }
+      axis.interval = value;
+      return true;
+    } else if (op == 0xC1 || op == 0xC2) {
+      axis.direction = op == 0xC1 ? 1 : -1;
+    } else if (op == 0xC3) {
+      uint32_t low = tableByte(axis);
+      axis.runLeft = low | ((uint32_t)tableByte(axis) << 8);
+    } else {
+      return false;
+    }
+  }
+}
+
+void refillTable() {
+  // Keeps every ring topped up; ends the table once all axes have run out
+  bool finished = true;
+  for (int i = 0; i < 3; i++) {
+    TableAxis& axis = tableAxes[i];
+    while (!axis.ended && (uint16_t)(axis.ringTail - axis.ringHead) < TABLE_RING) {
+      if (!decodeTableStep(axis)) {
+        axis.ended = true;
+        break;
+      }
+      axis.ring[axis.ringTail % TABLE_RING] = axis.interval | (axis.direction < 0 ? TABLE_REVERSE : 0);
+      axis.ringTail++;
+    }
+    if (axis.starved) {
+      Serial.println("Step table decoding fell behind");
+      stopTable();
+      return;
+    }
+    // The timer steps past checkLimitSwitches(); the dir pin is already
+    // set for the step it is counting down to
+    if (axis.countdown != 0 && !((GPIO.out >> dirPins[i]) & 1) && digitalRead(limitPins[i]) == LOW) {
+      stopTable();
+      Serial.print("Step table stopped: limit switch on ");
+      Serial.println("XYZ"[i]);
+      return;
+    }
+    finished = finished && axis.ended && axis.countdown == 0 && axis.ringHead == axis.ringTail;
+  }
+  if (tablePlaying && finished) {
+    stopTable();
+    Serial.println("Step table done");
+  }
+}
+
+void IRAM_ATTR loadNextStep(int i) {
+  TableAxis& axis = tableAxes[i];
+  if (axis.ringHead == axis.ringTail) {
+    axis.countdown = 0;
+    axis.starved = !axis.ended;
+    return;
+  }
+  uint32_t entry = axis.ring[axis.ringHead % TABLE_RING];
+  axis.ringHead++;
+  axis.countdown = entry & ~TABLE_REVERSE;
+  // Set now, a whole interval before the step it is for
+  if (entry & TABLE_REVERSE) {
+    GPIO.out_w1tc = 1UL << dirPins[i];
+  } else {
+    GPIO.out_w1ts = 1UL << dirPins[i];
+  }
+}
+
+void IRAM_ATTR tableTick() {
+  // Step pulses last one tick
+  GPIO.out_w1tc = stepPinsHigh;
+  stepPinsHigh = 0;
+  for (int i = 0; i < 3; i++) {
+    TableAxis& axis = tableAxes[i];
+    if (axis.countdown == 0 || --axis.countdown > 0) continue;
+    stepPinsHigh |= 1UL << stepPins[i];
+    axis.position += (GPIO.out >> dirPins[i]) & 1 ? 1 : -1;
+    loadNextStep(i);
+  }
+  GPIO.out_w1ts = stepPinsHigh;
+}
+
+void stopTable() {
+  // Ends playback where the timer got to and hands the axes back
+  if (!tablePlaying) return;
+  timerAlarmDisable(tableTimer);
+  tablePlaying = false;
+  GPIO.out_w1tc = stepPinsHigh;
+  stepPinsHigh = 0;
+  AccelStepper* steppers[] = {&stepperX, &stepperY, &stepperZ};
+  for (int i = 0; i < 3; i++) {
+    tableAxes[i].stream.close();
+    steppers[i]->setCurrentPosition(tableAxes[i].position);
+    motorPositions[i] = tableAxes[i].position;
+  }
 }
 
 AccelStepper* getMotor(String axis) {
@@ -435,6 +1363,9 @@ void checkLimitSwitches() {
 void disableMotors() {
   motorsEnabled = false;
   digitalWrite(ENABLE_PIN, HIGH);
+  stopTable();
+  clearSegments();
+  jogDriving = 0;
   stepperX.stop();
   stepperY.stop();
   stepperZ.stop();